@@ -15,19 +15,21 @@ def create_app(config_name=None):
         config_name = os.getenv('FLASK_ENV', 'development')
     app.config.from_object(config[config_name])
     
+    from app.utils.log import configure_logging
+    configure_logging(app)
+    
     # Initialize extensions with proper CORS configuration
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:8080", "http://localhost:5173", "http://localhost:3000"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "X-Request-ID"],
+            "expose_headers": ["X-Request-ID", "Server-Timing"],
             "supports_credentials": True
         }
     })
-    mongo.init_app(app)
-    
-    # Add database instance to app for easy access
-    app.db = mongo.db
+    _init_mongo(app)
+    _check_indexes(app)
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -42,9 +44,90 @@ def create_app(config_name=None):
     app.register_blueprint(preferences_bp, url_prefix='/api/user')
     app.register_blueprint(plugin_bp, url_prefix='/api/plugin')
     
-    # Health check route
+    # Request metrics, the /metrics endpoint, per-request tracing, the
+    # per-pool concurrency limits, LLM admission control, the scheduled
+    # expired-cache cleanup and the tone_cache key filter
+    from app.utils import metrics, tracing, bulkhead, admission
+    from app.services import cache_cleanup, cache_filter
+    metrics.init_app(app)
+    tracing.init_app(app)
+    bulkhead.init_app(app)
+    admission.init_app(app)
+    cache_cleanup.init_app(app)
+    cache_filter.init_app(app)
+    
+    # Health check route (503 while shedding so balancers move traffic away)
     @app.route('/health')
     def health_check():
-        return {'status': 'ok', 'message': 'StyleTalk API is running'}, 200
+        controller = app.extensions.get('admission')
+        if controller is None:
+            return {'status': 'ok', 'message': 'StyleTalk API is running'}, 200
+        
+        load = controller.snapshot()
+        if load['state'] == admission.STATE_OVERLOADED:
+            return {'status': 'overloaded', 'message': 'StyleTalk API is shedding load', 'load': load}, 503
+        return {'status': 'ok', 'message': 'StyleTalk API is running', 'load': load}, 200
     
     return app
+
+def _init_mongo(app):
+    """Create the Mongo client (lazily connecting) and expose it as app.db"""
+    from app.utils import metrics
+    mongo.init_app(app, event_listeners=[metrics.MongoCommandMetrics()])
+    
+    # Add database instance to app for easy access
+    app.db = mongo.db
+
+def _check_indexes(app):
+    """
+    Log registry indexes (app/models/indexes.py) the database lacks
+    
+    Only reads index metadata, bounded by INDEX_CHECK_TIMEOUT_MS: building
+    an index on a large collection can take minutes, so creation is left to
+    setup_database.py rather than holding up (pre-fork) startup.
+    """
+    if not app.config.get('CHECK_INDEXES_ON_STARTUP', True):
+        return
+    
+    import logging
+    from pymongo import MongoClient
+    from app.models.indexes import missing_indexes
+    
+    logger = logging.getLogger('app.indexes')
+    timeout_ms = app.config.get('INDEX_CHECK_TIMEOUT_MS', 5000)
+    client = MongoClient(app.config['MONGO_URI'], serverSelectionTimeoutMS=timeout_ms,
+                         connectTimeoutMS=timeout_ms, socketTimeoutMS=timeout_ms)
+    try:
+        missing = missing_indexes(client.get_default_database())
+        if missing:
+            logger.warning("Missing or conflicting indexes: %s (run setup_database.py)", ', '.join(missing))
+    except Exception as e:
+        logger.warning("Index check skipped: %s", e)
+    finally:
+        client.close()
+
+def init_worker(app):
+    """
+    Per-process initialisation after a pre-fork server forks a worker
+    
+    Sockets, background threads and thread pools do not survive fork(), so
+    each worker gets its own Mongo client, LLM provider, async runtime,
+    password hashing pool, log listener and cleanup threads instead of the
+    master's.
+    """
+    from app.utils import log, user_cache, jwt_helper, history_counts
+    
+    _init_mongo(app)
+    
+    hasher = app.extensions.pop('password_hasher', None)
+    if hasher is not None:
+        hasher.shutdown()
+    app.extensions.pop('llm_provider', None)
+    app.extensions.pop('async_runtime', None)  # loop thread did not survive the fork
+    app.extensions.pop('cache_cleanup', None)  # nor did a cleanup scheduler thread
+    app.extensions.pop('cache_filter', None)  # or the key filter's rebuild thread
+    
+    user_cache.clear()
+    history_counts.clear()
+    jwt_helper.clear_token_cache()
+    log.restart_listener()
@@ -1,17 +1,38 @@
 """
 Conversation History Model
 Stores user's text processing history
+
+Results can be stored compactly: a result that matches a live tone_cache
+entry is replaced by a cache_ref plus the fields that differ from the cached
+response, and is expanded again when read.
 """
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateMany
+import re
+
+from app.models.tone_cache import ToneCache
 
 class ConversationHistory:
     """Model for storing conversation history"""
     
+    # Search modes: 'text' uses the user_text_search index (word matches,
+    # ranked by relevance); 'substring' is an escaped, length- and time-bounded
+    # $regex scan over the user's entries, kept as a fallback
+    SEARCH_MODES = ('text', 'substring')
+    TEXT_SEARCH_MAX_LENGTH = 200
+    SUBSTRING_SEARCH_MAX_LENGTH = 100
+    SUBSTRING_SEARCH_MAX_TIME_MS = 2000
+    
+    # Fields a list endpoint can return with ?fields= ('id' always comes back).
+    # 'summary' leaves out results and metadata, the bulk of an entry.
+    VIEW_FIELDS = ('created_at', 'input_text', 'results', 'metadata', 'is_favorite', 'tags')
+    SUMMARY_FIELDS = ('created_at', 'input_text', 'is_favorite', 'tags')
+    
     @staticmethod
-    def create(user_id, input_text, results, metadata=None):
+    def create(user_id, input_text, results, metadata=None, idempotency_key=None):
         """Create a new conversation history entry"""
-        return {
+        doc = {
             'user_id': user_id,
             'input_text': input_text,
             'results': results,  # Array of generated variations
@@ -25,24 +46,217 @@ class ConversationHistory:
             'created_at': datetime.utcnow(),
             'expires_at': datetime.utcnow() + timedelta(days=90)  # Auto-delete after 90 days
         }
+        # Only stored when given: the unique index on it is partial
+        if idempotency_key:
+            doc['idempotency_key'] = idempotency_key
+        return doc
     
     @staticmethod
-    def to_dict(history_doc):
-        """Convert MongoDB document to dictionary"""
+    def to_dict(history_doc, cached_results=None):
+        """
+        Convert MongoDB document to dictionary
+        
+        Args:
+            cached_results: responses from load_cached_results(); compact
+                results are expanded from it
+        """
         if not history_doc:
             return None
         
+        results = history_doc['results']
+        if cached_results is not None:
+            results = [ConversationHistory.expand_result(r, history_doc['user_id'], cached_results) for r in results]
+        
         return {
             'id': str(history_doc['_id']),
             'user_id': str(history_doc['user_id']),
             'input_text': history_doc['input_text'],
-            'results': history_doc['results'],
+            'results': results,
             'metadata': history_doc.get('metadata', {}),
             'is_favorite': history_doc.get('is_favorite', False),
             'tags': history_doc.get('tags', []),
-            'created_at': history_doc['created_at'].isoformat()
+            'created_at': history_doc['created_at'].isoformat(),
+            **({'score': round(history_doc['score'], 3)} if 'score' in history_doc else {})
+        }
+    
+    @staticmethod
+    def to_view(history_doc, fields, cached_results=None):
+        """Dictionary with only the requested VIEW_FIELDS, for projected queries"""
+        view = {'id': str(history_doc['_id'])}
+        for field in fields:
+            value = history_doc.get(field)
+            if field == 'created_at':
+                value = value.isoformat()
+            elif field == 'results' and cached_results is not None:
+                value = [ConversationHistory.expand_result(r, history_doc['user_id'], cached_results) for r in value]
+            view[field] = value
+        return view
+    
+    @staticmethod
+    def to_dicts(db, history_docs, fields=None):
+        """Convert several documents, expanding compact results with one tone_cache read"""
+        cached_results = ConversationHistory.load_cached_results(db, history_docs)
+        if fields is not None:
+            return [ConversationHistory.to_view(doc, fields, cached_results) for doc in history_docs]
+        return [ConversationHistory.to_dict(doc, cached_results) for doc in history_docs]
+    
+    @staticmethod
+    def parse_fields(value):
+        """
+        ?fields= value to a tuple of VIEW_FIELDS, or None for full documents
+        
+        Raises:
+            ValueError: unknown field name
+        """
+        if not value:
+            return None
+        if value == 'summary':
+            return ConversationHistory.SUMMARY_FIELDS
+        
+        fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip() and f.strip() != 'id'))
+        unknown = [f for f in fields if f not in ConversationHistory.VIEW_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return fields
+    
+    @staticmethod
+    def view_projection(fields):
+        """
+        Projection for a field view
+        
+        With fields=created_at (ids and dates only) this is covered by the
+        (user_id, is_favorite, created_at, _id) index.
+        """
+        projection = {field: 1 for field in fields}
+        if 'results' in fields:
+            projection['user_id'] = 1  # to expand compact results
+        if 'created_at' not in fields:
+            projection['created_at'] = 1  # keyset cursor
+        return projection
+    
+    @staticmethod
+    def result_cache_key(result, input_text, metadata=None):
+        """tone_cache key a tone-shift result would have been cached under, if any"""
+        if not isinstance(result, dict) or not result.get('target_tone') or not result.get('transformed_text'):
+            return None
+        return ToneCache.generate_cache_key(
+            result.get('original_text') or input_text,
+            result['target_tone'],
+            (metadata or {}).get('context')
+        )
+    
+    @staticmethod
+    def compact_results(db, history_docs):
+        """
+        Replace results that match a live tone_cache entry with references
+        
+        A compact result is {'cache_ref': {'key', 'scope', 'fields'}, ...}
+        where fields names the values taken from the cached response and the
+        rest are the values that differ from it. Results without a matching
+        entry stay inline. Each referenced entry has expires_at (and
+        pinned_until) raised to the latest expiry of the history entries
+        that reference it, so it outlives them. One $in read and one bulk
+        write (an UpdateMany per distinct expiry) for all documents.
+        
+        Returns:
+            Number of results compacted
+        """
+        ids = set()
+        for doc in history_docs:
+            for result in doc['results']:
+                key = ConversationHistory.result_cache_key(result, doc['input_text'], doc.get('metadata'))
+                if key:
+                    ids.update((ToneCache.entry_id(key, doc['user_id']), ToneCache.entry_id(key)))
+        
+        if not ids:
+            return 0
+        
+        entries = {
+            entry['_id']: entry
+            for entry in db.tone_cache.find(
+                {'_id': {'$in': list(ids)}, 'expires_at': {'$gt': datetime.utcnow()}},
+                {'user_id': 1, 'response': 1}
+            )
+        }
+        
+        pinned = {}
+        compacted = 0
+        for doc in history_docs:
+            results = []
+            for result in doc['results']:
+                key = ConversationHistory.result_cache_key(result, doc['input_text'], doc.get('metadata'))
+                entry = key and (entries.get(ToneCache.entry_id(key, doc['user_id'])) or entries.get(ToneCache.entry_id(key)))
+                if not entry or entry['response'].get('transformed_text') != result['transformed_text']:
+                    results.append(result)
+                    continue
+                
+                response = entry['response']
+                shared = [field for field, value in result.items() if field in response and response[field] == value]
+                results.append({
+                    'cache_ref': {
+                        'key': key,
+                        'scope': 'global' if entry['user_id'] is None else 'user',
+                        'fields': shared
+                    },
+                    **{field: value for field, value in result.items() if field not in shared}
+                })
+                pinned[entry['_id']] = max(pinned.get(entry['_id'], doc['expires_at']), doc['expires_at'])
+                compacted += 1
+            doc['results'] = results
+        
+        if pinned:
+            by_expiry = {}
+            for entry_id, keep_until in pinned.items():
+                by_expiry.setdefault(keep_until, []).append(entry_id)
+            db.tone_cache.bulk_write([
+                UpdateMany({'_id': {'$in': entry_ids}}, {'$max': {'expires_at': keep_until, 'pinned_until': keep_until}})
+                for keep_until, entry_ids in by_expiry.items()
+            ], ordered=False)
+        
+        return compacted
+    
+    @staticmethod
+    def load_cached_results(db, history_docs):
+        """
+        Cached responses referenced by compact results
+        
+        Returns:
+            {tone_cache _id: response}, from one $in query on _id
+        """
+        ids = set()
+        for doc in history_docs:
+            for result in doc.get('results', []):
+                if isinstance(result, dict) and 'cache_ref' in result:
+                    ids.add(ConversationHistory.cache_ref_id(result['cache_ref'], doc['user_id']))
+        
+        if not ids:
+            return {}
+        
+        return {
+            entry['_id']: entry['response']
+            for entry in db.tone_cache.find({'_id': {'$in': list(ids)}}, {'response': 1})
         }
     
+    @staticmethod
+    def cache_ref_id(ref, user_id):
+        """tone_cache _id a cache_ref points at"""
+        return ToneCache.entry_id(ref['key'], user_id if ref['scope'] == 'user' else None)
+    
+    @staticmethod
+    def expand_result(result, user_id, cached_results):
+        """Inline result for a stored one; compact results are rebuilt from the cache"""
+        if not isinstance(result, dict) or 'cache_ref' not in result:
+            return result
+        
+        ref = result['cache_ref']
+        stored = {field: value for field, value in result.items() if field != 'cache_ref'}
+        response = cached_results.get(ConversationHistory.cache_ref_id(ref, user_id))
+        if response is None:
+            # Cache entry deleted out of band: only the differing fields survive
+            return {**stored, 'unavailable': True}
+        
+        return {**{field: response[field] for field in ref['fields'] if field in response}, **stored}
+    
     @staticmethod
     def toggle_favorite(history_id):
         """Toggle favorite status"""
@@ -60,15 +274,20 @@ class ConversationHistory:
         }
     
     @staticmethod
-    def search_query(user_id, search_text=None, is_favorite=None, tags=None, limit=50):
+    def search_query(user_id, search_text=None, is_favorite=None, tags=None, limit=50, mode='text'):
         """Build search query for history"""
         query = {'user_id': user_id}
         
         if search_text:
-            query['$or'] = [
-                {'input_text': {'$regex': search_text, '$options': 'i'}},
-                {'results.content': {'$regex': search_text, '$options': 'i'}}
-            ]
+            if mode == 'text':
+                query['$text'] = {'$search': search_text[:ConversationHistory.TEXT_SEARCH_MAX_LENGTH]}
+            else:
+                # User input is matched literally, never interpreted as a pattern
+                pattern = re.escape(search_text[:ConversationHistory.SUBSTRING_SEARCH_MAX_LENGTH])
+                query['$or'] = [
+                    {'input_text': {'$regex': pattern, '$options': 'i'}},
+                    {'results.content': {'$regex': pattern, '$options': 'i'}}
+                ]
         
         if is_favorite is not None:
             query['is_favorite'] = is_favorite
@@ -77,3 +296,17 @@ class ConversationHistory:
             query['tags'] = {'$in': tags}
         
         return query
+    
+    @staticmethod
+    def search_order(search_text=None, mode='text'):
+        """
+        Projection and sort for a history query
+        
+        Returns:
+            (projection, sort): text searches rank by relevance, then newest
+            first; _id breaks created_at ties so keyset cursors are stable
+        """
+        newest_first = [('created_at', -1), ('_id', -1)]
+        if search_text and mode == 'text':
+            return {'score': {'$meta': 'textScore'}}, [('score', {'$meta': 'textScore'})] + newest_first
+        return None, newest_first
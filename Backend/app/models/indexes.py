@@ -0,0 +1,162 @@
+"""
+Index Registry
+Declarative MongoDB indexes, checked at startup
+
+Every index the app relies on is listed in INDEXES next to the query it
+serves. missing_indexes() is the cheap startup check, ensure_indexes()
+creates whatever is missing (setup_database.py; index builds are
+idempotent, so this is cheap once they exist) and index_report() compares
+the registry with the server: missing, conflicting, unexpected (present
+but not declared) and unused (no accesses since the server last started).
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Server error codes for an existing index with the same name/keys but different options
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+class IndexSpec:
+    """One declared index"""
+
+    def __init__(self, collection, keys, name, purpose, **options):
+        self.collection = collection
+        self.keys = keys
+        self.name = name
+        self.purpose = purpose
+        self.options = options
+
+    def server_keys(self):
+        """Key pattern as listIndexes reports it (text fields collapse into _fts/_ftsx)"""
+        keys = []
+        for field, direction in self.keys:
+            if direction != TEXT:
+                keys.append((field, direction))
+            elif ('_fts', TEXT) not in keys:
+                keys.extend([('_fts', TEXT), ('_ftsx', 1)])
+        return keys
+
+    def __repr__(self):
+        return f'{self.collection}.{self.name}'
+
+
+INDEXES = [
+    # users
+    IndexSpec('users', [('email', ASCENDING)], 'email_unique',
+              'login / registration lookup by email', unique=True),
+
+    # tone_cache (lookups and upserts use _id: 'g:<cache_key>' / 'u:<user_id>:<cache_key>')
+    IndexSpec('tone_cache', [('user_id', ASCENDING), ('created_at', DESCENDING)], 'user_created',
+              'per-user cache stats and /cache/clear'),
+    IndexSpec('tone_cache', [('created_at', ASCENDING)], 'created_at',
+              'cache key filter: add entries other workers created since its last refresh'),
+    IndexSpec('tone_cache', [('expires_at', ASCENDING)], 'expires_at_ttl',
+              'expire cache entries at expires_at', expireAfterSeconds=0),
+
+    # conversation_history
+    IndexSpec('conversation_history', [('user_id', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+              'user_created_id', 'GET /history: filter on user_id, keyset pages on (created_at, _id)'),
+    IndexSpec('conversation_history',
+              [('user_id', ASCENDING), ('is_favorite', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+              'user_favorite_created_id',
+              'GET /favorites and /history?favorite=, keyset pages; covers /favorites?fields=created_at'),
+    IndexSpec('conversation_history', [('user_id', ASCENDING), ('idempotency_key', ASCENDING)],
+              'user_idempotency_key', 'POST /history/bulk: reject client retries of an already saved entry',
+              unique=True, partialFilterExpression={'idempotency_key': {'$type': 'string'}}),
+    IndexSpec('conversation_history', [('user_id', ASCENDING), ('input_text', TEXT), ('results.content', TEXT)],
+              'user_text_search', 'GET /history?search=: per-user $text search ranked by relevance',
+              weights={'input_text': 2, 'results.content': 1}, default_language='english'),
+    IndexSpec('conversation_history', [('expires_at', ASCENDING)], 'expires_at_ttl',
+              'enforce the 90-day history retention', expireAfterSeconds=0),
+]
+
+
+def ensure_indexes(db, specs=None):
+    """
+    Create declared indexes that do not exist yet
+
+    Conflicting indexes (same keys or name, different options) are left in
+    place and reported; fixing them needs a drop, see setup_database.py.
+
+    Returns:
+        Dict with 'created', 'existing' and 'conflicts' lists of index names
+    """
+    result = {'created': [], 'existing': [], 'conflicts': []}
+
+    for spec in specs or INDEXES:
+        existing = _existing_indexes(db, spec.collection)
+        if _find_match(spec, existing):
+            result['existing'].append(repr(spec))
+            continue
+
+        try:
+            db[spec.collection].create_index(spec.keys, name=spec.name, **spec.options)
+            result['created'].append(repr(spec))
+            logger.info("Created index %r (%s)", spec, spec.purpose)
+        except OperationFailure as e:
+            if e.code not in INDEX_CONFLICT_CODES:
+                raise
+            result['conflicts'].append(repr(spec))
+            logger.warning("Index %r conflicts with an existing index: %s", spec, e)
+
+    return result
+
+
+def missing_indexes(db, specs=None):
+    """Declared indexes with no exact match on the server (missing or conflicting)"""
+    specs = specs or INDEXES
+    existing = {collection: _existing_indexes(db, collection) for collection in {spec.collection for spec in specs}}
+    return [repr(spec) for spec in specs if not _find_match(spec, existing[spec.collection])]
+
+
+def index_report(db, specs=None):
+    """
+    Compare declared indexes with the server
+
+    Returns:
+        Dict with 'missing', 'unexpected' and 'unused' lists. Usage counts come
+        from $indexStats and reset when mongod restarts.
+    """
+    specs = specs or INDEXES
+    report = {'missing': [], 'unexpected': [], 'unused': []}
+
+    for collection in sorted({spec.collection for spec in specs}):
+        declared = [spec for spec in specs if spec.collection == collection]
+        existing = _existing_indexes(db, collection)
+
+        matched = set()
+        for spec in declared:
+            match = _find_match(spec, existing)
+            if match:
+                matched.add(match)
+            else:
+                report['missing'].append(repr(spec))
+
+        report['unexpected'].extend(
+            f'{collection}.{name}' for name in existing if name != '_id_' and name not in matched
+        )
+
+        for stats in db[collection].aggregate([{'$indexStats': {}}]):
+            if stats['name'] != '_id_' and stats['accesses']['ops'] == 0:
+                report['unused'].append(f"{collection}.{stats['name']}")
+
+    return report
+
+
+def _existing_indexes(db, collection):
+    """name -> index info for a collection ({} if it does not exist yet)"""
+    return db[collection].index_information()
+
+
+def _find_match(spec, existing):
+    """Name of an existing index with the same keys and options, if any"""
+    for name, info in existing.items():
+        if list(info['key']) != spec.server_keys():
+            continue
+        if all(info.get(option) == value for option, value in spec.options.items()):
+            return name
+    return None
@@ -1,6 +1,11 @@
 """
 Tone Cache Model for MongoDB
 Stores AI-generated tone responses to reduce API calls
+
+Entries are keyed by _id: 'g:<cache_key>' for the shared global entry and
+'u:<user_id>:<cache_key>' for a user's own overlay, so both can exist for
+the same text. A lookup is one point-read on the _id index for both ids,
+sorted so the user's entry ('u:' > 'g:') wins; writes are upserts.
 """
 from datetime import datetime, timedelta
 import hashlib
@@ -30,6 +35,41 @@ class ToneCache:
         cache_string = json.dumps(cache_data, sort_keys=True)
         return hashlib.md5(cache_string.encode('utf-8')).hexdigest()
     
+    # Descending _id puts a user overlay ('u:...') ahead of the global entry ('g:...')
+    LOOKUP_SORT = [('_id', -1)]
+    
+    @staticmethod
+    def entry_id(cache_key: str, user_id: str = None) -> str:
+        """_id of the user's overlay entry, or of the global entry when user_id is None"""
+        return f'u:{user_id}:{cache_key}' if user_id else f'g:{cache_key}'
+    
+    @staticmethod
+    def lookup_query(cache_key: str, user_id: str = None) -> dict:
+        """Filter for the live user and global entries of a key (use with LOOKUP_SORT)"""
+        return ToneCache.lookup_many_query([cache_key], user_id)
+    
+    @staticmethod
+    def lookup_many_query(cache_keys: list, user_id: str = None) -> dict:
+        """Filter for the live user and global entries of several keys (one $in on _id)"""
+        ids = set()
+        for cache_key in filter(None, cache_keys):
+            ids.add(ToneCache.entry_id(cache_key))
+            if user_id:
+                ids.add(ToneCache.entry_id(cache_key, user_id))
+        return {
+            '_id': {'$in': sorted(ids)},
+            'expires_at': {'$gt': datetime.utcnow()}
+        }
+    
+    @staticmethod
+    def pick(entries: dict, cache_key: str, user_id: str = None):
+        """From {_id: entry}, the user's overlay for cache_key if present, else the global entry"""
+        if user_id:
+            entry = entries.get(ToneCache.entry_id(cache_key, user_id))
+            if entry is not None:
+                return entry
+        return entries.get(ToneCache.entry_id(cache_key))
+    
     @staticmethod
     def create(text: str, target_tone: str, response: dict, context: str = None, user_id: str = None):
         """
@@ -48,6 +88,7 @@ class ToneCache:
         cache_key = ToneCache.generate_cache_key(text, target_tone, context)
         
         return {
+            '_id': ToneCache.entry_id(cache_key, user_id),
             'cache_key': cache_key,
             'text': text,
             'target_tone': target_tone,
@@ -61,10 +102,51 @@ class ToneCache:
         }
     
     @staticmethod
-    def increment_hit_count(db, cache_key: str):
-        """Increment the hit count for a cache entry"""
-        db.tone_cache.update_one(
-            {'cache_key': cache_key},
+    def upsert(db, cache_doc: dict):
+        """
+        Write a cache entry unless a live one already exists under its _id
+        
+        A live entry keeps its text and response (compact history may
+        reference it and expands from the stored response), hit_count and
+        created_at; a rewrite only refreshes last_accessed and moves
+        expires_at later, never earlier. An expired entry the TTL monitor
+        has not removed yet is replaced outright, so it is never revived
+        with its old response. One update pipeline either way; awaitable
+        when db is a Motor database.
+        """
+        fields = {k: v for k, v in cache_doc.items() if k not in ('_id', 'expires_at', 'last_accessed')}
+        # A missing expires_at (a fresh insert) compares below any date
+        live = {'$gt': ['$expires_at', datetime.utcnow()]}
+        return db.tone_cache.update_one(
+            {'_id': cache_doc['_id']},
+            [{'$set': {
+                **{field: {'$cond': [live, f'${field}', {'$literal': value}]} for field, value in fields.items()},
+                'last_accessed': {'$literal': cache_doc['last_accessed']},
+                'expires_at': {'$cond': [
+                    live,
+                    {'$max': ['$expires_at', cache_doc['expires_at']]},
+                    {'$literal': cache_doc['expires_at']}
+                ]}
+            }}],
+            upsert=True
+        )
+    
+    @staticmethod
+    def increment_hit_count(db, entry_id: str):
+        """Increment the hit count for a cache entry (awaitable when db is a Motor database)"""
+        return db.tone_cache.update_one(
+            {'_id': entry_id},
+            {
+                '$inc': {'hit_count': 1},
+                '$set': {'last_accessed': datetime.utcnow()}
+            }
+        )
+    
+    @staticmethod
+    def increment_hit_counts(db, entry_ids):
+        """Count one hit on each of several entries with a single update (awaitable with Motor)"""
+        return db.tone_cache.update_many(
+            {'_id': {'$in': list(entry_ids)}},
             {
                 '$inc': {'hit_count': 1},
                 '$set': {'last_accessed': datetime.utcnow()}
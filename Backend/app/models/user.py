@@ -1,6 +1,6 @@
 from datetime import datetime
 from bson import ObjectId
-import bcrypt
+from app.utils.password_hasher import get_password_hasher
 
 class User:
     """User model for MongoDB"""
@@ -8,7 +8,7 @@ class User:
     @staticmethod
     def create(email, password, name):
         """Create a new user document"""
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = get_password_hasher().hash(password)
         
         return {
             'email': email.lower(),
@@ -41,7 +41,22 @@ class User:
     @staticmethod
     def verify_password(stored_password, provided_password):
         """Verify password hash"""
-        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password)
+        return get_password_hasher().verify(stored_password, provided_password)
+    
+    @staticmethod
+    def needs_rehash(stored_password):
+        """Check if the password hash uses an outdated bcrypt cost factor"""
+        return get_password_hasher().needs_rehash(stored_password)
+    
+    @staticmethod
+    def rehash_password(password):
+        """Build an update that re-hashes the password at the configured cost"""
+        return {
+            '$set': {
+                'password': get_password_hasher().hash(password),
+                'updated_at': datetime.utcnow()
+            }
+        }
     
     @staticmethod
     def to_dict(user_doc):
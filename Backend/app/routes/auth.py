@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app import mongo
 from app.models.user import User
+from app.utils.bulkhead import bulkhead
+from app.utils.password_hasher import PasswordHasherBusy
+from app.utils.user_cache import invalidate_user
 from app.utils import (
     validate_email_format,
     validate_password_strength,
@@ -10,7 +13,16 @@ from app.utils import (
 
 auth_bp = Blueprint('auth', __name__)
 
+def _busy_response(error):
+    """503 with Retry-After when password hashing is saturated"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
 @auth_bp.route('/register', methods=['POST'])
+@bulkhead('auth')
 def register():
     """
     Register a new user
@@ -71,11 +83,14 @@ def register():
             'user': user_data
         }), 201
         
+    except PasswordHasherBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
 
 @auth_bp.route('/login', methods=['POST'])
+@bulkhead('auth')
 def login():
     """
     Login user
@@ -109,6 +124,11 @@ def login():
         if not user_doc.get('is_active', True):
             return jsonify({'error': 'Account is deactivated'}), 403
         
+        # Upgrade hashes made with an old cost factor while we have the password
+        if User.needs_rehash(user_doc['password']):
+            mongo.db.users.update_one({'_id': user_doc['_id']}, User.rehash_password(password))
+            invalidate_user(user_doc['_id'])
+        
         # Generate token
         token = generate_token(str(user_doc['_id']), user_doc['email'])
         
@@ -121,11 +141,14 @@ def login():
             'user': user_data
         }), 200
         
+    except PasswordHasherBusy as e:
+        return _busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
 
 @auth_bp.route('/me', methods=['GET'])
+@bulkhead('db')
 def get_current_user():
     """
     Get current user info (requires JWT token in Authorization header)
@@ -151,9 +174,9 @@ def get_current_user():
         if not is_valid:
             return jsonify({'error': result}), 401
         
-        # Get user from database
-        from bson import ObjectId
-        user_doc = mongo.db.users.find_one({'_id': ObjectId(result['user_id'])})
+        # Get user from cache / database
+        from app.utils.user_cache import load_user
+        user_doc = load_user(result['user_id'])
         
         if not user_doc:
             return jsonify({'error': 'User not found'}), 404
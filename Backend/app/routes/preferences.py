@@ -2,18 +2,37 @@
 User Preferences Routes
 Handle user preferences, history, and favorites
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
+from app.utils.bulkhead import bulkhead
+from app.utils.history_counts import count_history, invalidate_history_counts
+from app.utils.history_export import (
+    EXPORT_FORMATS, EXPORT_PROJECTION, csv_chunks, encode_chunks, history_entries, ndjson_chunks
+)
+from app.utils.pagination import (
+    MAX_OFFSET, PaginationError, check_offset, clamp_limit, cursor_offset, decode_cursor,
+    keyset_cursor, keyset_filter, offset_cursor
+)
 from app.utils.jwt_helper import token_required
+from app.utils.user_cache import invalidate_user
 from app.models.user import User
 from app.models.conversation_history import ConversationHistory
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import BulkWriteError, ExecutionTimeout, OperationFailure
+
+# Server error code when $text is used without a text index
+INDEX_NOT_FOUND = 27
+# Server error code for a unique index violation
+DUPLICATE_KEY = 11000
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
 
 preferences_bp = Blueprint('preferences', __name__)
 
 # ==================== USER PREFERENCES ====================
 
 @preferences_bp.route('/preferences', methods=['GET'])
+@bulkhead('db')
 @token_required
 def get_preferences(current_user):
     """Get user preferences"""
@@ -28,6 +47,7 @@ def get_preferences(current_user):
 
 
 @preferences_bp.route('/preferences', methods=['PUT'])
+@bulkhead('db')
 @token_required
 def update_preferences(current_user):
     """Update user preferences"""
@@ -49,15 +69,16 @@ def update_preferences(current_user):
         # Filter to only valid preferences
         filtered_prefs = {k: v for k, v in preferences.items() if k in valid_keys}
         
-        # Merge with existing preferences
-        current_prefs = current_user.get('preferences', {})
+        # Merge with existing preferences (copy: current_user may be cached)
+        current_prefs = dict(current_user.get('preferences', {}))
         current_prefs.update(filtered_prefs)
         
         # Update in database
         db.users.update_one(
-            {'_id': current_user['_id']},
+            {'_id': ObjectId(current_user['_id'])},
             User.update_preferences(current_user['_id'], current_prefs)
         )
+        invalidate_user(current_user['_id'])
         
         return jsonify({
             'success': True,
@@ -70,6 +91,7 @@ def update_preferences(current_user):
 
 
 @preferences_bp.route('/preferences/reset', methods=['POST'])
+@bulkhead('db')
 @token_required
 def reset_preferences(current_user):
     """Reset preferences to default"""
@@ -92,9 +114,10 @@ def reset_preferences(current_user):
         }
         
         db.users.update_one(
-            {'_id': current_user['_id']},
+            {'_id': ObjectId(current_user['_id'])},
             User.update_preferences(current_user['_id'], default_prefs)
         )
+        invalidate_user(current_user['_id'])
         
         return jsonify({
             'success': True,
@@ -108,20 +131,41 @@ def reset_preferences(current_user):
 
 # ==================== CONVERSATION HISTORY ====================
 
+def _history_pool():
+    """Substring searches scan for up to seconds, so they get the 'search' pool"""
+    if request.args.get('search') and request.args.get('match') == 'substring':
+        return 'search'
+    return 'db'
+
+
 @preferences_bp.route('/history', methods=['GET'])
-@token_required
+@bulkhead(_history_pool)
+@token_required(trust_claims=True)
 def get_history(current_user):
-    """Get conversation history"""
+    """
+    Get conversation history, newest first (or by relevance when searching)
+    
+    Query parameters:
+        limit: page size (capped at HISTORY_PAGE_MAX_LIMIT)
+        cursor: next_cursor from the previous page
+        page: legacy offset paging, used only when no cursor is given
+        search, match=substring, favorite, tags: filters
+        include_total=true: exact total instead of a cached one
+    """
     try:
         from flask import current_app
         db = current_app.db
         
         # Query parameters
+        limit = clamp_limit(request.args.get('limit'), 20, current_app.config.get('HISTORY_PAGE_MAX_LIMIT', 100))
+        cursor = request.args.get('cursor')
         page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
         search = request.args.get('search')
         is_favorite = request.args.get('favorite')
         tags = request.args.get('tags')
+        # match=substring: literal substring search instead of word search
+        mode = 'substring' if request.args.get('match') == 'substring' else 'text'
+        include_total = request.args.get('include_total', '').lower() == 'true'
         
         if is_favorite:
             is_favorite = is_favorite.lower() == 'true'
@@ -129,44 +173,175 @@ def get_history(current_user):
         if tags:
             tags = tags.split(',')
         
-        # Build query
-        query = ConversationHistory.search_query(
-            user_id=str(current_user['_id']),
-            search_text=search,
-            is_favorite=is_favorite,
-            tags=tags
-        )
+        user_id = str(current_user['_id'])
+        try:
+            page_result = _history_page(db, user_id, search, is_favorite, tags, mode, cursor, page, limit, include_total)
+        except OperationFailure as e:
+            if mode != 'text' or e.code != INDEX_NOT_FOUND:
+                raise
+            # Text index not built yet: fall back to the bounded substring scan
+            page_result = _history_page(db, user_id, search, is_favorite, tags, 'substring', cursor, page, limit, include_total)
         
-        # Get total count
-        total = db.conversation_history.count_documents(query)
-        
-        # Get paginated results
-        skip = (page - 1) * limit
-        history = list(db.conversation_history.find(query)
-                      .sort('created_at', -1)
-                      .skip(skip)
-                      .limit(limit))
+        history, next_cursor, total, total_exact = page_result
         
         # Convert to dict
-        history_list = [ConversationHistory.to_dict(h) for h in history]
+        history_list = ConversationHistory.to_dicts(db, history)
         
         return jsonify({
             'success': True,
             'history': history_list,
             'pagination': {
-                'page': page,
                 'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
                 'total': total,
+                'total_exact': total_exact,
+                # Legacy page fields for page-based clients
+                'page': page if not cursor else None,
                 'pages': (total + limit - 1) // limit
             }
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except ExecutionTimeout:
+        return jsonify({
+            'success': False,
+            'error': 'Search took too long, try fewer or whole-word search terms'
+        }), 504
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _history_page(db, user_id, search, is_favorite, tags, mode, cursor, page, limit, include_total):
+    """
+    Fetch one page of history
+    
+    Chronological listings page by keyset on (created_at, _id); ranked text
+    search and legacy ?page= use an offset capped at MAX_OFFSET. Substring
+    scans are time-bounded.
+    
+    Returns:
+        (documents, next_cursor, total, total_exact)
+    """
+    query = ConversationHistory.search_query(
+        user_id=user_id,
+        search_text=search,
+        is_favorite=is_favorite,
+        tags=tags,
+        mode=mode
+    )
+    projection, sort = ConversationHistory.search_order(search, mode)
+    ranked = bool(search) and mode == 'text'
+    max_time_ms = ConversationHistory.SUBSTRING_SEARCH_MAX_TIME_MS if search and mode == 'substring' else None
+    
+    page_query, skip = query, 0
+    if cursor:
+        position = decode_cursor(cursor)
+        if ranked:
+            skip = cursor_offset(position)
+        else:
+            page_query = {'$and': [query, keyset_filter(position)]}
+    elif page > 1:
+        skip = check_offset((page - 1) * limit)
+    
+    # One extra document tells whether there is a next page
+    found = db.conversation_history.find(page_query, projection).sort(sort).skip(skip).limit(limit + 1)
+    if max_time_ms:
+        found = found.max_time_ms(max_time_ms)
+    documents = list(found)
+    
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        if not ranked:
+            next_cursor = keyset_cursor(documents[-1])
+        elif skip + limit <= MAX_OFFSET:
+            next_cursor = offset_cursor(skip + limit)
+    
+    total, total_exact = count_history(
+        db.conversation_history, user_id, query, exact=include_total,
+        **({'maxTimeMS': max_time_ms} if max_time_ms else {})
+    )
+    return documents, next_cursor, total, total_exact
+
+
+@preferences_bp.route('/history/export', methods=['GET'])
+@bulkhead('export')
+@token_required(trust_claims=True)
+def export_history(current_user):
+    """
+    Stream the user's whole history as NDJSON or CSV, newest first
+    
+    Query parameters:
+        format: ndjson (default) or csv
+        favorite, since, until (ISO 8601 created_at bounds): filters
+        after: id of the last entry already received, to resume an export
+    
+    Entries are read in batches and written as they arrive; the body is
+    gzip-compressed when the client accepts it.
+    """
+    try:
+        from flask import current_app
+        db = current_app.db
+        
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
+        
+        is_favorite = request.args.get('favorite')
+        if is_favorite:
+            is_favorite = is_favorite.lower() == 'true'
+        
+        user_id = str(current_user['_id'])
+        query = ConversationHistory.search_query(user_id, is_favorite=is_favorite)
+        
+        created_at = {}
+        for param, operator in (('since', '$gte'), ('until', '$lt')):
+            if request.args.get(param):
+                try:
+                    created_at[operator] = datetime.fromisoformat(request.args[param])
+                except ValueError:
+                    return jsonify({'success': False, 'error': f'{param} must be an ISO 8601 date'}), 400
+        if created_at:
+            query['created_at'] = created_at
+        
+        after = request.args.get('after')
+        if after:
+            last = db.conversation_history.find_one(
+                {'_id': ObjectId(after), 'user_id': user_id}, {'created_at': 1}
+            ) if ObjectId.is_valid(after) else None
+            if not last:
+                return jsonify({'success': False, 'error': 'after must be the id of an exported entry'}), 400
+            query = {'$and': [query, keyset_filter(decode_cursor(keyset_cursor(last)))]}
+        
+        batch_size = current_app.config.get('HISTORY_EXPORT_BATCH_SIZE', 500)
+        _, sort = ConversationHistory.search_order()
+        cursor = db.conversation_history.find(query, EXPORT_PROJECTION).sort(sort).batch_size(batch_size)
+        
+        entries = history_entries(db, cursor, batch_size)
+        chunks = ndjson_chunks(entries) if export_format == 'ndjson' else csv_chunks(entries)
+        use_gzip = request.accept_encodings['gzip'] > 0
+        
+        response = Response(encode_chunks(chunks, gzip=use_gzip), content_type=EXPORT_FORMATS[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename=styletalk-history.{export_format}'
+        response.headers['Vary'] = 'Accept-Encoding'
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        # Close the server-side cursor if the client goes away mid-export
+        response.call_on_close(cursor.close)
+        return response
+        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @preferences_bp.route('/history', methods=['POST'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def save_history(current_user):
     """Save conversation to history"""
     try:
@@ -192,16 +367,21 @@ def save_history(current_user):
             metadata=metadata
         )
         
+        if current_app.config.get('HISTORY_COMPACT_RESULTS'):
+            ConversationHistory.compact_results(db, [history_doc])
+        
         # Insert into database
         result = db.conversation_history.insert_one(history_doc)
+        invalidate_history_counts(current_user['_id'])
         
         # Update user statistics
         db.users.update_one(
-            {'_id': current_user['_id']},
+            {'_id': ObjectId(current_user['_id'])},
             User.update_statistics(current_user['_id'], {
                 'statistics.total_requests': 1
             })
         )
+        invalidate_user(current_user['_id'])
         
         return jsonify({
             'success': True,
@@ -213,8 +393,161 @@ def save_history(current_user):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@preferences_bp.route('/history/bulk', methods=['POST'])
+@bulkhead('db')
+@token_required(trust_claims=True)
+def save_history_bulk(current_user):
+    """
+    Save several conversations to history in one request
+    
+    Body: {"entries": [{input_text, results, metadata?, idempotency_key?}, ...]}
+    
+    Entries are validated one by one; the valid ones are written with a single
+    unordered insert_many and counted with a single statistics $inc. An entry
+    whose idempotency_key this user already saved is reported as 'duplicate'
+    with the existing history_id, so a client can resend a batch after a
+    timeout without creating copies.
+    """
+    try:
+        from flask import current_app
+        db = current_app.db
+        
+        data = request.json or {}
+        entries = data.get('entries')
+        max_entries = current_app.config.get('HISTORY_BULK_MAX_ENTRIES', 100)
+        
+        if not isinstance(entries, list) or not entries:
+            return jsonify({
+                'success': False,
+                'error': 'entries must be a non-empty array'
+            }), 400
+        
+        if len(entries) > max_entries:
+            return jsonify({
+                'success': False,
+                'error': f'At most {max_entries} entries per request'
+            }), 400
+        
+        user_id = str(current_user['_id'])
+        results = [{'index': i} for i in range(len(entries))]
+        documents, positions, batch_keys = [], [], set()
+        
+        for i, entry in enumerate(entries):
+            error = _history_entry_error(entry)
+            if error:
+                results[i].update(status='invalid', error=error)
+                continue
+            
+            key = entry.get('idempotency_key')
+            if key in batch_keys:
+                # Repeated within this batch: resolved to the first one's id below
+                results[i].update(status='duplicate', idempotency_key=key)
+                continue
+            if key:
+                batch_keys.add(key)
+            
+            documents.append(ConversationHistory.create(
+                user_id=user_id,
+                input_text=entry['input_text'],
+                results=entry['results'],
+                metadata=entry.get('metadata', {}),
+                idempotency_key=key
+            ))
+            positions.append(i)
+        
+        if documents and current_app.config.get('HISTORY_COMPACT_RESULTS'):
+            ConversationHistory.compact_results(db, documents)
+        
+        failed = {}
+        if documents:
+            try:
+                db.conversation_history.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                failed = {err['index']: err for err in e.details.get('writeErrors', [])}
+        
+        created, saved_keys = 0, {}
+        for doc_index, (position, doc) in enumerate(zip(positions, documents)):
+            error = failed.get(doc_index)
+            if error is None:
+                results[position].update(status='created', history_id=str(doc['_id']))
+                created += 1
+                if doc.get('idempotency_key'):
+                    saved_keys[doc['idempotency_key']] = doc['_id']
+            elif error.get('code') == DUPLICATE_KEY and doc.get('idempotency_key'):
+                results[position].update(status='duplicate', idempotency_key=doc['idempotency_key'])
+            else:
+                results[position].update(status='failed', error=error.get('errmsg', 'Write failed'))
+        
+        _resolve_duplicates(db, user_id, results, saved_keys)
+        
+        if created:
+            invalidate_history_counts(current_user['_id'])
+            
+            # One statistics update for the whole batch
+            db.users.update_one(
+                {'_id': ObjectId(current_user['_id'])},
+                User.update_statistics(current_user['_id'], {
+                    'statistics.total_requests': created
+                })
+            )
+            invalidate_user(current_user['_id'])
+        
+        return jsonify({
+            'success': True,
+            'created': created,
+            'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+            'invalid': sum(1 for r in results if r['status'] == 'invalid'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'results': results
+        }), 201 if created else 200
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _history_entry_error(entry):
+    """Validation message for one bulk entry, or None when it can be saved"""
+    if not isinstance(entry, dict):
+        return 'Entry must be an object'
+    if not entry.get('input_text') or not isinstance(entry['input_text'], str):
+        return 'input_text is required'
+    if not entry.get('results') or not isinstance(entry['results'], list):
+        return 'results must be a non-empty array'
+    if not isinstance(entry.get('metadata', {}), dict):
+        return 'metadata must be an object'
+    
+    key = entry.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH):
+        return f'idempotency_key must be a string of 1-{IDEMPOTENCY_KEY_MAX_LENGTH} characters'
+    return None
+
+
+def _resolve_duplicates(db, user_id, results, saved):
+    """
+    Replace the idempotency_key on duplicate results with the saved entry's
+    history_id: from this batch (saved) or else from an earlier request
+    """
+    duplicates = [r for r in results if 'idempotency_key' in r]
+    if not duplicates:
+        return
+    
+    missing = {r['idempotency_key'] for r in duplicates} - saved.keys()
+    if missing:
+        for doc in db.conversation_history.find(
+            {'user_id': user_id, 'idempotency_key': {'$in': list(missing)}},
+            {'idempotency_key': 1}
+        ):
+            saved[doc['idempotency_key']] = doc['_id']
+    
+    for result in duplicates:
+        history_id = saved.get(result.pop('idempotency_key'))
+        if history_id is not None:
+            result['history_id'] = str(history_id)
+
+
 @preferences_bp.route('/history/<history_id>/favorite', methods=['PUT'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def toggle_favorite(current_user, history_id):
     """Toggle favorite status of history entry"""
     try:
@@ -239,6 +572,7 @@ def toggle_favorite(current_user, history_id):
             {'_id': ObjectId(history_id)},
             {'$set': {'is_favorite': new_status}}
         )
+        invalidate_history_counts(current_user['_id'])
         
         return jsonify({
             'success': True,
@@ -251,7 +585,8 @@ def toggle_favorite(current_user, history_id):
 
 
 @preferences_bp.route('/history/<history_id>', methods=['DELETE'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def delete_history(current_user, history_id):
     """Delete history entry"""
     try:
@@ -262,6 +597,7 @@ def delete_history(current_user, history_id):
             '_id': ObjectId(history_id),
             'user_id': str(current_user['_id'])
         })
+        invalidate_history_counts(current_user['_id'])
         
         if result.deleted_count == 0:
             return jsonify({
@@ -279,7 +615,8 @@ def delete_history(current_user, history_id):
 
 
 @preferences_bp.route('/history/clear', methods=['DELETE'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def clear_history(current_user):
     """Clear all history (keep favorites if specified)"""
     try:
@@ -293,6 +630,7 @@ def clear_history(current_user):
             query['is_favorite'] = False
         
         result = db.conversation_history.delete_many(query)
+        invalidate_history_counts(current_user['_id'])
         
         return jsonify({
             'success': True,
@@ -307,25 +645,59 @@ def clear_history(current_user):
 # ==================== FAVORITES ====================
 
 @preferences_bp.route('/favorites', methods=['GET'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def get_favorites(current_user):
-    """Get all favorite conversations"""
+    """
+    Get favorite conversations, newest first
+    
+    Query parameters:
+        limit: page size (capped at HISTORY_PAGE_MAX_LIMIT)
+        cursor: next_cursor from the previous page
+        fields: 'summary' or a comma list of ConversationHistory.VIEW_FIELDS;
+            full entries when omitted
+    """
     try:
         from flask import current_app
         db = current_app.db
         
-        favorites = list(db.conversation_history.find({
-            'user_id': str(current_user['_id']),
-            'is_favorite': True
-        }).sort('created_at', -1))
+        limit = clamp_limit(request.args.get('limit'), 50, current_app.config.get('HISTORY_PAGE_MAX_LIMIT', 100))
+        cursor = request.args.get('cursor')
+        try:
+            fields = ConversationHistory.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        query = ConversationHistory.search_query(str(current_user['_id']), is_favorite=True)
+        if cursor:
+            query = {'$and': [query, keyset_filter(decode_cursor(cursor))]}
+        _, sort = ConversationHistory.search_order()
+        
+        # Served by the user_favorite_created_id index; limit + 1 tells whether there is a next page
+        favorites = list(db.conversation_history.find(
+            query,
+            ConversationHistory.view_projection(fields) if fields else None
+        ).sort(sort).limit(limit + 1))
         
-        favorites_list = [ConversationHistory.to_dict(f) for f in favorites]
+        next_cursor = None
+        if len(favorites) > limit:
+            favorites = favorites[:limit]
+            next_cursor = keyset_cursor(favorites[-1])
+        
+        favorites_list = ConversationHistory.to_dicts(db, favorites, fields)
         
         return jsonify({
             'success': True,
             'favorites': favorites_list,
-            'count': len(favorites_list)
+            'count': len(favorites_list),
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
         }), 200
         
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
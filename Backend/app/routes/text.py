@@ -2,12 +2,20 @@
 Text Processing API Routes
 Single and multi-tone text rewriting with emotion detection
 """
-from flask import Blueprint, request, jsonify, current_app
-from app.services.tone_shifter import ToneShifterService
+from flask import Blueprint, request, jsonify
+from app.services.tone_shifter import ToneShifterService, AsyncToneShifterService
+from app.services.llm_provider import get_llm_provider
+from app.utils import metrics, tracing
+from app.utils.admission import Overloaded, get_admission_controller, overloaded_response
+from app.utils.async_runtime import get_async_runtime
+from app.utils.bulkhead import bulkhead
 from app.utils.jwt_helper import token_required
 from functools import wraps
+import logging
+import time
 
 text_bp = Blueprint('text', __name__)
+logger = logging.getLogger(__name__)
 
 def validate_request(*required_fields):
     """Decorator to validate required fields in request"""
@@ -28,9 +36,9 @@ def validate_request(*required_fields):
         return decorated_function
     return decorator
 
-def detect_emotion_and_intent(text: str) -> dict:
+async def detect_emotion_and_intent(text: str) -> dict:
     """
-    Detect emotion and intent from text using Groq AI
+    Detect emotion and intent from text using the configured LLM provider
     
     Args:
         text: Input text to analyze
@@ -38,10 +46,9 @@ def detect_emotion_and_intent(text: str) -> dict:
     Returns:
         Dict with emotion and intent
     """
+    provider = None
     try:
-        from groq import Groq
-        
-        client = Groq(api_key=current_app.config.get('GROQ_API_KEY'))
+        provider = get_llm_provider()
         
         prompt = f"""Analyze this text and provide:
 1. Emotion (one word: positive, negative, neutral, urgent, apologetic, grateful, frustrated, excited)
@@ -53,17 +60,21 @@ Respond in this exact format:
 Emotion: [emotion]
 Intent: [intent]"""
 
-        response = client.chat.completions.create(
-            model=current_app.config.get('GROQ_MODEL', 'llama-3.3-70b-versatile'),
-            messages=[
-                {"role": "system", "content": "You are an expert at analyzing text emotion and intent. Always respond in the exact format requested."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=100
-        )
+        with get_admission_controller().admit():
+            started = time.perf_counter()
+            with tracing.span('emotion'):
+                completion = await provider.acomplete(
+                    messages=[
+                        {"role": "system", "content": "You are an expert at analyzing text emotion and intent. Always respond in the exact format requested."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.3,
+                    max_tokens=100
+                )
         
-        result = response.choices[0].message.content.strip()
+        metrics.record_llm_call(provider, 'emotion-intent', time.perf_counter() - started, completion)
+        
+        result = completion.content.strip()
         lines = result.split('\n')
         
         emotion = "neutral"
@@ -80,14 +91,23 @@ Intent: [intent]"""
             'intent': intent
         }
         
+    except Overloaded:
+        # Shedding: serve the rewrite without analysis rather than reject it
+        return {
+            'emotion': 'neutral',
+            'intent': 'inform'
+        }
     except Exception as e:
-        print(f"[ERROR] Emotion detection failed: {e}")
+        logger.warning("Emotion detection failed: %s", e)
+        if provider is not None:
+            metrics.LLM_ERRORS.labels(provider.name, provider.model).inc()
         return {
             'emotion': 'neutral',
             'intent': 'inform'
         }
 
 @text_bp.route('/rewrite', methods=['POST'])
+@bulkhead('llm')
 @validate_request('text', 'tone')
 def rewrite_text():
     """
@@ -127,19 +147,20 @@ def rewrite_text():
                 'error': f'Invalid tone. Choose from: {", ".join(valid_tones)}'
             }), 400
         
-        # Detect emotion and intent
-        analysis = detect_emotion_and_intent(text)
-        
-        # Rewrite using tone shifter service
-        tone_service = ToneShifterService(db=current_app.db)
-        result = tone_service.shift_tone(
-            text=text,
-            target_tone=tone,
-            context=None,
-            preserve_meaning=True,
-            temperature=0.7,
-            user_id=None,
-            use_cache=use_cache
+        # Detect emotion/intent and rewrite concurrently
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService(db=runtime.db)
+        analysis, result = runtime.gather(
+            detect_emotion_and_intent(text),
+            tone_service.shift_tone(
+                text=text,
+                target_tone=tone,
+                context=None,
+                preserve_meaning=True,
+                temperature=0.7,
+                user_id=None,
+                use_cache=use_cache
+            )
         )
         
         if not result['success']:
@@ -156,13 +177,14 @@ def rewrite_text():
             'cache_hit_count': result.get('cache_hit_count', 0)
         }), 200
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
-        print(f"[ERROR] Text rewrite failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Text rewrite failed")
         return jsonify({'error': str(e)}), 500
 
 @text_bp.route('/rewrite-multiple', methods=['POST'])
+@bulkhead('llm')
 @validate_request('text', 'tones')
 def rewrite_multiple():
     """
@@ -217,24 +239,24 @@ def rewrite_multiple():
                 'error': f'Invalid tones: {", ".join(invalid_tones)}. Choose from: {", ".join(valid_tones)}'
             }), 400
         
-        # Detect emotion and intent once
-        analysis = detect_emotion_and_intent(text)
-        
-        # Rewrite in all tones (parallel processing)
-        tone_service = ToneShifterService(db=current_app.db)
-        variations = []
-        
-        for tone in tones:
-            result = tone_service.shift_tone(
-                text=text,
-                target_tone=tone,
+        # Detect emotion/intent once and rewrite in all tones, concurrently;
+        # every tone's cache entry is read with one query, only misses reach the LLM
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService(db=runtime.db)
+        analysis, results = runtime.gather(
+            detect_emotion_and_intent(text),
+            tone_service.shift_many(
+                [(text, tone) for tone in tones],
                 context=None,
                 preserve_meaning=True,
                 temperature=0.7,
                 user_id=None,
                 use_cache=use_cache
             )
-            
+        )
+        variations = []
+        
+        for tone, result in zip(tones, results):
             if result['success']:
                 variations.append({
                     'tone': tone,
@@ -257,10 +279,10 @@ def rewrite_multiple():
             'variations': variations
         }), 200
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
-        print(f"[ERROR] Multiple rewrite failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Multiple rewrite failed")
         return jsonify({'error': str(e)}), 500
 
 @text_bp.route('/available-tones', methods=['GET'])
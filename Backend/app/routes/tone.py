@@ -3,12 +3,22 @@ Tone Shifting API Routes
 Real-time contextual tone transformation endpoints
 """
 from flask import Blueprint, request, jsonify, current_app
-from app.services.tone_shifter import ToneShifterService
-from app.utils.jwt_helper import token_required
+from app.services.tone_shifter import ToneShifterService, AsyncToneShifterService
+from app.utils.admission import Overloaded, overloaded_response
+from app.utils.async_runtime import get_async_runtime
+from app.utils.bulkhead import bulkhead
+from app.utils.jwt_helper import admin_required, token_required
 from app.models.tone_cache import ToneCache
+from app.services import tone_disk_cache
+from app.services.cache_cleanup import (
+    cleanup_status, get_scheduler, request_user_clear, start_pass, start_user_clears, user_clear_status
+)
+from app.utils.log import redact
 from functools import wraps
+import logging
 
 tone_bp = Blueprint('tone', __name__)
+logger = logging.getLogger(__name__)
 
 def validate_request(*required_fields):
     """Decorator to validate required fields in request"""
@@ -30,7 +40,8 @@ def validate_request(*required_fields):
     return decorator
 
 @tone_bp.route('/shift', methods=['POST'])
-@token_required
+@bulkhead('llm')
+@token_required(trust_claims=True)
 @validate_request('text', 'target_tone')
 def shift_tone(current_user):
     """
@@ -48,27 +59,31 @@ def shift_tone(current_user):
     try:
         data = request.get_json()
         
-        tone_service = ToneShifterService(db=current_app.db)
-        result = tone_service.shift_tone(
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService(db=runtime.db)
+        result = runtime.run(tone_service.shift_tone(
             text=data['text'],
             target_tone=data['target_tone'],
             context=data.get('context'),
             preserve_meaning=data.get('preserve_meaning', True),
             temperature=data.get('temperature', 0.7),
-            user_id=current_user['id'],
+            user_id=current_user['_id'],
             use_cache=data.get('use_cache', True)
-        )
+        ))
         
         if result['success']:
             return jsonify(result), 200
         else:
             return jsonify(result), 500
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/batch-shift', methods=['POST'])
-@token_required
+@bulkhead('llm')
+@token_required(trust_claims=True)
 @validate_request('texts', 'target_tone')
 def batch_shift_tone(current_user):
     """
@@ -87,17 +102,16 @@ def batch_shift_tone(current_user):
         if not isinstance(data['texts'], list):
             return jsonify({'error': 'texts must be an array'}), 400
         
-        tone_service = ToneShifterService(db=current_app.db)
-        results = []
-        for text in data['texts']:
-            result = tone_service.shift_tone(
-                text=text,
-                target_tone=data['target_tone'],
-                context=data.get('context'),
-                user_id=current_user['id'],
-                use_cache=data.get('use_cache', True)
-            )
-            results.append(result)
+        # All texts are shifted concurrently
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService(db=runtime.db)
+        results = runtime.run(tone_service.batch_shift(
+            texts=data['texts'],
+            target_tone=data['target_tone'],
+            context=data.get('context'),
+            user_id=current_user['_id'],
+            use_cache=data.get('use_cache', True)
+        ))
         
         return jsonify({
             'success': True,
@@ -105,11 +119,14 @@ def batch_shift_tone(current_user):
             'total_processed': len(results)
         }), 200
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/suggest-improvements', methods=['POST'])
-@token_required
+@bulkhead('llm')
+@token_required(trust_claims=True)
 @validate_request('text', 'current_tone')
 def suggest_improvements(current_user):
     """
@@ -125,18 +142,21 @@ def suggest_improvements(current_user):
     try:
         data = request.get_json()
         
-        tone_service = ToneShifterService()
-        result = tone_service.suggest_improvements(
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService()
+        result = runtime.run(tone_service.suggest_improvements(
             text=data['text'],
             current_tone=data['current_tone'],
             target_audience=data.get('target_audience')
-        )
+        ))
         
         if result['success']:
             return jsonify(result), 200
         else:
             return jsonify(result), 500
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -163,6 +183,7 @@ def get_available_tones():
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/quick-shift', methods=['POST'])
+@bulkhead('llm')
 @validate_request('text', 'target_tone')
 def quick_shift_tone():
     """
@@ -176,32 +197,34 @@ def quick_shift_tone():
     """
     try:
         data = request.get_json()
-        print(f"[DEBUG] Received request: text='{data['text'][:50]}...', tone={data['target_tone']}")
+        logger.debug("Quick shift: text=%s tone=%s", redact(data['text']), data['target_tone'])
         
-        tone_service = ToneShifterService(db=current_app.db)
-        result = tone_service.shift_tone(
+        runtime = get_async_runtime()
+        tone_service = AsyncToneShifterService(db=runtime.db)
+        result = runtime.run(tone_service.shift_tone(
             text=data['text'],
             target_tone=data['target_tone'],
             context=data.get('context'),
             temperature=data.get('temperature', 0.7),
             user_id=None,  # Global cache for unauthenticated requests
             use_cache=data.get('use_cache', True)
-        )
+        ))
         
         if result['success']:
             return jsonify(result), 200
         else:
-            print(f"[ERROR] Tone shift failed: {result.get('error')}")
+            logger.error("Quick shift failed: %s", result.get('error'))
             return jsonify(result), 500
             
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
-        print(f"[ERROR] Exception in quick_shift: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Exception in quick_shift")
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/cache/stats', methods=['GET'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def get_cache_stats(current_user):
     """
     Get cache statistics for the current user
@@ -217,7 +240,7 @@ def get_cache_stats(current_user):
     }
     """
     try:
-        stats = ToneCache.get_cache_stats(current_app.db, current_user['id'])
+        stats = ToneCache.get_cache_stats(current_app.db, current_user['_id'])
         return jsonify({
             'success': True,
             'stats': stats
@@ -226,44 +249,121 @@ def get_cache_stats(current_user):
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/cache/clear', methods=['DELETE'])
-@token_required
+@bulkhead('db')
+@token_required(trust_claims=True)
 def clear_user_cache(current_user):
     """
     Clear all cached responses for the current user
     
+    Entries referenced by compact history (pinned_until in the future) are
+    kept until that history expires. The user's disk cache entries are
+    dropped on this host; other hosts keep theirs for at most
+    DISK_CACHE_TTL_SECONDS.
+    
+    The batched delete runs on the cleanup scheduler (or, with the
+    scheduler disabled, on a one-off thread), so this returns 202 right
+    away; poll GET /cache/clear for the result.
+    
+    Response (202):
+    {
+        "success": true,
+        "status": {"state": "pending", "requested_at": "...", ...}
+    }
+    """
+    try:
+        app = current_app._get_current_object()
+        user_id = current_user['_id']
+        tone_disk_cache.forget_user(user_id)
+        
+        request_user_clear(app.db, user_id)
+        scheduler = get_scheduler(app)
+        if scheduler is not None:
+            scheduler.trigger_clears()
+        else:
+            start_user_clears(app)
+        return jsonify({
+            'success': True,
+            'status': user_clear_status(app.db, user_id)
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tone_bp.route('/cache/clear', methods=['GET'])
+@bulkhead('db')
+@token_required(trust_claims=True)
+def clear_user_cache_status(current_user):
+    """
+    State of the current user's last cache clear
+    
     Response:
     {
         "success": true,
-        "deleted_count": 15
+        "status": {"state": "done", "deleted_count": 15, "finished_at": "...", ...}
     }
     """
     try:
-        result = current_app.db.tone_cache.delete_many({
-            'user_id': current_user['id']
-        })
         return jsonify({
             'success': True,
-            'deleted_count': result.deleted_count
+            'status': user_clear_status(current_app.db, current_user['_id'])
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @tone_bp.route('/cache/cleanup', methods=['POST'])
+@bulkhead('db')
+@admin_required
 def cleanup_expired_cache():
     """
-    Cleanup expired cache entries (admin/cron endpoint)
+    Start an expired-entry cleanup pass (admin endpoint)
+    
+    The scheduler already runs passes every CACHE_CLEANUP_INTERVAL_SECONDS;
+    this only wakes it. With the scheduler disabled the pass runs on a
+    one-off thread. Either way poll GET /cache/cleanup for progress.
     
     Response:
     {
         "success": true,
-        "deleted_count": 23
+        "started": true,
+        "status": {"running": true, "checkpoint": "...", "progress": {...}}
+    }
+    """
+    try:
+        app = current_app._get_current_object()
+        scheduler = get_scheduler(app)
+        if scheduler is not None:
+            scheduler.trigger()
+        else:
+            start_pass(app)
+        return jsonify({
+            'success': True,
+            'started': True,
+            'status': cleanup_status(app.db)
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tone_bp.route('/cache/cleanup', methods=['GET'])
+@bulkhead('db')
+@admin_required
+def cleanup_status_view():
+    """
+    Progress of the expired-entry cleanup
+    
+    Response:
+    {
+        "success": true,
+        "status": {
+            "running": false,
+            "checkpoint": null,
+            "progress": {"scanned": 120000, "deleted": 8400, "batches": 120, "deleted_per_second": 410.5, ...},
+            "last_completed_at": "..."
+        }
     }
     """
     try:
-        deleted_count = ToneCache.cleanup_expired(current_app.db)
         return jsonify({
             'success': True,
-            'deleted_count': deleted_count
+            'status': cleanup_status(current_app.db)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,398 @@
+"""
+Cache Cleanup
+Batched, throttled removal of expired tone_cache entries
+
+A single delete_many over a large tone_cache is one long write burst (and
+replication lag). The cleaner instead walks the collection in _id order,
+batch_size entries at a time: it reads a window of _ids, deletes the
+expired ones in that window and sleeps pause_seconds before the next. The
+last _id reached is checkpointed in maintenance_state, so a pass survives
+restarts, and a lease in the same document keeps workers and instances
+from running passes at the same time.
+
+Each worker runs a CleanupScheduler thread (started on its first request,
+so a pre-fork master never runs one) that attempts a pass every
+CACHE_CLEANUP_INTERVAL_SECONDS; whichever worker holds the lease does it.
+
+The scheduler also runs users' cache clears (DELETE /api/tone/cache/clear)
+off the request thread. A clear is recorded as a job in maintenance_state,
+so any worker can claim it, and one whose worker died is picked up again
+once its lease runs out. With the scheduler disabled, the routes start
+the same work on a one-off thread instead (start_user_clears/start_pass).
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+TASK_ID = 'tone_cache_cleanup'
+CLEAR_TASK_PREFIX = 'tone_cache_clear:'
+
+
+class CacheCleaner:
+    """Resumable, leased expired-entry cleanup for tone_cache"""
+
+    def __init__(self, db, batch_size=1000, pause_seconds=0.2, lease_seconds=300, owner=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+    def run_pass(self, max_batches=None, stop_event=None):
+        """
+        Continue the current pass from its checkpoint
+
+        Returns:
+            Progress dict, or None if another worker holds the lease
+        """
+        state = self._acquire_lease()
+        if state is None:
+            return None
+
+        checkpoint = state.get('checkpoint')
+        progress = {
+            'resumed_from': str(checkpoint) if checkpoint else None,
+            'scanned': 0,
+            'deleted': 0,
+            'batches': 0,
+            'started_at': datetime.utcnow(),
+            'complete': False
+        }
+        started = time.perf_counter()
+
+        try:
+            while max_batches is None or progress['batches'] < max_batches:
+                if stop_event is not None and stop_event.is_set():
+                    break
+
+                scanned, deleted, checkpoint = self._delete_batch(checkpoint)
+                progress['scanned'] += scanned
+                progress['deleted'] += deleted
+                progress['batches'] += 1
+
+                if scanned < self.batch_size:
+                    progress['complete'] = True
+                    checkpoint = None
+
+                elapsed = time.perf_counter() - started
+                progress['elapsed_seconds'] = round(elapsed, 3)
+                progress['deleted_per_second'] = round(progress['deleted'] / elapsed, 1) if elapsed else None
+                if not self._save(checkpoint, progress):
+                    logger.warning("Cache cleanup lease lost, stopping after %d batches", progress['batches'])
+                    break
+
+                if progress['complete']:
+                    break
+                time.sleep(self.pause_seconds)
+        finally:
+            self._release_lease()
+
+        logger.info(
+            "Cache cleanup: %d scanned, %d deleted in %d batches (%.1f deleted/s)%s",
+            progress['scanned'], progress['deleted'], progress['batches'],
+            progress.get('deleted_per_second') or 0, '' if progress['complete'] else ', will resume'
+        )
+        return progress
+
+    def _delete_batch(self, after_id):
+        """Delete expired entries among the next batch_size _ids; returns (scanned, deleted, last _id)"""
+        started = time.perf_counter()
+        window = {'_id': {'$gt': after_id}} if after_id else {}
+        entries = list(
+            self.db.tone_cache.find(window, {'expires_at': 1}).sort('_id', 1).limit(self.batch_size)
+        )
+        if not entries:
+            return 0, 0, after_id
+
+        now = datetime.utcnow()
+        expired = [e['_id'] for e in entries if e.get('expires_at') and e['expires_at'] < now]
+        deleted = 0
+        if expired:
+            # Re-check expiry: an entry may have been extended since it was read
+            deleted = self.db.tone_cache.delete_many({
+                '_id': {'$in': expired},
+                'expires_at': {'$lt': now}
+            }).deleted_count
+
+        metrics.CACHE_CLEANUP_BATCH_SECONDS.observe(time.perf_counter() - started)
+        metrics.CACHE_CLEANUP_SCANNED.inc(len(entries))
+        metrics.CACHE_CLEANUP_DELETED.inc(deleted)
+        return len(entries), deleted, entries[-1]['_id']
+
+    def _acquire_lease(self):
+        now = datetime.utcnow()
+        try:
+            return self.db.maintenance_state.find_one_and_update(
+                {
+                    '_id': TASK_ID,
+                    '$or': [
+                        {'lease_until': {'$lt': now}},
+                        {'lease_until': None},
+                        {'lease_owner': self.owner}
+                    ]
+                },
+                {'$set': {'lease_owner': self.owner, 'lease_until': now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The document exists and its lease belongs to someone else
+            return None
+
+    def _save(self, checkpoint, progress):
+        """Store checkpoint and progress, renewing the lease; False if the lease was lost"""
+        result = self.db.maintenance_state.update_one(
+            {'_id': TASK_ID, 'lease_owner': self.owner},
+            {'$set': {
+                'checkpoint': checkpoint,
+                'progress': progress,
+                'updated_at': datetime.utcnow(),
+                'lease_until': datetime.utcnow() + timedelta(seconds=self.lease_seconds),
+                **({'last_completed_at': datetime.utcnow()} if progress['complete'] else {})
+            }}
+        )
+        return result.matched_count == 1
+
+    def _release_lease(self):
+        self.db.maintenance_state.update_one(
+            {'_id': TASK_ID, 'lease_owner': self.owner},
+            {'$set': {'lease_until': None}}
+        )
+
+
+def cleanup_status(db):
+    """Checkpoint, lease and last progress of the cleanup task"""
+    state = db.maintenance_state.find_one({'_id': TASK_ID}) or {}
+    return {
+        'running': bool(state.get('lease_until') and state['lease_until'] > datetime.utcnow()),
+        'checkpoint': str(state['checkpoint']) if state.get('checkpoint') else None,
+        'progress': state.get('progress'),
+        'updated_at': state.get('updated_at'),
+        'last_completed_at': state.get('last_completed_at')
+    }
+
+
+def delete_in_batches(collection, query, batch_size=1000, pause_seconds=0.2):
+    """
+    delete_many(query) as a series of bounded deletes by _id
+
+    Returns:
+        Number of documents deleted
+    """
+    deleted = 0
+    window = {}
+    while True:
+        ids = [doc['_id'] for doc in collection.find({**query, **window}, {'_id': 1}).sort('_id', 1).limit(batch_size)]
+        if not ids:
+            return deleted
+        deleted += collection.delete_many({**query, '_id': {'$in': ids}}).deleted_count
+        if len(ids) < batch_size:
+            return deleted
+        window = {'_id': {'$gt': ids[-1]}}
+        time.sleep(pause_seconds)
+
+
+def user_clear_query(user_id):
+    """A user's entries, except those pinned by compact history"""
+    return {
+        'user_id': user_id,
+        'pinned_until': {'$not': {'$gt': datetime.utcnow()}}
+    }
+
+
+def request_user_clear(db, user_id):
+    """Queue a clear of the user's entries (a repeat request re-queues it)"""
+    db.maintenance_state.update_one(
+        {'_id': CLEAR_TASK_PREFIX + user_id},
+        {
+            '$set': {'user_id': user_id, 'state': 'pending', 'requested_at': datetime.utcnow()},
+            '$unset': {'lease_owner': '', 'lease_until': ''}
+        },
+        upsert=True
+    )
+
+
+def user_clear_status(db, user_id):
+    """State of the user's last clear: pending, running or done (None if never requested)"""
+    job = db.maintenance_state.find_one({'_id': CLEAR_TASK_PREFIX + user_id}) or {}
+    return {
+        'state': job.get('state'),
+        'requested_at': job.get('requested_at'),
+        'finished_at': job.get('finished_at'),
+        'deleted_count': job.get('deleted_count')
+    }
+
+
+def run_user_clears(db, batch_size=1000, pause_seconds=0.2, lease_seconds=300, owner=None):
+    """
+    Claim and run queued user clears until none are left
+
+    Returns:
+        Number of clears run
+    """
+    owner = owner or f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    ran = 0
+    while True:
+        now = datetime.utcnow()
+        job = db.maintenance_state.find_one_and_update(
+            {
+                '_id': {'$regex': f'^{CLEAR_TASK_PREFIX}'},
+                '$or': [
+                    {'state': 'pending'},
+                    {'state': 'running', 'lease_until': {'$lt': now}}
+                ]
+            },
+            {'$set': {
+                'state': 'running',
+                'lease_owner': owner,
+                'lease_until': now + timedelta(seconds=lease_seconds)
+            }},
+            sort=[('requested_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return ran
+
+        deleted = delete_in_batches(db.tone_cache, user_clear_query(job['user_id']), batch_size, pause_seconds)
+        # Matches only if the user did not ask again meanwhile (that re-queues the job)
+        db.maintenance_state.update_one(
+            {'_id': job['_id'], 'lease_owner': owner, 'state': 'running'},
+            {
+                '$set': {'state': 'done', 'deleted_count': deleted, 'finished_at': datetime.utcnow()},
+                '$unset': {'lease_owner': '', 'lease_until': ''}
+            }
+        )
+        logger.info("Cleared %d cached entries for user %s", deleted, job['user_id'])
+        ran += 1
+
+
+class CleanupScheduler:
+    """Per-worker daemon threads: a cleanup pass every interval, user clears on demand"""
+
+    # Also look for clears queued on other workers (or orphaned) this often
+    CLEAR_POLL_SECONDS = 60
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('CACHE_CLEANUP_INTERVAL_SECONDS', 3600)
+        self.pid = os.getpid()
+        self._wake = threading.Event()
+        self._clear_wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='cache-cleanup', daemon=True)
+        self._clear_thread = threading.Thread(target=self._run_clears, name='cache-clear', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._clear_thread.start()
+
+    def trigger(self):
+        """Run a pass now instead of at the next interval"""
+        self._wake.set()
+
+    def trigger_clears(self):
+        """Run queued user clears now"""
+        self._clear_wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._clear_wake.set()
+
+    def _run(self):
+        # Spread workers out so they do not all reach for the lease together
+        self._wake.wait(timeout=self.interval * (0.1 + 0.4 * (os.getpid() % 10) / 10))
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                cleaner_for(self.app).run_pass(stop_event=self._stop)
+            except Exception:
+                logger.exception("Cache cleanup pass failed")
+            self._wake.wait(timeout=self.interval)
+
+    def _run_clears(self):
+        while not self._stop.is_set():
+            self._clear_wake.clear()
+            try:
+                clears_for(self.app)
+            except Exception:
+                logger.exception("User cache clear failed")
+            self._clear_wake.wait(timeout=self.CLEAR_POLL_SECONDS)
+
+
+def clears_for(app):
+    """Run the queued user clears with the app's cleanup settings"""
+    return run_user_clears(
+        app.db,
+        batch_size=app.config.get('CACHE_CLEANUP_BATCH_SIZE', 1000),
+        pause_seconds=app.config.get('CACHE_CLEANUP_BATCH_PAUSE_SECONDS', 0.2),
+        lease_seconds=app.config.get('CACHE_CLEANUP_LEASE_SECONDS', 300)
+    )
+
+
+def _run_once(name, fn, *args):
+    def target():
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("%s failed", name)
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+
+def start_user_clears(app):
+    """Run the queued user clears on a one-off thread (workers without a scheduler)"""
+    _run_once('cache-clear', clears_for, app)
+
+
+def start_pass(app):
+    """Run a cleanup pass on a one-off thread (workers without a scheduler)"""
+    _run_once('cache-cleanup', lambda: cleaner_for(app).run_pass())
+
+
+def cleaner_for(app):
+    return CacheCleaner(
+        app.db,
+        batch_size=app.config.get('CACHE_CLEANUP_BATCH_SIZE', 1000),
+        pause_seconds=app.config.get('CACHE_CLEANUP_BATCH_PAUSE_SECONDS', 0.2),
+        lease_seconds=app.config.get('CACHE_CLEANUP_LEASE_SECONDS', 300)
+    )
+
+
+_lock = threading.Lock()
+
+
+def get_scheduler(app):
+    """This process's scheduler, started on first use (None when disabled)"""
+    if not app.config.get('CACHE_CLEANUP_ENABLED', True):
+        return None
+
+    scheduler = app.extensions.get('cache_cleanup')
+    if scheduler is None or scheduler.pid != os.getpid():
+        with _lock:
+            scheduler = app.extensions.get('cache_cleanup')
+            if scheduler is None or scheduler.pid != os.getpid():
+                scheduler = CleanupScheduler(app)
+                scheduler.start()
+                app.extensions['cache_cleanup'] = scheduler
+    return scheduler
+
+
+def init_app(app):
+    """Start the worker's scheduler with its first request"""
+    if not app.config.get('CACHE_CLEANUP_ENABLED', True):
+        return
+
+    @app.before_request
+    def _start_cache_cleanup():
+        if app.extensions.get('cache_cleanup') is None:
+            get_scheduler(app)
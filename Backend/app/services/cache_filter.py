@@ -0,0 +1,204 @@
+"""
+Cache Key Filter
+In-memory Bloom filter of tone_cache _ids that lets misses skip Mongo
+
+Most first-time texts are not cached, yet each one costs a tone_cache read
+before the LLM call. Each worker keeps a Bloom filter of the live entry
+_ids: when neither the user's nor the global _id for a key is in it, the
+entry did not exist at the filter's last refresh and the read is skipped.
+Entries this worker writes are added immediately.
+
+A background thread, started with the worker's first request, loads the
+filter and then keeps it current two ways. Every CACHE_FILTER_REFRESH_SECONDS
+it adds the _ids created since the previous refresh (one range read on the
+created_at index), so entries written by other workers and instances show
+up within seconds. Every CACHE_FILTER_REBUILD_SECONDS it rebuilds the filter
+from live entries only, which drops expired keys. An entry another worker
+wrote since the last refresh can still be reported absent; that costs one
+extra generation, and the upsert keeps the stored response, so it is never
+a wrong answer. Before the first load finishes every key passes.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+
+from app.models.tone_cache import ToneCache
+from app.utils import metrics
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+class CacheKeyFilter:
+    """Rebuildable Bloom filter over tone_cache _ids"""
+
+    # Re-read this much before the last refresh: covers clock skew between
+    # instances and inserts that were in flight during the previous read
+    REFRESH_OVERLAP_SECONDS = 5
+
+    def __init__(self, app):
+        self.app = app
+        self.capacity = app.config.get('CACHE_FILTER_CAPACITY', 1000000)
+        self.error_rate = app.config.get('CACHE_FILTER_ERROR_RATE', 0.01)
+        self.rebuild_interval = app.config.get('CACHE_FILTER_REBUILD_SECONDS', 600)
+        self.refresh_interval = app.config.get('CACHE_FILTER_REFRESH_SECONDS', 2)
+        self.pid = os.getpid()
+        self._bloom = None
+        self._refreshed_at = None
+        self._added_during_rebuild = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='cache-filter', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    def might_contain(self, entry_id: str) -> bool:
+        bloom = self._bloom
+        return bloom is None or entry_id in bloom
+
+    def add(self, entry_id: str):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(entry_id)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(entry_id)
+
+    def rebuild(self):
+        """Load every live _id into a new filter and swap it in"""
+        started = time.perf_counter()
+        with self._lock:
+            self._added_during_rebuild = []
+
+        try:
+            db = self.app.db
+            refreshed_at = datetime.utcnow()
+            live = {'expires_at': {'$gt': refreshed_at}}
+            capacity = max(self.capacity, 2 * db.tone_cache.count_documents(live))
+            bloom = BloomFilter(capacity, self.error_rate)
+            for entry in db.tone_cache.find(live, {'_id': 1}).batch_size(10000):
+                bloom.add(str(entry['_id']))
+        except Exception:
+            with self._lock:
+                self._added_during_rebuild = None
+            raise
+
+        with self._lock:
+            for entry_id in self._added_during_rebuild:
+                bloom.add(entry_id)
+            self._added_during_rebuild = None
+            self._bloom = bloom
+        self._refreshed_at = refreshed_at
+
+        metrics.TONE_CACHE_FILTER_ENTRIES.set(bloom.count)
+        metrics.TONE_CACHE_FILTER_ERROR_RATE.set(round(bloom.estimated_error_rate(), 6))
+        logger.info(
+            "Cache filter rebuilt: %d keys, %d KiB, %d hashes in %.2fs",
+            bloom.count, bloom.size // 8192, bloom.hashes, time.perf_counter() - started
+        )
+
+    def refresh(self):
+        """Add the _ids created since the last refresh or rebuild"""
+        if self._bloom is None:
+            return 0
+
+        refreshed_at = datetime.utcnow()
+        since = self._refreshed_at - timedelta(seconds=self.REFRESH_OVERLAP_SECONDS)
+        added = 0
+        for entry in self.app.db.tone_cache.find({'created_at': {'$gte': since}}, {'_id': 1}):
+            self.add(str(entry['_id']))
+            added += 1
+        self._refreshed_at = refreshed_at
+        return added
+
+    def _run(self):
+        next_rebuild = 0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= next_rebuild:
+                    self.rebuild()
+                    next_rebuild = time.monotonic() + self.rebuild_interval
+                else:
+                    self.refresh()
+            except Exception:
+                logger.exception("Cache filter update failed")
+            self._stop.wait(timeout=self.refresh_interval)
+
+
+_lock = threading.Lock()
+
+
+def get_cache_filter(app):
+    """This process's filter, started on first use (None when disabled)"""
+    if not app.config.get('CACHE_FILTER_ENABLED', True):
+        return None
+
+    key_filter = app.extensions.get('cache_filter')
+    if key_filter is None or key_filter.pid != os.getpid():
+        with _lock:
+            key_filter = app.extensions.get('cache_filter')
+            if key_filter is None or key_filter.pid != os.getpid():
+                key_filter = CacheKeyFilter(app)
+                key_filter.start()
+                app.extensions['cache_filter'] = key_filter
+    return key_filter
+
+
+def _current():
+    if not has_app_context():
+        return None
+    return get_cache_filter(current_app._get_current_object())
+
+
+def possible_keys(cache_keys, user_id=None):
+    """
+    cache_keys with the ones definitely not in tone_cache replaced by None
+
+    A key passes when the user's or the global entry may exist.
+    """
+    key_filter = _current()
+    if key_filter is None or not key_filter.ready:
+        return list(cache_keys)
+
+    result = []
+    for cache_key in cache_keys:
+        if cache_key and not (
+            key_filter.might_contain(ToneCache.entry_id(cache_key))
+            or (user_id and key_filter.might_contain(ToneCache.entry_id(cache_key, user_id)))
+        ):
+            metrics.TONE_CACHE_FILTER_CHECKS.labels('skipped').inc()
+            result.append(None)
+            continue
+        if cache_key:
+            metrics.TONE_CACHE_FILTER_CHECKS.labels('passed').inc()
+        result.append(cache_key)
+    return result
+
+
+def record_write(entry_id):
+    """Add an entry this worker just wrote"""
+    key_filter = _current()
+    if key_filter is not None:
+        key_filter.add(entry_id)
+
+
+def init_app(app):
+    """Start loading the worker's filter with its first request"""
+    if not app.config.get('CACHE_FILTER_ENABLED', True):
+        return
+
+    @app.before_request
+    def _start_cache_filter():
+        if app.extensions.get('cache_filter') is None:
+            get_cache_filter(app)
@@ -0,0 +1,312 @@
+"""
+LLM Provider Interface
+Pluggable chat-completion backends for the tone services
+"""
+import asyncio
+import functools
+import hashlib
+import random
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+from flask import current_app
+
+
+class LLMError(Exception):
+    """Raised when a provider fails to produce a completion"""
+
+
+class LLMCompletion:
+    """Provider-independent chat completion result"""
+
+    __slots__ = ('content', 'model', 'prompt_tokens', 'completion_tokens')
+
+    def __init__(self, content: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.content = content
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def usage(self) -> Dict[str, int]:
+        """Token usage in the shape returned by the API"""
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens
+        }
+
+
+class LLMProvider:
+    """Base class for chat-completion providers"""
+
+    name = 'base'
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1
+    ) -> LLMCompletion:
+        """Return a full completion for the given chat messages"""
+        raise NotImplementedError
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1
+    ) -> Iterator[str]:
+        """Yield the completion as text chunks"""
+        raise NotImplementedError
+    
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        top_p: float = 1
+    ) -> LLMCompletion:
+        """Async complete(); providers without an async client run it in a thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            self.complete, messages, temperature=temperature, max_tokens=max_tokens, top_p=top_p
+        ))
+
+
+class GroqProvider(LLMProvider):
+    """Groq cloud API (default provider)"""
+
+    name = 'groq'
+
+    def __init__(self, api_key: str, model: str):
+        super().__init__(model)
+
+        if not api_key:
+            raise ValueError("Groq API key is required")
+
+        from groq import Groq
+        self.api_key = api_key
+        self.client = Groq(api_key=api_key)
+        self._async_client = None
+
+    def complete(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=False
+        )
+        return self._completion(response)
+
+    async def acomplete(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        # Created on first use, on the event loop that will drive it
+        if self._async_client is None:
+            from groq import AsyncGroq
+            self._async_client = AsyncGroq(api_key=self.api_key)
+
+        response = await self._async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=False
+        )
+        return self._completion(response)
+
+    def _completion(self, response):
+        return LLMCompletion(
+            content=response.choices[0].message.content,
+            model=self.model,
+            prompt_tokens=response.usage.prompt_tokens,
+            completion_tokens=response.usage.completion_tokens
+        )
+
+    def stream(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=top_p,
+            stream=True
+        )
+
+        for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class LocalProvider(LLMProvider):
+    """
+    Deterministic local stand-in for load tests, benchmarks and staging
+
+    Output text is derived from a hash of the prompt, so the same request
+    always produces the same completion. Latency, token usage, error rate
+    and streaming pacing are configurable; only latency jitter and injected
+    errors use the (seeded) random generator.
+    """
+
+    name = 'local'
+
+    WORDS = (
+        'thanks', 'for', 'the', 'update', 'please', 'let', 'me', 'know', 'if',
+        'we', 'can', 'meet', 'tomorrow', 'happy', 'to', 'help', 'with', 'this',
+        'sounds', 'great', 'appreciate', 'your', 'time', 'looking', 'forward'
+    )
+
+    def __init__(
+        self,
+        model: str = 'local-stand-in',
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        latency_distribution: str = 'fixed',
+        error_rate: float = 0.0,
+        tokens_per_word: float = 1.3,
+        stream_chunk_words: int = 4,
+        stream_chunk_delay_ms: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        super().__init__(model)
+
+        if latency_distribution not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.tokens_per_word = tokens_per_word
+        self.stream_chunk_words = max(1, stream_chunk_words)
+        self.stream_chunk_delay_ms = stream_chunk_delay_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def complete(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        self._simulate_call()
+        return self._completion(messages, max_tokens)
+
+    async def acomplete(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        delay = self.sample_latency()
+        if delay:
+            await asyncio.sleep(delay)
+        self._maybe_fail()
+        return self._completion(messages, max_tokens)
+
+    def stream(self, messages, temperature=0.7, max_tokens=1024, top_p=1):
+        self._simulate_call()
+        words = self._render(messages, max_tokens).split(' ')
+
+        for i in range(0, len(words), self.stream_chunk_words):
+            if self.stream_chunk_delay_ms:
+                time.sleep(self.stream_chunk_delay_ms / 1000.0)
+            chunk = ' '.join(words[i:i + self.stream_chunk_words])
+            yield chunk if i == 0 else ' ' + chunk
+
+    def sample_latency(self) -> float:
+        """Draw one call latency in seconds from the configured distribution"""
+        base = self.latency_ms
+        jitter = self.latency_jitter_ms
+
+        with self._lock:
+            if self.latency_distribution == 'uniform':
+                value = self._random.uniform(base - jitter, base + jitter)
+            elif self.latency_distribution == 'normal':
+                value = self._random.gauss(base, jitter)
+            elif self.latency_distribution == 'lognormal':
+                # Long-tailed, median ~= latency_ms; jitter controls the spread
+                sigma = jitter / base if base else 0.0
+                value = base * self._random.lognormvariate(0.0, sigma)
+            else:
+                value = base
+
+        return max(0.0, value) / 1000.0
+
+    def _simulate_call(self):
+        delay = self.sample_latency()
+        if delay:
+            time.sleep(delay)
+        self._maybe_fail()
+
+    def _maybe_fail(self):
+        if self.error_rate:
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                raise LLMError('Local provider injected failure')
+
+    def _completion(self, messages, max_tokens):
+        content = self._render(messages, max_tokens)
+        return LLMCompletion(
+            content=content,
+            model=self.model,
+            prompt_tokens=self._count_tokens(' '.join(m['content'] for m in messages)),
+            completion_tokens=self._count_tokens(content)
+        )
+
+    def _render(self, messages, max_tokens):
+        """Build a deterministic completion for the prompt"""
+        prompt = '\n'.join(m['content'] for m in messages)
+
+        # Keep the emotion/intent parser in routes/text.py happy
+        if 'Emotion: [emotion]' in prompt:
+            return 'Emotion: neutral\nIntent: inform'
+
+        user_text = messages[-1]['content']
+        digest = hashlib.md5(prompt.encode('utf-8')).digest()
+        target_words = max(3, min(len(user_text.split()), int(max_tokens / self.tokens_per_word)))
+
+        words = [self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(target_words)]
+        words[0] = words[0].capitalize()
+        return ' '.join(words) + '.'
+
+    def _count_tokens(self, text):
+        return max(1, int(len(text.split()) * self.tokens_per_word))
+
+
+def create_llm_provider(config) -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER in config"""
+    provider = config.get('LLM_PROVIDER', 'groq')
+
+    if provider == 'groq':
+        return GroqProvider(
+            api_key=config.get('GROQ_API_KEY'),
+            model=config.get('GROQ_MODEL', 'llama-3.3-70b-versatile')
+        )
+
+    if provider == 'local':
+        return LocalProvider(
+            model=config.get('LOCAL_LLM_MODEL', 'local-stand-in'),
+            latency_ms=config.get('LOCAL_LLM_LATENCY_MS', 0.0),
+            latency_jitter_ms=config.get('LOCAL_LLM_LATENCY_JITTER_MS', 0.0),
+            latency_distribution=config.get('LOCAL_LLM_LATENCY_DISTRIBUTION', 'fixed'),
+            error_rate=config.get('LOCAL_LLM_ERROR_RATE', 0.0),
+            tokens_per_word=config.get('LOCAL_LLM_TOKENS_PER_WORD', 1.3),
+            stream_chunk_words=config.get('LOCAL_LLM_STREAM_CHUNK_WORDS', 4),
+            stream_chunk_delay_ms=config.get('LOCAL_LLM_STREAM_CHUNK_DELAY_MS', 0.0),
+            seed=config.get('LOCAL_LLM_SEED')
+        )
+
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def get_llm_provider() -> LLMProvider:
+    """Return the provider for the current app, creating it on first use"""
+    provider = current_app.extensions.get('llm_provider')
+    if provider is None:
+        provider = create_llm_provider(current_app.config)
+        current_app.extensions['llm_provider'] = provider
+    return provider
@@ -0,0 +1,159 @@
+"""
+Tone Disk Cache
+Host-local tone_cache tier in front of MongoDB
+
+Every worker on a host shares one SQLite file (app/utils/disk_cache.py).
+It is checked before tone_cache and filled from Mongo hits and new
+generations, so repeat requests on the host are answered without a Mongo
+round-trip and still hit while Mongo is slow or unreachable. For a
+single-node deployment it holds the working set on local disk.
+
+Entries are stored under the scope of the request, 'g:<cache_key>' or
+'u:<user_id>:<cache_key>', holding whichever Mongo entry that request
+resolved to, so a user never sees the global entry where Mongo would
+have returned their own. They live for at most DISK_CACHE_TTL_SECONDS,
+which bounds how long a host can serve an entry that was cleared or
+rewritten elsewhere. The tier is best-effort: any SQLite error is logged
+and treated as a miss.
+
+The a*() variants are for AsyncToneShifterService: they run the SQLite
+calls in the event loop's executor, so a busy file or an eviction pass
+never stalls the other requests on the loop.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from datetime import timezone
+
+from flask import current_app, has_app_context
+
+from app.models.tone_cache import ToneCache
+from app.utils import metrics
+from app.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FIELDS = ('cache_key', 'text', 'response', 'hit_count')
+
+_lock = threading.Lock()
+
+
+def get_disk_cache(app):
+    """The host's disk cache (None when disabled or the file cannot be opened)"""
+    if not app.config.get('DISK_CACHE_ENABLED', False):
+        return None
+
+    if 'disk_cache' not in app.extensions:
+        with _lock:
+            if 'disk_cache' not in app.extensions:
+                path = app.config.get('DISK_CACHE_PATH') or os.path.join(app.instance_path, 'tone_cache.sqlite3')
+                try:
+                    app.extensions['disk_cache'] = DiskCache(
+                        path,
+                        max_bytes=app.config.get('DISK_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+                        timeout=app.config.get('DISK_CACHE_TIMEOUT_SECONDS', 0.05)
+                    )
+                except Exception:
+                    logger.exception("Disk cache unavailable at %s, continuing without it", path)
+                    app.extensions['disk_cache'] = None
+    return app.extensions['disk_cache']
+
+
+def _current():
+    if not has_app_context():
+        return None
+    return get_disk_cache(current_app._get_current_object())
+
+
+def lookup(cache_keys, user_id=None):
+    """
+    Disk entries for cache_keys in the request's scope
+
+    Returns:
+        {cache_key: entry} for the keys found (empty when disabled)
+    """
+    cache = _current()
+    keys = [key for key in cache_keys if key]
+    if cache is None or not keys:
+        return {}
+
+    started = time.perf_counter()
+    try:
+        found = cache.get_many([ToneCache.entry_id(key, user_id) for key in keys])
+    except Exception as e:
+        logger.warning("Disk cache lookup failed: %s", e)
+        return {}
+    finally:
+        metrics.DISK_CACHE_LATENCY.labels('lookup').observe(time.perf_counter() - started)
+
+    entries = {}
+    for key in keys:
+        entry = found.get(ToneCache.entry_id(key, user_id))
+        if entry is None:
+            metrics.TONE_CACHE_LOOKUPS.labels('disk', 'miss').inc()
+        else:
+            entries[key] = entry
+    return entries
+
+
+def store(cache_key, user_id, entry):
+    """Keep a Mongo entry (or new cache doc) for the request's scope"""
+    cache = _current()
+    if cache is None or not cache_key:
+        return
+
+    ttl = current_app.config.get('DISK_CACHE_TTL_SECONDS', 86400)
+    expires_at = time.time() + ttl
+    if entry.get('expires_at'):
+        expires_at = min(expires_at, entry['expires_at'].replace(tzinfo=timezone.utc).timestamp())
+
+    started = time.perf_counter()
+    try:
+        cache.set(ToneCache.entry_id(cache_key, user_id), {k: entry.get(k) for k in ENTRY_FIELDS}, expires_at)
+    except Exception as e:
+        logger.warning("Disk cache write failed: %s", e)
+    finally:
+        metrics.DISK_CACHE_LATENCY.labels('store').observe(time.perf_counter() - started)
+
+
+def store_many(entries, user_id=None):
+    """store() each {cache_key: entry}"""
+    for cache_key, entry in entries.items():
+        store(cache_key, user_id, entry)
+
+
+def _off_loop(fn, *args):
+    """Run fn in the loop's executor, keeping the app context"""
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return asyncio.get_running_loop().run_in_executor(None, call)
+
+
+async def alookup(cache_keys, user_id=None):
+    """lookup() off the event loop"""
+    if _current() is None:
+        return {}
+    return await _off_loop(lookup, cache_keys, user_id)
+
+
+async def astore_many(entries, user_id=None):
+    """store_many() off the event loop"""
+    if _current() is None or not entries:
+        return
+    await _off_loop(store_many, entries, user_id)
+
+
+def forget_user(user_id):
+    """Drop a user's entries on this host (other hosts keep theirs until they expire)"""
+    cache = _current()
+    if cache is None:
+        return 0
+    try:
+        return cache.delete_prefix(ToneCache.entry_id('', user_id))
+    except Exception as e:
+        logger.warning("Disk cache delete failed: %s", e)
+        return 0
+
@@ -1,16 +1,26 @@
 """
-Tone Shifting Service using Groq API
+Tone Shifting Service using a pluggable LLM provider (Groq by default)
 Real-time contextual tone transformation for text
 """
-import os
-from groq import Groq
 from typing import Dict, Optional
 from flask import current_app
 from app.models.tone_cache import ToneCache
-from datetime import datetime
+from app.services import cache_filter, tone_disk_cache
+from app.services.llm_provider import LLMProvider, GroqProvider, get_llm_provider
+from app.utils import metrics, tracing
+from app.utils.admission import Overloaded, get_admission_controller
+from app.utils.async_runtime import gather_or_cancel
+from app.utils.log import redact
+import asyncio
+import logging
+import time
+
+import pymongo
+
+logger = logging.getLogger(__name__)
 
 class ToneShifterService:
-    """Service for shifting text tone using Groq AI"""
+    """Service for shifting text tone using the configured LLM provider"""
     
     # Available tone presets
     TONE_PRESETS = {
@@ -29,17 +39,34 @@ class ToneShifterService:
         'genz': 'Gen-Z style with modern slang, abbreviations like "ngl", "fr", "lowkey", "tbh", emojis, and trendy expressions. Adapt formality based on context: use "honestly" and "pretty cool" for professional, "omg" and "fr fr" for friends, "aww" and "miss you" for family. Keep it authentic and contextually appropriate.',
     }
     
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, db=None):
-        """Initialize Groq client"""
-        self.api_key = api_key or current_app.config.get('GROQ_API_KEY')
-        self.model = model or current_app.config.get('GROQ_MODEL', 'llama-3.3-70b-versatile')
-        self.db = db  # MongoDB database instance for caching
-        self.use_cache = db is not None  # Enable cache if DB is provided
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        db=None,
+        provider: Optional[LLMProvider] = None
+    ):
+        """
+        Initialize the LLM provider
         
-        if not self.api_key:
-            raise ValueError("Groq API key is required")
+        Uses the app-wide provider selected by LLM_PROVIDER unless an explicit
+        provider is passed, or an api_key/model is given (Groq, for scripts).
+        """
+        if provider is None:
+            if api_key or model:
+                provider = GroqProvider(
+                    api_key=api_key or current_app.config.get('GROQ_API_KEY'),
+                    model=model or current_app.config.get('GROQ_MODEL', 'llama-3.3-70b-versatile')
+                )
+            else:
+                provider = get_llm_provider()
         
-        self.client = Groq(api_key=self.api_key)
+        self.provider = provider
+        self.model = provider.model
+        self.db = db  # MongoDB database instance for caching
+        self.use_cache = db is not None  # Enable cache if DB is provided
+        # Bound on each tone_cache read/write, so a slow Mongo costs a miss
+        self.cache_timeout = current_app.config.get('TONE_CACHE_TIMEOUT_SECONDS', 0.5) or None
     
     def shift_tone(
         self, 
@@ -67,106 +94,120 @@ class ToneShifterService:
             Dict containing transformed text and metadata
         """
         try:
-            print(f"[DEBUG] ToneShifter - Input: '{text[:50]}...', Tone: {target_tone}")
+            logger.debug("Shift tone: input=%s tone=%s", redact(text), target_tone)
             
             # Check cache first if enabled
+            cache_key = None
             if use_cache and self.use_cache:
                 cache_key = ToneCache.generate_cache_key(text, target_tone, context)
-                print(f"[DEBUG] Checking cache with key: {cache_key}")
+                logger.debug("Checking cache with key: %s", cache_key)
                 
-                cached_result = self.db.tone_cache.find_one({
-                    'cache_key': cache_key,
-                    '$or': [
-                        {'user_id': user_id},
-                        {'user_id': None}  # Global cache
-                    ],
-                    'expires_at': {'$gt': datetime.utcnow()}
-                })
+                on_disk = tone_disk_cache.lookup([cache_key], user_id).get(cache_key)
+                if on_disk:
+                    return self._from_cache(on_disk, text, tier='disk')
                 
+                cached_result = self._lookup(cache_key, user_id)
                 if cached_result:
-                    print(f"[CACHE HIT] Using cached response")
-                    ToneCache.increment_hit_count(self.db, cache_key)
-                    response = cached_result['response']
-                    response['cached'] = True
-                    response['cache_hit_count'] = cached_result.get('hit_count', 0) + 1
-                    return response
-            
-            # Get tone description
-            tone_description = self.TONE_PRESETS.get(
-                target_tone.lower(), 
-                target_tone
-            )
-            print(f"[DEBUG] Tone description: {tone_description}")
-            
-            # Build system prompt
-            system_prompt = self._build_system_prompt(
-                tone_description, 
-                preserve_meaning, 
-                context
-            )
-            
-            # Build user prompt
-            user_prompt = f"Original text: {text}"
+                    tone_disk_cache.store(cache_key, user_id, cached_result)
+                    return self._from_cache(cached_result, text)
+                
+                metrics.TONE_CACHE_LOOKUPS.labels('l2', 'miss').inc()
             
-            print(f"[DEBUG] Calling Groq API with model: {self.model}")
-            # Call Groq API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=1024,
-                top_p=1,
-                stream=False
+        except Exception as e:
+            logger.exception("Tone shift failed (tone=%s)", target_tone)
+            return self._failure(e, text, target_tone)
+        
+        return self._generate(text, target_tone, context, preserve_meaning, temperature, user_id, cache_key)
+    
+    def _lookup(self, cache_key: str, user_id: Optional[str]) -> Optional[Dict]:
+        """
+        The tone_cache entry for cache_key (hit count bumped), or None
+        
+        Bounded by cache_timeout. A slow or failed lookup counts as a miss,
+        as in shift_many(), so the text is generated instead.
+        """
+        if not cache_filter.possible_keys([cache_key], user_id)[0]:
+            return None
+        
+        cached_result = None
+        try:
+            with tracing.span('cache-lookup'), pymongo.timeout(self.cache_timeout):
+                cached_result = self.db.tone_cache.find_one(
+                    ToneCache.lookup_query(cache_key, user_id), sort=ToneCache.LOOKUP_SORT
+                )
+                if cached_result:
+                    ToneCache.increment_hit_count(self.db, cached_result['_id'])
+        except Exception as e:
+            logger.warning("Cache lookup failed, generating: %s", e)
+        return cached_result
+    
+    def shift_many(
+        self,
+        items: list,
+        context: Optional[str] = None,
+        preserve_meaning: bool = True,
+        temperature: float = 0.7,
+        user_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> list:
+        """
+        Shift several (text, target_tone) pairs with a single cache read
+        
+        All cache keys are resolved with one $in query on tone_cache (user
+        entries first, then global; keys the cache filter has never seen are
+        left out) and hit counts are bumped with one update; only the misses
+        are generated, once per distinct key.
+        
+        Returns:
+            Results in the order of items
+        """
+        keys = self._cache_keys(items, context, use_cache)
+        on_disk = tone_disk_cache.lookup(keys, user_id)
+        lookup_keys = cache_filter.possible_keys([None if key in on_disk else key for key in keys], user_id)
+        entries = {}
+        if any(lookup_keys):
+            try:
+                with tracing.span('cache-lookup'), pymongo.timeout(self.cache_timeout):
+                    entries = {e['_id']: e for e in self.db.tone_cache.find(ToneCache.lookup_many_query(lookup_keys, user_id))}
+            except Exception as e:
+                logger.warning("Batch cache lookup failed, generating all: %s", e)
+        
+        results, hits, misses = self._apply_cached(items, keys, entries, user_id, on_disk)
+        self._record_hits(hits, user_id)
+        
+        for key, indexes in misses.items():
+            text, target_tone = items[indexes[0]]
+            result = self._generate(
+                text, target_tone, context, preserve_meaning, temperature, user_id,
+                key if isinstance(key, str) else None
             )
-            
-            transformed_text = response.choices[0].message.content.strip()
-            print(f"[DEBUG] Got response: '{transformed_text[:50]}...'")
-            
-            result = {
-                'success': True,
-                'original_text': text,
-                'transformed_text': transformed_text,
-                'target_tone': target_tone,
-                'tone_description': tone_description,
-                'model_used': self.model,
-                'cached': False,
-                'usage': {
-                    'prompt_tokens': response.usage.prompt_tokens,
-                    'completion_tokens': response.usage.completion_tokens,
-                    'total_tokens': response.usage.total_tokens
-                }
-            }
-            
-            # Store in cache if enabled
-            if use_cache and self.use_cache:
-                try:
-                    cache_doc = ToneCache.create(text, target_tone, result, context, user_id)
-                    self.db.tone_cache.insert_one(cache_doc)
-                    print(f"[CACHE] Stored response in cache")
-                except Exception as cache_error:
-                    print(f"[WARNING] Failed to cache response: {cache_error}")
-            
-            return result
-            
+            for index in indexes:
+                results[index] = result
+        return results
+    
+    def _record_hits(self, hits: Dict, user_id: Optional[str]):
+        """
+        Bump the hit counts of shift_many()'s Mongo hits and copy them to disk
+        
+        Best-effort like the lookup: the results are already known, so a
+        slow or failed update is logged and the request carries on.
+        """
+        if not hits:
+            return
+        try:
+            with pymongo.timeout(self.cache_timeout):
+                ToneCache.increment_hit_counts(self.db, [entry['_id'] for entry in hits.values()])
         except Exception as e:
-            print(f"[ERROR] ToneShifter exception: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {
-                'success': False,
-                'error': str(e),
-                'original_text': text,
-                'target_tone': target_tone
-            }
+            logger.warning("Failed to count cache hits: %s", e)
+        tone_disk_cache.store_many(hits, user_id)
     
     def batch_shift(
         self, 
         texts: list, 
         target_tone: str,
-        context: Optional[str] = None
+        context: Optional[str] = None,
+        user_id: Optional[str] = None,
+        use_cache: bool = True
     ) -> list:
         """
         Shift tone for multiple texts
@@ -175,15 +216,13 @@ class ToneShifterService:
             texts: List of input texts
             target_tone: The desired tone
             context: Optional context
+            user_id: Optional user ID for personalized cache
+            use_cache: Whether to use caching (default: True)
         
         Returns:
             List of transformation results
         """
-        results = []
-        for text in texts:
-            result = self.shift_tone(text, target_tone, context)
-            results.append(result)
-        return results
+        return self.shift_many([(text, target_tone) for text in texts], context, user_id=user_id, use_cache=use_cache)
     
     def suggest_improvements(
         self, 
@@ -203,7 +242,162 @@ class ToneShifterService:
             Dict containing suggestions and analysis
         """
         try:
-            system_prompt = f"""You are a communication expert. Analyze the given text and provide:
+            completion = self._complete(
+                'suggest-improvements',
+                **self._suggestion_request(text, current_tone, target_audience)
+            )
+            return self._suggestion_result(text, current_tone, target_audience, completion)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'original_text': text
+            }
+    
+    def _from_cache(self, cached_result: Dict, text: str, tier: str = 'l2') -> Dict[str, any]:
+        """Count a cache hit and shape the stored response"""
+        logger.debug("Cache hit (%s): %s", tier, cached_result['cache_key'])
+        # Same key but different raw text: matched via normalisation
+        result_label = 'hit' if cached_result.get('text') == text else 'fuzzy_hit'
+        metrics.TONE_CACHE_LOOKUPS.labels(tier, result_label).inc()
+        response = dict(cached_result['response'])
+        response['cached'] = True
+        response['cache_hit_count'] = cached_result.get('hit_count', 0) + 1
+        return response
+    
+    def _cache_keys(self, items: list, context: Optional[str], use_cache: bool) -> list:
+        """Cache key per (text, target_tone) item; all None when caching is off"""
+        if not (use_cache and self.use_cache):
+            return [None] * len(items)
+        return [ToneCache.generate_cache_key(text, target_tone, context) for text, target_tone in items]
+    
+    def _apply_cached(self, items: list, keys: list, entries: Dict, user_id: Optional[str], on_disk: Dict):
+        """
+        Fill in results for items with a disk or tone_cache entry
+        
+        Returns:
+            (results, hits, misses): hits maps each cache key answered by
+            Mongo to its entry, for the hit counts and the disk tier; misses
+            maps each cache key (or the item index when uncached) to the
+            item indexes it answers
+        """
+        results = [None] * len(items)
+        hits = {}
+        misses = {}
+        for index, ((text, _), key) in enumerate(zip(items, keys)):
+            if key in on_disk:
+                results[index] = self._from_cache(on_disk[key], text, tier='disk')
+                continue
+            entry = ToneCache.pick(entries, key, user_id) if key else None
+            if entry:
+                results[index] = self._from_cache(entry, text)
+                hits[key] = entry
+                continue
+            if key:
+                metrics.TONE_CACHE_LOOKUPS.labels('l2', 'miss').inc()
+            misses.setdefault(key or index, []).append(index)
+        return results, hits, misses
+    
+    def _generate(
+        self,
+        text: str,
+        target_tone: str,
+        context: Optional[str],
+        preserve_meaning: bool,
+        temperature: float,
+        user_id: Optional[str],
+        cache_key: Optional[str]
+    ) -> Dict[str, any]:
+        """Call the LLM for a cache miss and store the result under cache_key"""
+        try:
+            tone_description, request = self._tone_request(text, target_tone, context, preserve_meaning, temperature)
+            
+            logger.debug("Calling %s provider with model: %s", self.provider.name, self.model)
+            completion = self._complete(metrics.tone_label(target_tone, self.TONE_PRESETS), **request)
+            result = self._result(text, target_tone, tone_description, completion)
+            
+            # Store in cache if enabled
+            if cache_key:
+                cache_doc = ToneCache.create(text, target_tone, result, context, user_id)
+                try:
+                    with tracing.span('cache-write'), pymongo.timeout(self.cache_timeout):
+                        ToneCache.upsert(self.db, cache_doc)
+                    cache_filter.record_write(cache_doc['_id'])
+                    logger.debug("Stored response in cache")
+                except Exception as cache_error:
+                    logger.warning("Failed to cache response: %s", cache_error)
+                # Also when the Mongo write failed: the host can still answer repeats
+                tone_disk_cache.store(cache_key, user_id, cache_doc)
+            
+            return result
+            
+        except Exception as e:
+            logger.exception("Tone shift failed (tone=%s)", target_tone)
+            return self._failure(e, text, target_tone)
+    
+    def _tone_request(
+        self,
+        text: str,
+        target_tone: str,
+        context: Optional[str],
+        preserve_meaning: bool,
+        temperature: float
+    ):
+        """Return the tone description and the provider arguments for a shift"""
+        # Get tone description
+        tone_description = self.TONE_PRESETS.get(
+            target_tone.lower(), 
+            target_tone
+        )
+        
+        # Build system prompt
+        system_prompt = self._build_system_prompt(
+            tone_description, 
+            preserve_meaning, 
+            context
+        )
+        
+        # Build user prompt
+        user_prompt = f"Original text: {text}"
+        
+        return tone_description, {
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            'temperature': temperature,
+            'max_tokens': 1024,
+            'top_p': 1
+        }
+    
+    def _result(self, text: str, target_tone: str, tone_description: str, completion) -> Dict[str, any]:
+        transformed_text = completion.content.strip()
+        logger.debug("Got response: %s", redact(transformed_text))
+        
+        return {
+            'success': True,
+            'original_text': text,
+            'transformed_text': transformed_text,
+            'target_tone': target_tone,
+            'tone_description': tone_description,
+            'model_used': self.model,
+            'cached': False,
+            'usage': completion.usage()
+        }
+    
+    @staticmethod
+    def _failure(error: Exception, text: str, target_tone: str) -> Dict[str, any]:
+        return {
+            'success': False,
+            'error': str(error),
+            'original_text': text,
+            'target_tone': target_tone
+        }
+    
+    @staticmethod
+    def _suggestion_request(text: str, current_tone: str, target_audience: Optional[str]) -> Dict:
+        system_prompt = f"""You are a communication expert. Analyze the given text and provide:
 1. Tone assessment (identify the current tone)
 2. Suggestions for improvement
 3. Alternative phrasings for key parts
@@ -214,32 +408,36 @@ Current perceived tone: {current_tone}
 
 Provide your analysis in a structured format."""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.5,
-                max_tokens=1024
-            )
-            
-            analysis = response.choices[0].message.content.strip()
-            
-            return {
-                'success': True,
-                'original_text': text,
-                'analysis': analysis,
-                'current_tone': current_tone,
-                'target_audience': target_audience
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'original_text': text
-            }
+        return {
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            'temperature': 0.5,
+            'max_tokens': 1024
+        }
+    
+    @staticmethod
+    def _suggestion_result(text: str, current_tone: str, target_audience: Optional[str], completion) -> Dict[str, any]:
+        return {
+            'success': True,
+            'original_text': text,
+            'analysis': completion.content.strip(),
+            'current_tone': current_tone,
+            'target_audience': target_audience
+        }
+    
+    def _complete(self, tone_label: str, **kwargs):
+        """Call the provider and record latency/token metrics"""
+        started = time.perf_counter()
+        try:
+            with tracing.span('llm'):
+                completion = self.provider.complete(**kwargs)
+        except Exception:
+            metrics.LLM_ERRORS.labels(self.provider.name, self.model).inc()
+            raise
+        metrics.record_llm_call(self.provider, tone_label, time.perf_counter() - started, completion)
+        return completion
     
     def _build_system_prompt(
         self, 
@@ -273,3 +471,203 @@ Rules:
     def get_available_tones(cls) -> Dict[str, str]:
         """Get all available tone presets"""
         return cls.TONE_PRESETS
+
+
+
+class AsyncToneShifterService(ToneShifterService):
+    """
+    Async variant of ToneShifterService for the request path
+    
+    Same prompts, cache layout and metrics; db is a Motor database and the
+    provider is called through acomplete(), so many shifts (and the batch
+    endpoints' fan-out) wait concurrently on one event loop. Run it through
+    app.utils.async_runtime; scripts keep using the sync service. The
+    disk tier is called inline: local SQLite reads take well under a
+    millisecond and its writes give up after DISK_CACHE_TIMEOUT_SECONDS.
+    
+    Uncached calls go through admission control and raise Overloaded
+    (instead of returning a failure result) when load is being shed.
+    """
+    
+    async def shift_tone(
+        self, 
+        text: str, 
+        target_tone: str, 
+        context: Optional[str] = None,
+        preserve_meaning: bool = True,
+        temperature: float = 0.7,
+        user_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict[str, any]:
+        """Async shift_tone(); see ToneShifterService.shift_tone"""
+        try:
+            logger.debug("Shift tone: input=%s tone=%s", redact(text), target_tone)
+            
+            cache_key = None
+            if use_cache and self.use_cache:
+                cache_key = ToneCache.generate_cache_key(text, target_tone, context)
+                
+                on_disk = (await tone_disk_cache.alookup([cache_key], user_id)).get(cache_key)
+                if on_disk:
+                    return self._from_cache(on_disk, text, tier='disk')
+                
+                cached_result = await self._lookup(cache_key, user_id)
+                if cached_result:
+                    await tone_disk_cache.astore_many({cache_key: cached_result}, user_id)
+                    return self._from_cache(cached_result, text)
+                
+                metrics.TONE_CACHE_LOOKUPS.labels('l2', 'miss').inc()
+            
+        except Exception as e:
+            logger.exception("Tone shift failed (tone=%s)", target_tone)
+            return self._failure(e, text, target_tone)
+        
+        return await self._generate(text, target_tone, context, preserve_meaning, temperature, user_id, cache_key)
+    
+    async def _lookup(self, cache_key: str, user_id: Optional[str]) -> Optional[Dict]:
+        """Async _lookup() (pymongo.timeout() carries over to Motor calls)"""
+        if not cache_filter.possible_keys([cache_key], user_id)[0]:
+            return None
+        
+        cached_result = None
+        try:
+            with tracing.span('cache-lookup'), pymongo.timeout(self.cache_timeout):
+                cached_result = await self.db.tone_cache.find_one(
+                    ToneCache.lookup_query(cache_key, user_id), sort=ToneCache.LOOKUP_SORT
+                )
+                if cached_result:
+                    await ToneCache.increment_hit_count(self.db, cached_result['_id'])
+        except Exception as e:
+            logger.warning("Cache lookup failed, generating: %s", e)
+        return cached_result
+    
+    async def shift_many(
+        self,
+        items: list,
+        context: Optional[str] = None,
+        preserve_meaning: bool = True,
+        temperature: float = 0.7,
+        user_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> list:
+        """Async shift_many(): one cache read, then the misses generated concurrently"""
+        keys = self._cache_keys(items, context, use_cache)
+        on_disk = await tone_disk_cache.alookup(keys, user_id)
+        lookup_keys = cache_filter.possible_keys([None if key in on_disk else key for key in keys], user_id)
+        entries = {}
+        if any(lookup_keys):
+            try:
+                with tracing.span('cache-lookup'), pymongo.timeout(self.cache_timeout):
+                    cursor = self.db.tone_cache.find(ToneCache.lookup_many_query(lookup_keys, user_id))
+                    entries = {e['_id']: e for e in await cursor.to_list(length=None)}
+            except Exception as e:
+                logger.warning("Batch cache lookup failed, generating all: %s", e)
+        
+        results, hits, misses = self._apply_cached(items, keys, entries, user_id, on_disk)
+        
+        # The hit bookkeeping is gathered apart from the generations, so it
+        # can never fail them, and one failed generation cancels the rest
+        generated, _ = await asyncio.gather(
+            gather_or_cancel(*(
+                self._generate(
+                    items[indexes[0]][0], items[indexes[0]][1], context, preserve_meaning, temperature, user_id,
+                    key if isinstance(key, str) else None
+                )
+                for key, indexes in misses.items()
+            )),
+            self._record_hits(hits, user_id)
+        )
+        for indexes, result in zip(misses.values(), generated):
+            for index in indexes:
+                results[index] = result
+        return results
+    
+    async def _record_hits(self, hits: Dict, user_id: Optional[str]):
+        """Async _record_hits()"""
+        if not hits:
+            return
+        try:
+            with pymongo.timeout(self.cache_timeout):
+                await ToneCache.increment_hit_counts(self.db, [entry['_id'] for entry in hits.values()])
+        except Exception as e:
+            logger.warning("Failed to count cache hits: %s", e)
+        await tone_disk_cache.astore_many(hits, user_id)
+    
+    async def batch_shift(
+        self, 
+        texts: list, 
+        target_tone: str,
+        context: Optional[str] = None,
+        user_id: Optional[str] = None,
+        use_cache: bool = True
+    ) -> list:
+        """Shift all texts with one cache read, misses concurrently; results keep the input order"""
+        return await self.shift_many([(text, target_tone) for text in texts], context, user_id=user_id, use_cache=use_cache)
+    
+    async def _generate(
+        self,
+        text: str,
+        target_tone: str,
+        context: Optional[str],
+        preserve_meaning: bool,
+        temperature: float,
+        user_id: Optional[str],
+        cache_key: Optional[str]
+    ) -> Dict[str, any]:
+        try:
+            tone_description, request = self._tone_request(text, target_tone, context, preserve_meaning, temperature)
+            completion = await self._complete(metrics.tone_label(target_tone, self.TONE_PRESETS), **request)
+            result = self._result(text, target_tone, tone_description, completion)
+            
+            if cache_key:
+                cache_doc = ToneCache.create(text, target_tone, result, context, user_id)
+                try:
+                    with tracing.span('cache-write'), pymongo.timeout(self.cache_timeout):
+                        await ToneCache.upsert(self.db, cache_doc)
+                    cache_filter.record_write(cache_doc['_id'])
+                except Exception as cache_error:
+                    logger.warning("Failed to cache response: %s", cache_error)
+                await tone_disk_cache.astore_many({cache_key: cache_doc}, user_id)
+            
+            return result
+            
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.exception("Tone shift failed (tone=%s)", target_tone)
+            return self._failure(e, text, target_tone)
+    
+    async def suggest_improvements(
+        self, 
+        text: str, 
+        current_tone: str,
+        target_audience: Optional[str] = None
+    ) -> Dict[str, any]:
+        try:
+            completion = await self._complete(
+                'suggest-improvements',
+                **self._suggestion_request(text, current_tone, target_audience)
+            )
+            return self._suggestion_result(text, current_tone, target_audience, completion)
+            
+        except Overloaded:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'original_text': text
+            }
+    
+    async def _complete(self, tone_label: str, **kwargs):
+        # Only uncached work gets here; raises Overloaded when shedding
+        with get_admission_controller().admit():
+            started = time.perf_counter()
+            try:
+                with tracing.span('llm'):
+                    completion = await self.provider.acomplete(**kwargs)
+            except Exception:
+                metrics.LLM_ERRORS.labels(self.provider.name, self.model).inc()
+                raise
+        metrics.record_llm_call(self.provider, tone_label, time.perf_counter() - started, completion)
+        return completion
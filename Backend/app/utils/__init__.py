@@ -1,10 +1,11 @@
 from app.utils.validators import validate_email_format, validate_password_strength, validate_name
-from app.utils.jwt_helper import generate_token, verify_token
+from app.utils.jwt_helper import generate_token, verify_token, revoke_user_tokens
 
 __all__ = [
     'validate_email_format',
     'validate_password_strength',
     'validate_name',
     'generate_token',
-    'verify_token'
+    'verify_token',
+    'revoke_user_tokens'
 ]
@@ -0,0 +1,151 @@
+"""
+Admission Control
+Load shedding for LLM work based on in-flight calls and observed latency
+
+Every uncached LLM call must be admitted first. The controller keeps an
+EWMA of LLM latency. While that stays under the target, up to
+ADMISSION_MAX_IN_FLIGHT calls may run. Above the target, the limit shrinks
+in proportion (never below ADMISSION_MIN_IN_FLIGHT, so the estimate keeps
+being refreshed). Work over the limit is rejected with Overloaded and
+becomes a 503 with Retry-After. Cache hits never reach the controller.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, jsonify
+
+from app.utils import metrics
+
+STATE_OK = 'ok'
+STATE_DEGRADED = 'degraded'
+STATE_OVERLOADED = 'overloaded'
+
+
+class Overloaded(Exception):
+    """Raised when new LLM work is shed"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Adaptive in-flight limit for LLM calls"""
+
+    def __init__(
+        self,
+        target_latency=5.0,
+        max_in_flight=64,
+        min_in_flight=2,
+        alpha=0.2,
+        overloaded_window=5.0,
+        max_retry_after=30
+    ):
+        self.target_latency = target_latency
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min(min_in_flight, max_in_flight)
+        self.alpha = alpha
+        self.overloaded_window = overloaded_window
+        self.max_retry_after = max_retry_after
+
+        self.in_flight = 0
+        self.latency = None  # EWMA in seconds, None until the first call completes
+        self._last_rejected = 0.0
+        self._lock = threading.Lock()
+        metrics.ADMISSION_LIMIT.set(max_in_flight)
+
+    @property
+    def limit(self) -> int:
+        if self.latency is None or self.latency <= self.target_latency:
+            return self.max_in_flight
+        return max(self.min_in_flight, int(self.max_in_flight * self.target_latency / self.latency))
+
+    @contextmanager
+    def admit(self):
+        """Hold an LLM slot for the enclosed call, or raise Overloaded"""
+        with self._lock:
+            limit = self.limit
+            if self.in_flight >= limit:
+                self._last_rejected = time.monotonic()
+                metrics.ADMISSION_REJECTED.inc()
+                raise Overloaded('Server is overloaded, please retry shortly', self.retry_after())
+            self.in_flight += 1
+            metrics.ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._finish(time.monotonic() - started)
+
+    def _finish(self, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.alpha * (seconds - self.latency)
+            metrics.ADMISSION_IN_FLIGHT.set(self.in_flight)
+            metrics.ADMISSION_LATENCY.set(self.latency)
+            metrics.ADMISSION_LIMIT.set(self.limit)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly one LLM round trip"""
+        return max(1, min(self.max_retry_after, math.ceil(self.latency or 1)))
+
+    def state(self) -> str:
+        if time.monotonic() - self._last_rejected < self.overloaded_window:
+            return STATE_OVERLOADED
+        if self.latency is not None and self.latency > self.target_latency:
+            return STATE_DEGRADED
+        return STATE_OK
+
+    def snapshot(self) -> dict:
+        """Load summary for /health"""
+        return {
+            'state': self.state(),
+            'in_flight': self.in_flight,
+            'limit': self.limit,
+            'llm_latency_ewma_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'target_latency_ms': round(self.target_latency * 1000, 1)
+        }
+
+
+class _NoAdmission:
+    """Stand-in when admission control is disabled"""
+
+    @contextmanager
+    def admit(self):
+        yield
+
+
+_NO_ADMISSION = _NoAdmission()
+
+
+def get_admission_controller():
+    """Controller of the current app (a no-op one when disabled)"""
+    return current_app.extensions.get('admission') or _NO_ADMISSION
+
+
+def overloaded_response(error):
+    """503 with Retry-After for shed requests"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def init_app(app):
+    if not app.config.get('ADMISSION_ENABLED', True):
+        app.extensions['admission'] = None
+        return
+
+    app.extensions['admission'] = AdmissionController(
+        target_latency=app.config.get('ADMISSION_TARGET_LATENCY_SECONDS', 5.0),
+        max_in_flight=app.config.get('ADMISSION_MAX_IN_FLIGHT', 64),
+        min_in_flight=app.config.get('ADMISSION_MIN_IN_FLIGHT', 2),
+        alpha=app.config.get('ADMISSION_EWMA_ALPHA', 0.2),
+        max_retry_after=app.config.get('ADMISSION_MAX_RETRY_AFTER_SECONDS', 30)
+    )
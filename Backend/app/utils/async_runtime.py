@@ -0,0 +1,94 @@
+"""
+Async Runtime
+Per-process event loop for the LLM-bound request path
+
+LLM-bound routes hand their work to one background event loop per worker.
+There the async Groq client and Motor keep their own connection pools, and
+any number of slow calls wait concurrently. The request thread only parks on
+a future, so it holds no socket and burns no CPU while the LLM is thinking.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+from flask import current_app
+
+
+class AsyncRuntime:
+    """Background event loop thread plus the async clients bound to it"""
+
+    def __init__(self, mongo_uri=None, timeout=None):
+        self.timeout = timeout
+        self._mongo_uri = mongo_uri
+        self._mongo = None
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-runtime', daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the loop and wait for its result
+
+        run_coroutine_threadsafe copies the caller's contextvars into the task,
+        so current_app, g and trace spans work inside the coroutine.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def gather(self, *coros, timeout=None):
+        """Run coroutines concurrently on the loop; results keep the argument order"""
+        return self.run(gather_or_cancel(*coros), timeout)
+
+    @property
+    def db(self):
+        """Motor database for MONGO_URI, created on first use"""
+        if self._mongo is None:
+            with self._lock:
+                if self._mongo is None:
+                    from motor.motor_asyncio import AsyncIOMotorClient
+                    from app.utils import metrics
+                    self._mongo = AsyncIOMotorClient(
+                        self._mongo_uri,
+                        io_loop=self._loop,
+                        event_listeners=[metrics.MongoCommandMetrics()]
+                    )
+        return self._mongo.get_default_database()
+
+    def shutdown(self):
+        if self._mongo is not None:
+            self._mongo.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+async def gather_or_cancel(*coros):
+    """asyncio.gather(), but the first failure cancels the coroutines still running"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+_create_lock = threading.Lock()
+
+
+def get_async_runtime() -> AsyncRuntime:
+    """Return the runtime for the current app, starting it on first use"""
+    runtime = current_app.extensions.get('async_runtime')
+    if runtime is None:
+        with _create_lock:
+            runtime = current_app.extensions.get('async_runtime')
+            if runtime is None:
+                runtime = AsyncRuntime(
+                    mongo_uri=current_app.config['MONGO_URI'],
+                    timeout=current_app.config.get('ASYNC_REQUEST_TIMEOUT_SECONDS', 55)
+                )
+                current_app.extensions['async_runtime'] = runtime
+    return runtime
@@ -0,0 +1,113 @@
+"""
+Bulkheads
+Size-limited concurrency pools so one class of routes cannot take every thread
+
+LLM-bound routes can wait seconds on Groq; DB-bound routes answer in
+milliseconds. Each pool caps how many request threads may be inside its
+routes at once, so a slow LLM can saturate only the 'llm' pool while auth,
+history and /health keep their threads. Work that can take seconds
+(bcrypt, exports, substring scans) gets its own small pool so it cannot
+fill the 'db' pool either. A saturated pool rejects right away (or after a
+short wait) with 503 and Retry-After.
+"""
+import threading
+from functools import wraps
+
+from flask import Response, current_app, jsonify
+
+from app.utils import metrics
+
+
+class Bulkhead:
+    """Bounded pool of concurrent request slots"""
+
+    def __init__(self, name, max_concurrent, max_wait=0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._in_use = metrics.BULKHEAD_IN_USE.labels(name)
+        self._rejected = metrics.BULKHEAD_REJECTED.labels(name)
+        metrics.BULKHEAD_CAPACITY.labels(name).set(max_concurrent)
+
+    def acquire(self) -> bool:
+        if self.max_wait:
+            acquired = self._slots.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+
+        if acquired:
+            self._in_use.inc()
+        else:
+            self._rejected.inc()
+        return acquired
+
+    def release(self):
+        self._in_use.dec()
+        self._slots.release()
+
+
+def bulkhead(pool):
+    """
+    Run the view inside the named pool; 503 immediately when it is full
+
+    pool may also be a callable returning the pool name for the current
+    request, for routes whose cost depends on their parameters.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            name = pool() if callable(pool) else pool
+            slots = current_app.extensions['bulkheads'][name]
+            if not slots.acquire():
+                response = jsonify({
+                    'error': 'Server is busy, please retry shortly',
+                    'pool': name
+                })
+                response.headers['Retry-After'] = str(current_app.config.get('BULKHEAD_RETRY_AFTER_SECONDS', 1))
+                return response, 503
+
+            try:
+                rv = f(*args, **kwargs)
+            except BaseException:
+                slots.release()
+                raise
+
+            if isinstance(rv, Response) and rv.is_streamed:
+                # A streamed body is produced after the view returns; hold the
+                # slot until the server closes the response
+                rv.call_on_close(slots.release)
+            else:
+                slots.release()
+            return rv
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    """Create the 'llm', 'db', 'auth', 'export' and 'search' pools from config"""
+    app.extensions['bulkheads'] = {
+        'llm': Bulkhead(
+            'llm',
+            app.config.get('BULKHEAD_LLM_MAX_CONCURRENT', 6),
+            app.config.get('BULKHEAD_LLM_MAX_WAIT_SECONDS', 0.0)
+        ),
+        'db': Bulkhead(
+            'db',
+            app.config.get('BULKHEAD_DB_MAX_CONCURRENT', 6),
+            app.config.get('BULKHEAD_DB_MAX_WAIT_SECONDS', 0.05)
+        ),
+        'auth': Bulkhead(
+            'auth',
+            app.config.get('BULKHEAD_AUTH_MAX_CONCURRENT', 2),
+            app.config.get('BULKHEAD_AUTH_MAX_WAIT_SECONDS', 1.0)
+        ),
+        'export': Bulkhead(
+            'export',
+            app.config.get('BULKHEAD_EXPORT_MAX_CONCURRENT', 1)
+        ),
+        'search': Bulkhead(
+            'search',
+            app.config.get('BULKHEAD_SEARCH_MAX_CONCURRENT', 1)
+        )
+    }
@@ -0,0 +1,185 @@
+"""
+Disk Cache
+Size-bounded key/value cache in a SQLite file shared by a host's processes
+
+SQLite in WAL mode lets every worker process on the host read the same
+file concurrently while one writes; readers never wait for a writer.
+Writes are best-effort: with a short busy timeout a write that cannot get
+the lock is dropped rather than queued behind another process.
+
+Values are JSON. Each entry has an absolute expiry and an access time;
+when the stored values exceed max_bytes the least recently accessed
+entries are evicted (checked every evict_every writes per process).
+Triggers keep the total size in a one-row table, so the check is a
+single-row read rather than a scan of every entry.
+Access times are only rewritten when older than touch_interval so that
+hot reads do not turn into writes.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS entries ('
+    ' key TEXT PRIMARY KEY,'
+    ' value TEXT NOT NULL,'
+    ' size INTEGER NOT NULL,'
+    ' expires_at REAL NOT NULL,'
+    ' accessed_at REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)',
+    'CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)',
+    'CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 1), total_size INTEGER NOT NULL)',
+    # Files created before the stats table existed are counted once
+    'INSERT OR IGNORE INTO stats (id, total_size) SELECT 1, COALESCE(SUM(size), 0) FROM entries',
+    'CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN'
+    ' UPDATE stats SET total_size = total_size + new.size WHERE id = 1; END',
+    'CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN'
+    ' UPDATE stats SET total_size = total_size + new.size - old.size WHERE id = 1; END',
+    'CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN'
+    ' UPDATE stats SET total_size = total_size - old.size WHERE id = 1; END'
+)
+
+# SQLite's default limit on host parameters per statement is 999
+MAX_PARAMS = 500
+
+
+class DiskCache:
+    """SQLite-backed LRU cache with per-entry expiry"""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, timeout=0.05, evict_every=100, touch_interval=60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.evict_every = evict_every
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # One transaction, so no write lands between the triggers and the count
+        conn = sqlite3.connect(path, timeout=max(timeout, 1.0), isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def _connection(self):
+        """This thread's connection (a forked child opens its own)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys):
+        """Live values for keys as {key: value}; missing and expired keys are left out"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        conn = self._connection()
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(keys), MAX_PARAMS):
+            chunk = keys[start:start + MAX_PARAMS]
+            rows = conn.execute(
+                f"SELECT key, value, accessed_at FROM entries "
+                f"WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                (*chunk, now)
+            ).fetchall()
+            for key, value, accessed_at in rows:
+                found[key] = json.loads(value)
+                if accessed_at < now - self.touch_interval:
+                    stale.append(key)
+
+        if stale:
+            try:
+                conn.execute(
+                    f"UPDATE entries SET accessed_at = ? WHERE key IN ({','.join('?' * len(stale))})",
+                    (now, *stale)
+                )
+            except sqlite3.OperationalError:
+                pass  # Busy: recency is approximate anyway
+        return found
+
+    def set(self, key, value, expires_at):
+        """Store value until expires_at (epoch seconds)"""
+        payload = json.dumps(value, separators=(',', ':'), default=str)
+        now = time.time()
+        # An upsert, not INSERT OR REPLACE: REPLACE's implicit delete skips the size triggers
+        self._connection().execute(
+            'INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+            'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+            (key, payload, len(payload), expires_at, now)
+        )
+
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def delete_prefix(self, prefix):
+        """Delete every key starting with prefix; returns the number deleted"""
+        return self._connection().execute(
+            'DELETE FROM entries WHERE key >= ? AND key < ?', (prefix, prefix + '\uffff')
+        ).rowcount
+
+    def evict(self):
+        """
+        Drop expired entries, then the least recently accessed ones until
+        the stored values fit in 90% of max_bytes
+
+        Returns:
+            Number of entries evicted for size
+        """
+        conn = self._connection()
+        conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+
+        excess = self.size() - int(self.max_bytes * 0.9)
+        evicted = 0
+        while excess > 0:
+            rows = conn.execute(
+                'SELECT key, size FROM entries ORDER BY accessed_at LIMIT ?', (MAX_PARAMS,)
+            ).fetchall()
+            if not rows:
+                break
+
+            victims = []
+            for key, size in rows:
+                victims.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.execute(f"DELETE FROM entries WHERE key IN ({','.join('?' * len(victims))})", victims)
+            evicted += len(victims)
+
+        if evicted:
+            logger.debug("Disk cache evicted %d entries", evicted)
+        return evicted
+
+    def size(self):
+        """Total bytes of stored values (the file itself is somewhat larger)"""
+        return self._connection().execute('SELECT total_size FROM stats WHERE id = 1').fetchone()[0]
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
@@ -0,0 +1,59 @@
+"""
+History Count Cache
+Short-TTL per-user cache of conversation_history totals
+
+Paging through history should not re-run count_documents on every scroll.
+Totals are cached per (user, filter) and dropped when that user's history
+changes in this worker; other workers may serve a total up to
+HISTORY_COUNT_CACHE_TTL_SECONDS old, which is why they are reported as
+not exact.
+"""
+from bson import json_util
+from flask import current_app
+
+from app.utils.ttl_cache import TTLCache
+
+_state = {'cache': None}
+
+
+def _cache():
+    cache = _state['cache']
+    if cache is None:
+        cache = TTLCache(
+            max_size=current_app.config.get('HISTORY_COUNT_CACHE_MAX_USERS', 10000),
+            ttl=current_app.config.get('HISTORY_COUNT_CACHE_TTL_SECONDS', 60)
+        )
+        _state['cache'] = cache
+    return cache
+
+
+def count_history(collection, user_id, query, exact=False, **count_options):
+    """
+    Total matching entries for a history filter
+
+    Returns:
+        (total, is_exact): a fresh count when exact is requested or nothing is
+        cached, otherwise the cached total
+    """
+    cache = _cache()
+    signature = json_util.dumps(query)
+    counts = cache.get(user_id)
+
+    if not exact and counts is not None and signature in counts:
+        return counts[signature], False
+
+    total = collection.count_documents(query, **count_options)
+    counts = dict(counts or {})
+    counts[signature] = total
+    cache.set(user_id, counts)
+    return total, True
+
+
+def invalidate_history_counts(user_id):
+    """Drop cached totals after a write to the user's history"""
+    _cache().pop(str(user_id))
+
+
+def clear():
+    if _state['cache'] is not None:
+        _state['cache'].clear()
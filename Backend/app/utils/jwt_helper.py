@@ -1,8 +1,16 @@
 import jwt
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
 from flask import current_app, request, jsonify
 from functools import wraps
-from app import mongo
+from app.utils import metrics, tracing
+from app.utils.ttl_cache import TTLCache
+from app.utils.user_cache import load_user
+
+_TOKEN_CACHE_HIT = metrics.JWT_CACHE_LOOKUPS.labels('hit')
+_TOKEN_CACHE_MISS = metrics.JWT_CACHE_LOOKUPS.labels('miss')
 
 def generate_token(user_id, email):
     """Generate JWT token"""
@@ -21,8 +29,95 @@ def generate_token(user_id, email):
     
     return token
 
-def verify_token(token):
-    """Verify JWT token"""
+class VerifiedTokenCache:
+    """
+    Bounded cache of verified token payloads
+    
+    Keyed by a SHA-256 digest of the token, so raw tokens are never kept.
+    Entries never outlive the token's own exp. A per-user index of digests
+    lets revoke_user() evict every cached token of one user; every max_size
+    puts it is swept of digests the cache has evicted or expired, so it
+    stays bounded by the cache rather than by every user ever seen.
+    """
+    
+    def __init__(self, max_size=10000, max_ttl=600):
+        self.max_ttl = max_ttl
+        self._cache = TTLCache(max_size=max_size, ttl=max_ttl)
+        self._by_user = {}
+        self._sweep_every = max_size
+        self._puts = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+    
+    def get(self, token):
+        key = self._key(token)
+        payload = self._cache.get(key)
+        if payload is not None and payload['exp'] <= time.time():
+            self._cache.pop(key)
+            return None
+        return payload
+    
+    def put(self, token, payload):
+        ttl = min(payload['exp'] - time.time(), self.max_ttl)
+        if ttl <= 0:
+            return
+        
+        key = self._key(token)
+        self._cache.set(key, payload, ttl=ttl)
+        
+        user_id = payload.get('user_id')
+        with self._lock:
+            self._by_user.setdefault(user_id, set()).add(key)
+            self._puts += 1
+            if self._puts % self._sweep_every == 0:
+                self._sweep()
+    
+    def _sweep(self):
+        """Forget digests that are no longer cached, and users left with none"""
+        for user_id in list(self._by_user):
+            live = {key for key in self._by_user[user_id] if key in self._cache}
+            if live:
+                self._by_user[user_id] = live
+            else:
+                del self._by_user[user_id]
+    
+    def revoke_user(self, user_id):
+        """Evict all cached tokens of a user; returns how many were dropped"""
+        with self._lock:
+            keys = self._by_user.pop(user_id, set())
+        return sum(1 for key in keys if self._cache.pop(key) is not None)
+    
+    def clear(self):
+        with self._lock:
+            self._by_user.clear()
+        self._cache.clear()
+
+
+_token_cache = {'cache': None}
+
+
+def _verified_tokens():
+    cache = _token_cache['cache']
+    if cache is None:
+        cache = VerifiedTokenCache(
+            max_size=current_app.config.get('JWT_CACHE_MAX_SIZE', 10000),
+            max_ttl=current_app.config.get('JWT_CACHE_MAX_TTL_SECONDS', 600)
+        )
+        _token_cache['cache'] = cache
+    return cache
+
+
+def clear_token_cache():
+    """Drop all cached token payloads"""
+    if _token_cache['cache'] is not None:
+        _token_cache['cache'].clear()
+
+
+def _decode_token(token):
+    """Full signature and expiry check"""
     try:
         payload = jwt.decode(
             token,
@@ -35,8 +130,36 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return False, 'Invalid token'
 
-def token_required(f):
-    """Decorator to protect routes with JWT authentication"""
+def verify_token(token):
+    """Verify JWT token (served from the verified-token cache when possible)"""
+    cache = _verified_tokens()
+    payload = cache.get(token)
+    if payload is not None:
+        _TOKEN_CACHE_HIT.inc()
+        return True, payload
+    
+    _TOKEN_CACHE_MISS.inc()
+    is_valid, payload = _decode_token(token)
+    if is_valid:
+        cache.put(token, payload)
+    return is_valid, payload
+
+def revoke_user_tokens(user_id):
+    """Evict every cached token of a user so the next request re-verifies"""
+    return _verified_tokens().revoke_user(user_id)
+
+def token_required(f=None, *, trust_claims=False):
+    """
+    Decorator to protect routes with JWT authentication
+    
+    With trust_claims=True (and AUTH_TRUST_JWT_CLAIMS enabled), the route
+    receives a user dict built from the verified token claims ('_id' and
+    'email' only) and no user lookup happens. Use it for routes that only
+    need the caller's id. Otherwise the user comes from the user cache.
+    """
+    if f is None:
+        return lambda func: token_required(func, trust_claims=trust_claims)
+    
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
@@ -53,27 +176,42 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Authentication token is missing'}), 401
         
-        # Verify token
-        is_valid, payload = verify_token(token)
-        
-        if not is_valid:
-            return jsonify({'error': payload}), 401
-        
-        # Get user from database
-        try:
-            from bson import ObjectId
-            user = mongo.db.users.find_one({'_id': ObjectId(payload['user_id'])})
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 401
+        with tracing.span('auth'):
+            # Verify token
+            is_valid, payload = verify_token(token)
             
-            # Convert ObjectId to string for JSON serialization
-            user['_id'] = str(user['_id'])
+            if not is_valid:
+                return jsonify({'error': payload}), 401
             
-            # Pass user to the route
-            return f(user, *args, **kwargs)
-            
-        except Exception as e:
-            return jsonify({'error': f'Authentication failed: {str(e)}'}), 401
+            if trust_claims and current_app.config.get('AUTH_TRUST_JWT_CLAIMS', False):
+                user = {'_id': payload['user_id'], 'email': payload.get('email')}
+            else:
+                # Get user from cache / database
+                try:
+                    user = load_user(payload['user_id'])
+                    
+                    if not user:
+                        return jsonify({'error': 'User not found'}), 401
+                    
+                except Exception as e:
+                    return jsonify({'error': f'Authentication failed: {str(e)}'}), 401
+        
+        # Pass user to the route
+        return f(user, *args, **kwargs)
+    
+    return decorated
+
+def admin_required(f):
+    """
+    Decorator for operator endpoints: a valid token whose user's email is
+    listed in ADMIN_EMAILS (403 otherwise; nobody when the list is empty)
+    """
+    @wraps(f)
+    @token_required
+    def decorated(current_user, *args, **kwargs):
+        admins = current_app.config.get('ADMIN_EMAILS', [])
+        if (current_user.get('email') or '').lower() not in admins:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
     
     return decorated
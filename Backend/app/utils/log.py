@@ -0,0 +1,160 @@
+"""
+Logging Setup
+Leveled, sampled, non-blocking logging for the request hot path
+
+Request threads only put records on a bounded in-memory queue; a single
+listener thread formats and writes them. When the queue is full records
+are dropped (and counted) instead of blocking the request. DEBUG records
+are sampled per message template, and user text is passed through
+redact() so it never reaches the log pipeline unless explicitly allowed.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from app.utils import tracing
+
+LOGGER_NAMESPACE = 'app'
+
+_settings = {'redact_text': True, 'preview_chars': 40}
+
+
+class Redacted:
+    """Lazy, redacted view of user text; only rendered if the record is emitted"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        text = self.text or ''
+        if _settings['redact_text']:
+            return f'<redacted {len(text)} chars>'
+        limit = _settings['preview_chars']
+        return repr(text[:limit] + ('...' if len(text) > limit else ''))
+
+
+def redact(text):
+    """Wrap user-supplied text for logging"""
+    return Redacted(text)
+
+
+class DebugSampler(logging.Filter):
+    """Keep one in every N DEBUG records per message template"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(1, int(round(1 / rate))) if rate > 0 else 0
+        self._counts = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        # Unlocked on purpose: an occasional miscount only shifts which line is kept
+        count = self._counts.get(record.msg, 0)
+        self._counts[record.msg] = count + 1
+        return count % self.every == 0
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID to every record"""
+
+    def filter(self, record):
+        record.request_id = tracing.current_request_id() or '-'
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Leave formatting to the listener thread; hot-path log args are
+        # strings, numbers or Redacted wrappers, so they are safe to defer
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _LogState:
+    handler = None
+    listener = None
+    lock = threading.Lock()
+
+
+def configure_logging(app):
+    """Route the app's loggers through a bounded queue and a listener thread"""
+    level = logging.getLevelName(app.config.get('LOG_LEVEL', 'INFO').upper())
+    _settings['redact_text'] = app.config.get('LOG_REDACT_TEXT', True)
+    _settings['preview_chars'] = app.config.get('LOG_PREVIEW_CHARS', 40)
+
+    if app.config.get('LOG_FORMAT', 'text') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s')
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000)))
+    handler.addFilter(DebugSampler(app.config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)))
+    handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    with _LogState.lock:
+        if _LogState.handler is not None:
+            logger.removeHandler(_LogState.handler)
+        if _LogState.listener is not None:
+            _LogState.listener.stop()
+
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = False
+
+        _LogState.handler = handler
+        _LogState.listener = QueueListener(handler.queue, stream, respect_handler_level=False)
+        _LogState.listener.start()
+
+
+def restart_listener():
+    """Start a fresh queue and listener thread (threads do not survive fork)"""
+    with _LogState.lock:
+        if _LogState.listener is None:
+            return
+        handlers = _LogState.listener.handlers
+        _LogState.handler.queue = queue.Queue(maxsize=_LogState.handler.queue.maxsize)
+        _LogState.listener = QueueListener(_LogState.handler.queue, *handlers, respect_handler_level=False)
+        _LogState.listener.start()
+
+
+def dropped_records():
+    return _LogState.handler.dropped if _LogState.handler else 0
@@ -0,0 +1,439 @@
+"""
+Prometheus-style metrics
+Counters, gauges and histograms rendered in the text exposition format
+
+Label children are created once and cached, so the hot path only does a
+dict lookup, a bisect and a couple of integer updates under a per-child
+lock (uncontended in practice). Modules that know their label values up
+front should bind children at import time and skip the lookup entirely.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+from app.utils import tracing
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class _Metric:
+    """Base class holding label children"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values):
+        """Return the child for these label values, creating it on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_str(self, values, extra=None):
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        inner = ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs)
+        return '{' + inner + '}'
+
+    @property
+    def sample_name(self):
+        return self.name
+
+    def render(self):
+        name = self.sample_name
+        lines = [f'# HELP {name} {self.documentation}', f'# TYPE {name} {self.kind}']
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _ValueChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _ValueChild()
+
+    @property
+    def sample_name(self):
+        return self.name + '_total'
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.sample_name}{self._label_str(values)} {child.value}']
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{self._label_str(values)} {child.value}']
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with fixed, preallocated buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_child(self, values, child):
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format_bound(bound)
+            lines.append(f'{self.name}_bucket{self._label_str(values, ("le", le))} {cumulative}')
+        lines.append(f'{self.name}_sum{self._label_str(values)} {total}')
+        lines.append(f'{self.name}_count{self._label_str(values)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together at /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return str(int(bound)) if float(bound).is_integer() and bound >= 1 else repr(float(bound))
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ==================== APPLICATION METRICS ====================
+
+REQUEST_LATENCY = Histogram(
+    'styletalk_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ('route', 'method')
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    'styletalk_http_requests_in_flight',
+    'HTTP requests currently being served by route',
+    ('route',)
+)
+
+LLM_LATENCY = Histogram(
+    'styletalk_llm_request_duration_seconds',
+    'LLM completion latency by provider, model and tone',
+    ('provider', 'model', 'tone')
+)
+
+LLM_TOKENS = Histogram(
+    'styletalk_llm_tokens',
+    'LLM token usage per call by model, tone and kind (prompt/completion)',
+    ('model', 'tone', 'kind'),
+    buckets=TOKEN_BUCKETS
+)
+
+LLM_ERRORS = Counter(
+    'styletalk_llm_errors',
+    'Failed LLM completions by provider and model',
+    ('provider', 'model')
+)
+
+# tier: disk = host-local SQLite tier, l2 = shared MongoDB tone_cache
+# result: hit, miss, fuzzy_hit (matched only after key normalisation)
+TONE_CACHE_LOOKUPS = Counter(
+    'styletalk_tone_cache_lookups',
+    'tone_cache lookups by tier and result',
+    ('tier', 'result')
+)
+
+JWT_CACHE_LOOKUPS = Counter(
+    'styletalk_jwt_cache_lookups',
+    'Verified-token cache lookups by result (hit skips jwt.decode)',
+    ('result',)
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'styletalk_password_hash_queue_depth',
+    'bcrypt jobs waiting for a hashing thread'
+)
+
+PASSWORD_HASH_IN_PROGRESS = Gauge(
+    'styletalk_password_hash_in_progress',
+    'bcrypt jobs currently running'
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    'styletalk_password_hash_rejected',
+    'Logins/registrations rejected because the hashing queue was full'
+)
+
+BULKHEAD_CAPACITY = Gauge(
+    'styletalk_bulkhead_capacity',
+    'Concurrent request slots per bulkhead pool',
+    ('pool',)
+)
+
+BULKHEAD_IN_USE = Gauge(
+    'styletalk_bulkhead_in_use',
+    'Request slots currently taken per bulkhead pool',
+    ('pool',)
+)
+
+BULKHEAD_REJECTED = Counter(
+    'styletalk_bulkhead_rejected',
+    'Requests rejected with 503 because their bulkhead pool was full',
+    ('pool',)
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'styletalk_admission_llm_in_flight',
+    'Admitted LLM calls currently running'
+)
+
+ADMISSION_LIMIT = Gauge(
+    'styletalk_admission_llm_limit',
+    'Current adaptive limit on concurrent LLM calls'
+)
+
+ADMISSION_LATENCY = Gauge(
+    'styletalk_admission_llm_latency_ewma_seconds',
+    'Smoothed LLM latency used by admission control'
+)
+
+ADMISSION_REJECTED = Counter(
+    'styletalk_admission_rejected',
+    'LLM calls shed by admission control'
+)
+
+CACHE_CLEANUP_SCANNED = Counter(
+    'styletalk_cache_cleanup_scanned',
+    'tone_cache entries examined by the batched cleanup'
+)
+
+CACHE_CLEANUP_DELETED = Counter(
+    'styletalk_cache_cleanup_deleted',
+    'Expired tone_cache entries deleted by the batched cleanup'
+)
+
+CACHE_CLEANUP_BATCH_SECONDS = Histogram(
+    'styletalk_cache_cleanup_batch_duration_seconds',
+    'Time to scan and delete one cleanup batch'
+)
+
+DISK_CACHE_LATENCY = Histogram(
+    'styletalk_disk_cache_operation_duration_seconds',
+    'Host-local SQLite tone cache latency by operation',
+    ('operation',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+TONE_CACHE_FILTER_CHECKS = Counter(
+    'styletalk_tone_cache_filter_checks',
+    'Cache keys checked against the Bloom filter; skipped = tone_cache read avoided',
+    ('result',)
+)
+
+TONE_CACHE_FILTER_ENTRIES = Gauge(
+    'styletalk_tone_cache_filter_entries',
+    'Keys in this worker\'s tone_cache Bloom filter'
+)
+
+TONE_CACHE_FILTER_ERROR_RATE = Gauge(
+    'styletalk_tone_cache_filter_false_positive_rate',
+    'Estimated false-positive rate of the Bloom filter at its last rebuild'
+)
+
+MONGO_LATENCY = Histogram(
+    'styletalk_mongo_operation_duration_seconds',
+    'MongoDB command latency by collection and command',
+    ('collection', 'command')
+)
+
+MONGO_ERRORS = Counter(
+    'styletalk_mongo_operation_errors',
+    'Failed MongoDB commands by collection and command',
+    ('collection', 'command')
+)
+
+for _tier in ('disk', 'l2'):
+    for _result in ('hit', 'miss', 'fuzzy_hit'):
+        TONE_CACHE_LOOKUPS.labels(_tier, _result)
+
+for _result in ('skipped', 'passed'):
+    TONE_CACHE_FILTER_CHECKS.labels(_result)
+
+
+def tone_label(tone, known_tones):
+    """Bound tone label cardinality: free-form tones collapse to 'custom'"""
+    tone = (tone or '').lower()
+    return tone if tone in known_tones else 'custom'
+
+
+def record_llm_call(provider, tone, seconds, completion):
+    """Record latency and token usage of one completion"""
+    LLM_LATENCY.labels(provider.name, provider.model, tone).observe(seconds)
+    LLM_TOKENS.labels(provider.model, tone, 'prompt').observe(completion.prompt_tokens)
+    LLM_TOKENS.labels(provider.model, tone, 'completion').observe(completion.completion_tokens)
+
+
+# ==================== FLASK / PYMONGO HOOKS ====================
+
+def init_app(app):
+    """Register request hooks and the /metrics endpoint"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_timer():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        in_flight = REQUESTS_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        g.metrics = (REQUEST_LATENCY.labels(route, request.method), in_flight, time.perf_counter())
+
+    @app.teardown_request
+    def _stop_request_timer(exc):
+        state = g.pop('metrics', None)
+        if state is None:
+            return
+        latency, in_flight, started = state
+        latency.observe(time.perf_counter() - started)
+        in_flight.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """PyMongo command listener feeding MONGO_LATENCY and request trace spans"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        command = event.command
+        target = command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = command.get('collection')
+        collection = target if isinstance(target, str) else '-'
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '-')
+        seconds = event.duration_micros / 1e6
+        MONGO_LATENCY.labels(collection, event.command_name).observe(seconds)
+        tracing.record(f'mongo-{collection}', seconds)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '-')
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_ERRORS.labels(collection, event.command_name).inc()
@@ -0,0 +1,86 @@
+"""
+Cursor Pagination
+Opaque keyset cursors for newest-first listings
+
+A cursor encodes the sort key of the last item on a page. The next page is
+a range query on an index ((created_at, _id) descending), so page N costs
+the same as page 1. Ranked results (text search) have no usable range key;
+their cursor carries an offset instead. Offsets (including legacy ?page=)
+are capped at MAX_OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+MAX_OFFSET = 1000
+
+
+class PaginationError(ValueError):
+    """Raised for malformed cursors and pages deeper than MAX_OFFSET"""
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise PaginationError('Invalid cursor') from e
+    if not isinstance(payload, dict):
+        raise PaginationError('Invalid cursor')
+    return payload
+
+
+def keyset_cursor(doc) -> str:
+    """Cursor pointing just past doc in (created_at, _id) descending order"""
+    return encode_cursor({
+        'c': doc['created_at'].isoformat(),
+        'i': str(doc['_id'])
+    })
+
+
+def offset_cursor(offset: int) -> str:
+    return encode_cursor({'o': offset})
+
+
+def keyset_filter(payload: dict) -> dict:
+    """Filter selecting documents strictly after the cursor position"""
+    try:
+        created_at = datetime.fromisoformat(payload['c'])
+        last_id = ObjectId(payload['i'])
+    except (KeyError, TypeError, ValueError, InvalidId) as e:
+        raise PaginationError('Invalid cursor') from e
+
+    return {'$or': [
+        {'created_at': {'$lt': created_at}},
+        {'created_at': created_at, '_id': {'$lt': last_id}}
+    ]}
+
+
+def cursor_offset(payload: dict) -> int:
+    offset = payload.get('o')
+    if not isinstance(offset, int) or not 0 <= offset <= MAX_OFFSET:
+        raise PaginationError('Invalid cursor')
+    return offset
+
+
+def check_offset(offset: int) -> int:
+    if offset > MAX_OFFSET:
+        raise PaginationError(f'Page too deep for offset paging (max offset {MAX_OFFSET}); use next_cursor')
+    return offset
+
+
+def clamp_limit(value, default, maximum) -> int:
+    """Parse a ?limit= value into 1..maximum"""
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
@@ -0,0 +1,100 @@
+"""
+Password Hashing
+bcrypt on a dedicated, bounded executor
+
+bcrypt is deliberately CPU-heavy. Running it on a small fixed pool caps
+how many request threads can be hashing at once, so a login storm cannot
+take over the worker; when the pool and its queue are full, callers get
+PasswordHasherBusy right away instead of piling up. A call that does not
+finish within the timeout raises PasswordHasherBusy too.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+from flask import current_app
+
+from app.utils import metrics
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash timed out"""
+
+    retry_after = 1
+
+
+class PasswordHasher:
+    """bcrypt hashing/verification on a bounded thread pool"""
+
+    def __init__(self, rounds=12, workers=2, max_queue=16, timeout=10.0):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def hash(self, password: str) -> bytes:
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds))
+
+    def verify(self, stored_password: bytes, provided_password: str) -> bool:
+        return self._run(bcrypt.checkpw, provided_password.encode('utf-8'), stored_password)
+
+    def needs_rehash(self, stored_password: bytes) -> bool:
+        """True if the hash was made with a different cost factor than configured"""
+        try:
+            return int(stored_password.split(b'$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            metrics.PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy('Too many concurrent logins, please retry shortly')
+
+        metrics.PASSWORD_HASH_QUEUE_DEPTH.inc()
+        try:
+            future = self._executor.submit(self._call, fn, *args)
+        except Exception:
+            metrics.PASSWORD_HASH_QUEUE_DEPTH.dec()
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if future.cancel():
+                # Never started, so _call will not release its slot
+                metrics.PASSWORD_HASH_QUEUE_DEPTH.dec()
+                self._slots.release()
+            metrics.PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy('Password hashing timed out, please retry shortly')
+
+    def _call(self, fn, *args):
+        metrics.PASSWORD_HASH_QUEUE_DEPTH.dec()
+        metrics.PASSWORD_HASH_IN_PROGRESS.inc()
+        try:
+            return fn(*args)
+        finally:
+            metrics.PASSWORD_HASH_IN_PROGRESS.dec()
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_create_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the hasher for the current app, creating it on first use"""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        with _create_lock:
+            hasher = current_app.extensions.get('password_hasher')
+            if hasher is None:
+                hasher = PasswordHasher(
+                    rounds=current_app.config.get('BCRYPT_ROUNDS', 12),
+                    workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                    max_queue=current_app.config.get('PASSWORD_HASH_MAX_QUEUE', 16),
+                    timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10.0)
+                )
+                current_app.extensions['password_hasher'] = hasher
+    return hasher
@@ -0,0 +1,159 @@
+"""
+Request Tracing
+Lightweight per-request spans, X-Request-ID and Server-Timing headers
+
+Spans are plain (name, start, duration) tuples appended to flask.g, so a
+span costs two perf_counter() calls and a list append. Outside a request
+context every helper is a no-op. Completed traces can optionally be
+exported, off the request thread, to a JSONL file or a local HTTP collector.
+"""
+import json
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as a span of the current request"""
+    if not has_request_context() or 'trace_spans' not in g:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.trace_spans.append((name, started, time.perf_counter() - started))
+
+
+def record(name, seconds):
+    """Record an already-measured span ending now"""
+    if has_request_context() and 'trace_spans' in g:
+        g.trace_spans.append((name, time.perf_counter() - seconds, seconds))
+
+
+def current_request_id():
+    if has_request_context():
+        return g.get('request_id')
+    return None
+
+
+def server_timing(spans, total):
+    """Build a Server-Timing header value, summing spans with the same name"""
+    totals = {}
+    counts = {}
+    for name, _, duration in spans:
+        totals[name] = totals.get(name, 0.0) + duration
+        counts[name] = counts.get(name, 0) + 1
+
+    parts = []
+    for name, duration in totals.items():
+        part = f'{name};dur={duration * 1000:.2f}'
+        if counts[name] > 1:
+            part += f';desc="x{counts[name]}"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class TraceExporter:
+    """Background exporter writing finished traces to JSONL or an HTTP collector"""
+
+    def __init__(self, path=None, url=None, batch_size=50, max_queue=10000):
+        self.path = path
+        self.url = url
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, trace):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # Started lazily so each (forked) worker process gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                self.dropped += len(batch)
+
+    def _write(self, batch):
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for trace in batch:
+                    f.write(json.dumps(trace) + '\n')
+        if self.url:
+            body = json.dumps({'traces': batch}).encode('utf-8')
+            req = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(req, timeout=2).close()
+
+
+def init_app(app):
+    """Register request hooks that attach request IDs and Server-Timing"""
+    exporter = None
+    if app.config.get('TRACE_EXPORT_PATH') or app.config.get('TRACE_EXPORT_URL'):
+        exporter = TraceExporter(
+            path=app.config.get('TRACE_EXPORT_PATH'),
+            url=app.config.get('TRACE_EXPORT_URL')
+        )
+    app.extensions['trace_exporter'] = exporter
+
+    @app.before_request
+    def _start_trace():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER, '')[:128] or uuid.uuid4().hex
+        g.trace_spans = []
+        g.trace_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_trace(response):
+        started = g.get('trace_started')
+        if started is None:
+            return response
+
+        total = time.perf_counter() - started
+        spans = g.trace_spans
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        response.headers['Server-Timing'] = server_timing(spans, total)
+
+        if exporter is not None:
+            exporter.export({
+                'request_id': g.request_id,
+                'method': request.method,
+                'route': request.url_rule.rule if request.url_rule else None,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 3),
+                'spans': [
+                    {'name': name, 'offset_ms': round((start - started) * 1000, 3), 'duration_ms': round(duration * 1000, 3)}
+                    for name, start, duration in spans
+                ]
+            })
+
+        return response
@@ -0,0 +1,55 @@
+"""
+Authenticated User Cache
+Short-TTL, bounded in-process cache of user documents keyed by user id
+
+Saves the users.find_one on every protected request. Routes that change a
+user document must call invalidate_user() after the write; other worker
+processes see the change once their entry expires (USER_CACHE_TTL_SECONDS).
+"""
+from bson import ObjectId
+from flask import current_app
+
+from app import mongo
+from app.utils.ttl_cache import TTLCache
+
+_state = {'cache': None}
+
+
+def _cache():
+    cache = _state['cache']
+    if cache is None:
+        cache = TTLCache(
+            max_size=current_app.config.get('USER_CACHE_MAX_SIZE', 10000),
+            ttl=current_app.config.get('USER_CACHE_TTL_SECONDS', 30)
+        )
+        _state['cache'] = cache
+    return cache
+
+
+def load_user(user_id):
+    """
+    Return the user document (with '_id' as a string), or None if missing
+    
+    The result is a shallow copy; callers must not mutate nested values.
+    """
+    cache = _cache()
+    user = cache.get(user_id)
+
+    if user is None:
+        user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+        if not user:
+            return None
+        user['_id'] = str(user['_id'])
+        cache.set(user_id, user)
+
+    return dict(user)
+
+
+def invalidate_user(user_id):
+    """Drop a cached user after a write to their document"""
+    _cache().pop(str(user_id))
+
+
+def clear():
+    if _state['cache'] is not None:
+        _state['cache'].clear()
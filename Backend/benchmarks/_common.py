@@ -0,0 +1,90 @@
+"""
+Shared helpers for the benchmark scripts
+Latency statistics and baseline JSON save/compare
+"""
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies_s, elapsed_s=None):
+    """Summarize a list of latencies (seconds) into milliseconds"""
+    values = sorted(latencies_s)
+    summary = {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
+    if elapsed_s:
+        summary['throughput_rps'] = round(len(values) / elapsed_s, 2)
+    return summary
+
+
+def environment():
+    """Describe the machine a benchmark ran on"""
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'recorded_at': datetime.utcnow().isoformat()
+    }
+
+
+def save_baseline(path, payload):
+    """Write a baseline JSON file (stable key order so diffs stay readable)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Baseline written to {path}")
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, metrics, threshold_pct=10.0):
+    """
+    Print per-entry deltas against a baseline
+
+    Returns the list of (name, metric, delta_pct) regressions above threshold.
+    Higher is worse for every metric except throughput.
+    """
+    regressions = []
+    print(f"\n{'name':<32}{'metric':<16}{'baseline':>12}{'current':>12}{'delta':>10}")
+
+    for name, current in sorted(results.items()):
+        previous = (baseline or {}).get(name)
+        if not previous:
+            print(f"{name:<32}{'(new)':<16}")
+            continue
+
+        for metric in metrics:
+            if metric not in current or metric not in previous or not previous[metric]:
+                continue
+            delta = (current[metric] - previous[metric]) / previous[metric] * 100
+            worse = -delta if metric.startswith('throughput') else delta
+            flag = '  <-- regression' if worse > threshold_pct else ''
+            print(f"{name:<32}{metric:<16}{previous[metric]:>12.3f}{current[metric]:>12.3f}{delta:>+9.1f}%{flag}")
+            if worse > threshold_pct:
+                regressions.append((name, metric, round(delta, 1)))
+
+    return regressions
@@ -0,0 +1,149 @@
+"""
+Tone cache tier benchmark: host-local SQLite vs MongoDB lookups
+
+Seeds the same tone cache entries into a SQLite disk cache and into the
+benchmark database's tone_cache, then times single-key lookups (hits and
+misses) and 10-key batch lookups on each tier, using the same keys and
+query shapes as ToneShifterService. Needs a running mongod
+(BENCHMARK_MONGO_URI, default styletalk_bench) unless --disk-only is
+given; tone_cache is dropped and re-seeded.
+
+Usage (from Backend/):
+    python -m benchmarks.disk_cache
+    python -m benchmarks.disk_cache --entries 100000 --lookups 5000
+    python -m benchmarks.disk_cache --disk-only --path /var/cache/styletalk/bench.sqlite3
+    python -m benchmarks.disk_cache --save-baseline
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks._common import BASELINE_DIR, compare, environment, load_baseline, save_baseline, summarize
+
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'disk_cache.json')
+
+TONES = ['formal', 'casual', 'friendly', 'professional']
+BATCH_SIZE = 10
+
+
+def make_entries(count, seed_value):
+    """Global cache docs with realistic response sizes"""
+    from app.models.tone_cache import ToneCache
+
+    rng = random.Random(seed_value)
+    entries = []
+    for i in range(count):
+        tone = rng.choice(TONES)
+        text = f'message {i}: can we move the quarterly review to thursday afternoon?'
+        entries.append(ToneCache.create(text, tone, {
+            'success': True,
+            'original_text': text,
+            'shifted_text': f'{tone} rewrite {i}: ' + 'would it be possible to reschedule the review ' * 3,
+            'target_tone': tone,
+            'cached': False
+        }))
+    return entries
+
+
+def seed_disk(cache, entries):
+    expires_at = time.time() + 86400
+    for entry in entries:
+        cache.set(entry['_id'], {k: entry.get(k) for k in ('cache_key', 'text', 'response', 'hit_count')}, expires_at)
+
+
+def seed_mongo(db, entries):
+    from app.models.indexes import ensure_indexes
+
+    db.drop_collection('tone_cache')
+    ensure_indexes(db)
+    for start in range(0, len(entries), 5000):
+        db.tone_cache.insert_many(entries[start:start + 5000], ordered=False)
+
+
+def time_calls(fn, args_list):
+    latencies = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tone cache lookup latency: disk tier vs Mongo')
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=2000, help='Timed lookups per case')
+    parser.add_argument('--path', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--disk-only', action='store_true', help='Skip the Mongo tier')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=20.0)
+    args = parser.parse_args()
+
+    from app.models.tone_cache import ToneCache
+    from app.utils.disk_cache import DiskCache
+
+    rng = random.Random(args.seed)
+    entries = make_entries(args.entries, args.seed)
+    hit_keys = [rng.choice(entries)['cache_key'] for _ in range(args.lookups)]
+    miss_keys = [ToneCache.generate_cache_key(f'unseen {i}', 'formal', None) for i in range(args.lookups)]
+    batches = [[rng.choice(entries)['cache_key'] for _ in range(BATCH_SIZE)] for _ in range(args.lookups // BATCH_SIZE)]
+
+    path = args.path or os.path.join(tempfile.mkdtemp(prefix='styletalk-bench-'), 'tone_cache.sqlite3')
+    cache = DiskCache(path, max_bytes=1 << 40)
+    cache.clear()
+    print(f"Seeding {args.entries} entries into {path}...")
+    seed_disk(cache, entries)
+
+    def disk_lookup(keys):
+        cache.get_many([ToneCache.entry_id(key) for key in keys])
+
+    results = {
+        'disk_hit': time_calls(disk_lookup, [([key],) for key in hit_keys]),
+        'disk_miss': time_calls(disk_lookup, [([key],) for key in miss_keys]),
+        f'disk_batch_{BATCH_SIZE}': time_calls(disk_lookup, [(keys,) for keys in batches]),
+    }
+
+    if not args.disk_only:
+        from app import create_app, mongo
+
+        app = create_app('benchmark')
+        with app.app_context():
+            db = mongo.db
+            print(f"Seeding {args.entries} entries into tone_cache...")
+            seed_mongo(db, entries)
+
+            def mongo_lookup(key):
+                db.tone_cache.find_one(ToneCache.lookup_query(key), sort=ToneCache.LOOKUP_SORT)
+
+            def mongo_batch(keys):
+                list(db.tone_cache.find(ToneCache.lookup_many_query(keys)))
+
+            results['mongo_hit'] = time_calls(mongo_lookup, [(key,) for key in hit_keys])
+            results['mongo_miss'] = time_calls(mongo_lookup, [(key,) for key in miss_keys])
+            results[f'mongo_batch_{BATCH_SIZE}'] = time_calls(mongo_batch, [(keys,) for keys in batches])
+
+    print(f"\n{'case':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, summary in results.items():
+        print(f"{name:<20}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}{summary['p99_ms']:>10.3f}{summary['max_ms']:>10.3f}")
+
+    params = {k: getattr(args, k) for k in ('entries', 'lookups', 'disk_only')}
+
+    if args.save_baseline:
+        save_baseline(args.baseline, {'environment': environment(), 'params': params, 'results': results})
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        if baseline.get('params') != params:
+            print('\nNote: baseline was recorded with different parameters')
+        regressions = compare(results, baseline['results'], ['p50_ms', 'p95_ms'], args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+History pagination benchmark: offset (skip) vs keyset (cursor) paging
+
+Seeds one user with a large history (default 50k entries) in the benchmark
+database, then times fetching page N both ways. It uses the same query
+builders as GET /api/user/history, so the numbers reflect the indexes and
+query shapes the route runs. Needs a running mongod (BENCHMARK_MONGO_URI,
+default styletalk_bench); the conversation_history collection is dropped
+and re-seeded unless --no-seed is given.
+
+Usage (from Backend/):
+    python -m benchmarks.history_pagination
+    python -m benchmarks.history_pagination --entries 50000 --pages 1 10 100 1000 2500
+    python -m benchmarks.history_pagination --save-baseline
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._common import BASELINE_DIR, compare, environment, load_baseline, save_baseline, summarize
+
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'history_pagination.json')
+
+TONES = ['formal', 'casual', 'friendly', 'professional']
+
+
+def seed(db, user_id, entries, seed_value):
+    """Insert entries for one user, ~5% favourites, spread over 90 days"""
+    from app.models.conversation_history import ConversationHistory
+    from app.models.indexes import ensure_indexes
+
+    rng = random.Random(seed_value)
+    db.drop_collection('conversation_history')
+    ensure_indexes(db)
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(entries):
+        doc = ConversationHistory.create(
+            user_id=user_id,
+            input_text=f'message {i} about the quarterly report and the meeting',
+            results=[{'tone': t, 'content': f'{t} rewrite {i}'} for t in rng.sample(TONES, 2)],
+        )
+        doc['created_at'] = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+        doc['is_favorite'] = rng.random() < 0.05
+        batch.append(doc)
+        if len(batch) == 5000:
+            db.conversation_history.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.conversation_history.insert_many(batch, ordered=False)
+
+
+def time_offset_page(db, query, sort, page, limit):
+    """Legacy paging: count + skip((page-1)*limit)"""
+    started = time.perf_counter()
+    db.conversation_history.count_documents(query)
+    list(db.conversation_history.find(query).sort(sort).skip((page - 1) * limit).limit(limit))
+    return time.perf_counter() - started
+
+
+def cursor_for_page(db, query, sort, page, limit):
+    """Walk to page N once (untimed) to get the cursor a client would hold"""
+    from app.utils.pagination import decode_cursor, keyset_cursor, keyset_filter
+
+    cursor = None
+    for _ in range(page - 1):
+        page_query = {'$and': [query, keyset_filter(decode_cursor(cursor))]} if cursor else query
+        docs = list(db.conversation_history.find(page_query, {'created_at': 1}).sort(sort).limit(limit))
+        if not docs:
+            break
+        cursor = keyset_cursor(docs[-1])
+    return cursor
+
+
+def time_keyset_page(db, query, sort, cursor, limit):
+    """Cursor paging: range query from the cursor, limit + 1, no count"""
+    from app.utils.pagination import decode_cursor, keyset_filter
+
+    started = time.perf_counter()
+    page_query = {'$and': [query, keyset_filter(decode_cursor(cursor))]} if cursor else query
+    list(db.conversation_history.find(page_query).sort(sort).limit(limit + 1))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='History offset vs keyset pagination')
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 500, 1000, 2500])
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per page and method')
+    parser.add_argument('--favorites', action='store_true', help='Page through favourites only')
+    parser.add_argument('--no-seed', action='store_true', help='Reuse the existing benchmark data')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=20.0)
+    args = parser.parse_args()
+
+    from app import create_app, mongo
+    from app.models.conversation_history import ConversationHistory
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db = mongo.db
+        user_id = 'bench-history-user'
+
+        if not args.no_seed:
+            print(f"Seeding {args.entries} history entries...")
+            seed(db, user_id, args.entries, args.seed)
+
+        query = ConversationHistory.search_query(user_id, is_favorite=True if args.favorites else None)
+        _, sort = ConversationHistory.search_order()
+        total = db.conversation_history.count_documents(query)
+        print(f"{total} matching entries, {args.limit} per page")
+
+        results = {}
+        print(f"\n{'page':>6}{'offset p50 ms':>16}{'offset p95 ms':>16}{'keyset p50 ms':>16}{'keyset p95 ms':>16}")
+        for page in args.pages:
+            if (page - 1) * args.limit >= total:
+                continue
+
+            cursor = cursor_for_page(db, query, sort, page, args.limit)
+            offset = summarize([time_offset_page(db, query, sort, page, args.limit) for _ in range(args.repeat)])
+            keyset = summarize([time_keyset_page(db, query, sort, cursor, args.limit) for _ in range(args.repeat)])
+            results[f'offset_page_{page}'] = offset
+            results[f'keyset_page_{page}'] = keyset
+            print(f"{page:>6}{offset['p50_ms']:>16.2f}{offset['p95_ms']:>16.2f}{keyset['p50_ms']:>16.2f}{keyset['p95_ms']:>16.2f}")
+
+    params = {k: getattr(args, k) for k in ('entries', 'limit', 'pages', 'repeat', 'favorites')}
+
+    if args.save_baseline:
+        save_baseline(args.baseline, {'environment': environment(), 'params': params, 'results': results})
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        if baseline.get('params') != params:
+            print('\nNote: baseline was recorded with different parameters')
+        regressions = compare(results, baseline['results'], ['p50_ms', 'p95_ms'], args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+End-to-end load test for the StyleTalk API
+
+Runs the Flask app in-process against a local mongod and the local LLM
+stand-in (no network access, no Groq key), drives the main endpoints at a
+configurable concurrency and cache-hit ratio, and reports throughput and
+p50/p95/p99 latency per endpoint.
+
+Usage (from Backend/):
+    python -m benchmarks.load_test --concurrency 16 --requests 2000 --hit-ratio 0.8
+    python -m benchmarks.load_test --save-baseline      # record a new baseline
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --token <jwt>
+    python -m benchmarks.load_test --url http://127.0.0.1:8000   # seed + mint token
+
+    # Serving profile: see DEPLOYMENT.md (gunicorn vs. the development server)
+
+    # Login storm: login throughput/p99, and tone latency while bcrypt is busy
+    python -m benchmarks.load_test --endpoints login tone_shift --concurrency 32 \
+        --baseline benchmarks/baselines/login_storm.json
+
+The benchmark database (BENCHMARK_MONGO_URI, default styletalk_bench) is
+dropped and re-seeded on every in-process run.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from benchmarks._common import (
+    BASELINE_DIR, compare, environment, load_baseline, save_baseline, summarize
+)
+
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'load_test.json')
+
+TONES = ['formal', 'casual', 'friendly', 'professional', 'empathetic', 'confident', 'concise']
+
+SAMPLE_TEXTS = [
+    "hey can we push the meeting to tomorrow",
+    "thanks for sending the report over, I'll take a look tonight",
+    "I can't make it to dinner, something came up at work",
+    "the deploy failed again, can someone check the logs",
+    "just wanted to say congrats on the launch, huge win for the team",
+    "sorry for the late reply, been swamped all week",
+    "can you send me the invoice for last month when you get a chance",
+    "we need to talk about the budget before friday",
+]
+
+# name -> (weight, method, path)
+ENDPOINTS = {
+    'tone_shift': (4, 'POST', '/api/tone/shift'),
+    'rewrite_multiple': (2, 'POST', '/api/text/rewrite-multiple'),
+    'batch_shift': (1, 'POST', '/api/tone/batch-shift'),
+    'history': (3, 'GET', '/api/user/history?limit=20'),
+    'login': (2, 'POST', '/api/auth/login'),
+}
+
+# Login is opt-in: bcrypt dominates the mix otherwise
+DEFAULT_ENDPOINTS = ['tone_shift', 'rewrite_multiple', 'batch_shift', 'history']
+
+LOGIN = {'email': 'loadtest@example.com', 'password': 'LoadTest123'}
+
+
+class Workload:
+    """Generates request bodies with a target cache-hit ratio"""
+
+    def __init__(self, hit_ratio, seed):
+        self.hit_ratio = hit_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def text(self):
+        with self._lock:
+            warm = self._random.random() < self.hit_ratio
+            base = self._random.choice(SAMPLE_TEXTS)
+        # Warm texts come from the fixed pool (pre-cached); cold ones are unique
+        return base if warm else f"{base} ({uuid.uuid4().hex[:8]})"
+
+    def tones(self, n):
+        with self._lock:
+            return self._random.sample(TONES, n)
+
+    def pick_endpoint(self, names):
+        with self._lock:
+            weights = [ENDPOINTS[n][0] for n in names]
+            return self._random.choices(names, weights=weights)[0]
+
+    def body(self, name):
+        if name == 'tone_shift':
+            return {'text': self.text(), 'target_tone': self.tones(1)[0]}
+        if name == 'rewrite_multiple':
+            return {'text': self.text(), 'tones': self.tones(3)}
+        if name == 'batch_shift':
+            return {'texts': [self.text() for _ in range(5)], 'target_tone': self.tones(1)[0]}
+        if name == 'login':
+            return LOGIN
+        return None
+
+
+def create_benchmark_app(args):
+    """Create the app with the benchmark config and the requested LLM latency"""
+    from app import create_app
+
+    app = create_app('benchmark')
+    app.config['LOCAL_LLM_LATENCY_MS'] = args.llm_latency_ms
+    app.config['LOCAL_LLM_LATENCY_JITTER_MS'] = args.llm_jitter_ms
+    app.config['LOCAL_LLM_LATENCY_DISTRIBUTION'] = 'lognormal' if args.llm_jitter_ms else 'fixed'
+    return app
+
+
+def seed_database(app, args):
+    """Drop and re-seed the benchmark database; returns a token for the seeded user"""
+    from app import mongo
+    from app.models.user import User
+    from app.models.conversation_history import ConversationHistory
+    from app.models.indexes import ensure_indexes
+    from app.utils.jwt_helper import generate_token
+
+    with app.app_context():
+        db = mongo.db
+        for name in ('users', 'tone_cache', 'conversation_history'):
+            db.drop_collection(name)
+        ensure_indexes(db)
+
+        user_doc = User.create(LOGIN['email'], LOGIN['password'], 'Load Test')
+        user_id = db.users.insert_one(user_doc).inserted_id
+        token = generate_token(str(user_id), user_doc['email'])
+
+        history = [
+            ConversationHistory.create(
+                user_id=str(user_id),
+                input_text=random.choice(SAMPLE_TEXTS),
+                results=[{'tone': t, 'content': f'{t} rewrite of entry {i}'} for t in TONES[:3]],
+                metadata={'source': 'web', 'features_used': [], 'processing_time': 0}
+            )
+            for i in range(args.history_entries)
+        ]
+        if history:
+            db.conversation_history.insert_many(history)
+
+    return token
+
+
+def start_local_server(args):
+    """Seed the benchmark database and serve the app in a thread"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    app = create_benchmark_app(args)
+    token = seed_database(app, args)
+
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'  # keep-alive between requests
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f'http://127.0.0.1:{server.server_port}', token
+
+
+def warm_cache(base_url, token):
+    """Prime the global tone_cache entries for every warm text/tone combination"""
+    conn = connect(base_url)
+    for text in SAMPLE_TEXTS:
+        send(conn, 'POST', '/api/text/rewrite-multiple', {'text': text, 'tones': TONES}, token)
+    conn.close()
+
+
+def connect(base_url):
+    parsed = urlparse(base_url)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=120)
+
+
+def send(conn, method, path, body, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = None
+    if body is not None:
+        payload = json.dumps(body)
+        headers['Content-Type'] = 'application/json'
+
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def run(base_url, token, args):
+    names = args.endpoints
+    workload = Workload(args.hit_ratio, args.seed)
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def worker():
+        conn = connect(base_url)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+
+            name = workload.pick_endpoint(names)
+            _, method, path = ENDPOINTS[name]
+            body = workload.body(name)
+
+            start = time.perf_counter()
+            try:
+                status = send(conn, method, path, body, token)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = connect(base_url)
+                status = 'error'
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                latencies[name].append(elapsed)
+                statuses[name][status] += 1
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    results = {}
+    for name in names:
+        summary = summarize(latencies[name], elapsed)
+        # 503 is load shedding (bulkhead, admission, busy hasher), not a failure
+        summary['shed'] = statuses[name].get(503, 0)
+        summary['errors'] = sum(count for status, count in statuses[name].items() if status not in (200, 503))
+        summary['statuses'] = {str(status): count for status, count in statuses[name].items()}
+        results[name] = summary
+
+    overall = summarize([v for values in latencies.values() for v in values], elapsed)
+    overall['shed'] = sum(r['shed'] for r in results.values())
+    overall['errors'] = sum(r['errors'] for r in results.values())
+    results['overall'] = overall
+
+    return results, elapsed
+
+
+def print_report(results, elapsed):
+    print(f"\n{'endpoint':<20}{'count':>8}{'shed':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<20}{r['count']:>8}{r.get('shed', 0):>8}{r['errors']:>8}{r.get('throughput_rps', 0):>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"\nTotal time: {elapsed:.2f}s")
+    if results['overall'].get('shed'):
+        print("Some requests were shed with 503, so the latencies include rejections "
+              "(see Benchmarking the serving profile in DEPLOYMENT.md)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='StyleTalk API load test')
+    parser.add_argument('--url', help='Target an already running server instead of an in-process one')
+    parser.add_argument('--token', help='Bearer token for --url runs')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--hit-ratio', type=float, default=0.8, help='Fraction of texts drawn from the pre-cached pool')
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS, choices=list(ENDPOINTS))
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0, help='Median stand-in LLM latency')
+    parser.add_argument('--llm-jitter-ms', type=float, default=150.0)
+    parser.add_argument('--history-entries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-warm', action='store_true', help='Skip cache priming')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        # Without --token, seed the benchmark database the server is using
+        # (same BENCHMARK_MONGO_URI and JWT_SECRET_KEY) and mint a token here
+        token = args.token or seed_database(create_benchmark_app(args), args)
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url, token = start_local_server(args)
+
+    if not args.no_warm:
+        warm_cache(base_url, token)
+
+    results, elapsed = run(base_url, token, args)
+    print_report(results, elapsed)
+
+    if server:
+        server.shutdown()
+
+    params = {k: getattr(args, k) for k in (
+        'concurrency', 'requests', 'hit_ratio', 'endpoints', 'llm_latency_ms', 'llm_jitter_ms', 'history_entries'
+    )}
+    params['target'] = args.url or 'in-process'
+
+    if args.save_baseline:
+        save_baseline(args.baseline, {'environment': environment(), 'params': params, 'results': results})
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        if baseline.get('params') != params:
+            print('\nNote: baseline was recorded with different parameters')
+        regressions = compare(results, baseline['results'], ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'], args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
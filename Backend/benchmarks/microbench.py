@@ -0,0 +1,293 @@
+"""
+Microbenchmarks for pure-Python hot paths
+
+Each benchmark runs over a pool of inputs drawn from realistic size
+distributions (mostly short chat messages, some emails, a few long
+documents) and reports per-call timings in microseconds. Needs no
+running mongod or LLM.
+
+Usage (from Backend/):
+    python -m benchmarks.microbench                    # run all, compare to baseline
+    python -m benchmarks.microbench -k cache_key       # run matching benchmarks
+    python -m benchmarks.microbench --save-baseline
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks._common import BASELINE_DIR, compare, environment, load_baseline, save_baseline
+
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, 'microbench.json')
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark setup function; it returns the callable to time"""
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+# ==================== INPUT GENERATION ====================
+
+def random_text(rng, length):
+    words = []
+    total = 0
+    while total < length:
+        word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        words.append(word)
+        total += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def text_length(rng):
+    """70% chat messages, 25% emails, 5% long documents"""
+    roll = rng.random()
+    if roll < 0.70:
+        return rng.randint(20, 120)
+    if roll < 0.95:
+        return rng.randint(200, 800)
+    return rng.randint(2000, 5000)
+
+
+def history_doc(rng):
+    tones = ['formal', 'casual', 'friendly', 'professional', 'empathetic', 'concise']
+    return {
+        '_id': ObjectId(),
+        'user_id': str(ObjectId()),
+        'input_text': random_text(rng, text_length(rng)),
+        'results': [
+            {'tone': tone, 'content': random_text(rng, text_length(rng))}
+            for tone in rng.sample(tones, rng.randint(1, 6))
+        ],
+        'metadata': {'source': rng.choice(['web', 'plugin']), 'features_used': [], 'processing_time': 0},
+        'is_favorite': rng.random() < 0.1,
+        'tags': rng.sample(['work', 'family', 'friends', 'urgent'], rng.randint(0, 2)),
+        'created_at': datetime.utcnow() - timedelta(minutes=rng.randint(0, 100000)),
+        'expires_at': datetime.utcnow() + timedelta(days=90)
+    }
+
+
+def user_doc(rng):
+    return {
+        '_id': ObjectId(),
+        'email': f"{random_text(rng, 10).replace(' ', '')}@example.com",
+        'password': b'$2b$12$' + b'x' * 53,
+        'name': random_text(rng, 16),
+        'preferences': {
+            'default_tone': 'neutral', 'default_language': 'en', 'privacy_mode': 'cloud',
+            'theme': 'dark', 'enable_cache': True, 'enable_emojis': True, 'enable_gifs': True,
+            'grammar_correction': True, 'rephrasing': True, 'translation': False,
+            'relationship_default': 'auto'
+        },
+        'statistics': {
+            'total_requests': rng.randint(0, 10000), 'cache_hits': rng.randint(0, 5000),
+            'favorite_tone': 'formal', 'last_active': datetime.utcnow()
+        },
+        'created_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow(),
+        'is_active': True
+    }
+
+
+# ==================== BENCHMARKS ====================
+
+@benchmark('tone_cache.generate_cache_key')
+def bench_generate_cache_key(ctx):
+    from app.models.tone_cache import ToneCache
+    rng = ctx['rng']
+    inputs = [
+        (random_text(rng, text_length(rng)), rng.choice(['formal', 'casual', 'genz']),
+         random_text(rng, 40) if rng.random() < 0.3 else None)
+        for _ in range(256)
+    ]
+    return inputs, lambda args: ToneCache.generate_cache_key(*args)
+
+
+@benchmark('tone_shifter._build_system_prompt')
+def bench_build_system_prompt(ctx):
+    from app.services.tone_shifter import ToneShifterService
+    from app.services.llm_provider import LocalProvider
+    rng = ctx['rng']
+    service = ToneShifterService(provider=LocalProvider())
+    presets = list(ToneShifterService.TONE_PRESETS.values())
+    inputs = [
+        (rng.choice(presets), rng.random() < 0.9, random_text(rng, 60) if rng.random() < 0.3 else None)
+        for _ in range(256)
+    ]
+    return inputs, lambda args: service._build_system_prompt(*args)
+
+
+@benchmark('conversation_history.to_dict')
+def bench_history_to_dict(ctx):
+    from app.models.conversation_history import ConversationHistory
+    inputs = [history_doc(ctx['rng']) for _ in range(256)]
+    return inputs, ConversationHistory.to_dict
+
+
+@benchmark('conversation_history.search_query')
+def bench_history_search_query(ctx):
+    from app.models.conversation_history import ConversationHistory
+    rng = ctx['rng']
+    inputs = [
+        (str(ObjectId()), random_text(rng, rng.randint(3, 30)) if rng.random() < 0.6 else None,
+         rng.choice([None, True, False]), ['work'] if rng.random() < 0.2 else None)
+        for _ in range(256)
+    ]
+    return inputs, lambda args: ConversationHistory.search_query(*args)
+
+
+@benchmark('user.to_dict')
+def bench_user_to_dict(ctx):
+    from app.models.user import User
+    inputs = [user_doc(ctx['rng']) for _ in range(256)]
+    return inputs, User.to_dict
+
+
+@benchmark('jwt_helper.verify_token')
+def bench_verify_token(ctx):
+    from app.utils.jwt_helper import generate_token, verify_token
+    inputs = [generate_token(str(ObjectId()), f'user{i}@example.com') for i in range(64)]
+    return inputs, verify_token
+
+
+@benchmark('jwt_helper.verify_token_uncached')
+def bench_verify_token_uncached(ctx):
+    from app.utils.jwt_helper import _decode_token, generate_token
+    inputs = [generate_token(str(ObjectId()), f'user{i}@example.com') for i in range(64)]
+    return inputs, _decode_token
+
+
+@benchmark('jsonify.batch_results')
+def bench_jsonify_batch(ctx):
+    from flask import jsonify
+    rng = ctx['rng']
+
+    def batch():
+        return {
+            'success': True,
+            'results': [
+                {
+                    'success': True,
+                    'original_text': random_text(rng, text_length(rng)),
+                    'transformed_text': random_text(rng, text_length(rng)),
+                    'target_tone': 'formal',
+                    'tone_description': 'formal and polite',
+                    'model_used': 'llama-3.3-70b-versatile',
+                    'cached': rng.random() < 0.8,
+                    'usage': {'prompt_tokens': 120, 'completion_tokens': 60, 'total_tokens': 180}
+                }
+                for _ in range(rng.randint(10, 50))
+            ]
+        }
+
+    inputs = [batch() for _ in range(16)]
+    return inputs, jsonify
+
+
+@benchmark('metrics.request_instrumentation')
+def bench_metrics_request(ctx):
+    from app.utils import metrics
+    registry = metrics.Registry()
+    latency = metrics.Histogram('bench_latency_seconds', 'bench', ('route', 'method'), registry=registry)
+    in_flight = metrics.Gauge('bench_in_flight', 'bench', ('route',), registry=registry)
+    rng = ctx['rng']
+    routes = ['/api/tone/shift', '/api/text/rewrite', '/api/user/history', '/health']
+    inputs = [(rng.choice(routes), rng.lognormvariate(-3, 1)) for _ in range(256)]
+
+    def instrument(args):
+        route, seconds = args
+        gauge = in_flight.labels(route)
+        gauge.inc()
+        latency.labels(route, 'POST').observe(seconds)
+        gauge.dec()
+
+    return inputs, instrument
+
+
+# ==================== RUNNER ====================
+
+def run_benchmark(setup, ctx, rounds, min_time):
+    """Time one benchmark; returns per-call statistics in microseconds"""
+    inputs, fn = setup(ctx)
+    n = len(inputs)
+
+    # Calibrate: how many passes over the input pool fill min_time
+    passes = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(passes):
+            for item in inputs:
+                fn(item)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        passes *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(passes):
+            for item in inputs:
+                fn(item)
+        samples.append((time.perf_counter() - start) / (passes * n) * 1e6)
+
+    return {
+        'min_us': round(min(samples), 3),
+        'median_us': round(statistics.median(samples), 3),
+        'mean_us': round(statistics.mean(samples), 3),
+        'stdev_us': round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        'calls_per_round': passes * n,
+        'rounds': rounds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='StyleTalk hot-path microbenchmarks')
+    parser.add_argument('-k', dest='keyword', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per round')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=15.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app('benchmark')
+    results = {}
+
+    with app.test_request_context():
+        for name, setup in BENCHMARKS.items():
+            if args.keyword and args.keyword not in name:
+                continue
+            ctx = {'rng': random.Random(args.seed), 'app': app}
+            results[name] = run_benchmark(setup, ctx, args.rounds, args.min_time)
+            r = results[name]
+            print(f"{name:<40}{r['median_us']:>10.2f} us  (min {r['min_us']:.2f}, stdev {r['stdev_us']:.2f})")
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline) or {}
+        merged = dict(baseline.get('results', {}))
+        merged.update(results)
+        save_baseline(args.baseline, {'environment': environment(), 'results': merged})
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        regressions = compare(results, baseline['results'], ['median_us', 'min_us'], args.threshold)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
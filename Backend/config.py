@@ -8,29 +8,188 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-jwt-secret-key')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/styletalk')
+    # Log indexes from app/models/indexes.py that are missing when the app
+    # starts (setup_database.py creates them; builds never block startup)
+    CHECK_INDEXES_ON_STARTUP = os.getenv('CHECK_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+    INDEX_CHECK_TIMEOUT_MS = int(os.getenv('INDEX_CHECK_TIMEOUT_MS', 5000))
+    # Users allowed on operator endpoints such as /api/tone/cache/cleanup
+    ADMIN_EMAILS = [e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()]
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
     GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama-3.3-70b-versatile')
     
+    # LLM provider: 'groq' (default) or 'local' (deterministic stand-in)
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'groq')
+    LOCAL_LLM_MODEL = os.getenv('LOCAL_LLM_MODEL', 'local-stand-in')
+    LOCAL_LLM_LATENCY_MS = float(os.getenv('LOCAL_LLM_LATENCY_MS', 0))
+    LOCAL_LLM_LATENCY_JITTER_MS = float(os.getenv('LOCAL_LLM_LATENCY_JITTER_MS', 0))
+    LOCAL_LLM_LATENCY_DISTRIBUTION = os.getenv('LOCAL_LLM_LATENCY_DISTRIBUTION', 'fixed')  # fixed, uniform, normal, lognormal
+    LOCAL_LLM_ERROR_RATE = float(os.getenv('LOCAL_LLM_ERROR_RATE', 0))
+    LOCAL_LLM_TOKENS_PER_WORD = float(os.getenv('LOCAL_LLM_TOKENS_PER_WORD', 1.3))
+    LOCAL_LLM_STREAM_CHUNK_WORDS = int(os.getenv('LOCAL_LLM_STREAM_CHUNK_WORDS', 4))
+    LOCAL_LLM_STREAM_CHUNK_DELAY_MS = float(os.getenv('LOCAL_LLM_STREAM_CHUNK_DELAY_MS', 0))
+    LOCAL_LLM_SEED = int(os.getenv('LOCAL_LLM_SEED')) if os.getenv('LOCAL_LLM_SEED') else None
+    
+    # Optional trace export (JSONL file and/or local HTTP collector)
+    TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+    TRACE_EXPORT_URL = os.getenv('TRACE_EXPORT_URL')
+    
+    # Logging (queue-based, non-blocking); user text is redacted unless disabled
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text or json
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+    LOG_REDACT_TEXT = os.getenv('LOG_REDACT_TEXT', 'true').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    
+    # Authenticated user cache; trusting JWT claims skips the user lookup
+    # entirely on routes that only need the caller's id
+    USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 10000))
+    AUTH_TRUST_JWT_CLAIMS = os.getenv('AUTH_TRUST_JWT_CLAIMS', 'false').lower() == 'true'
+    
+    # Verified-JWT cache (entries never outlive the token's exp)
+    JWT_CACHE_MAX_SIZE = int(os.getenv('JWT_CACHE_MAX_SIZE', 10000))
+    JWT_CACHE_MAX_TTL_SECONDS = float(os.getenv('JWT_CACHE_MAX_TTL_SECONDS', 600))
+    
+    # /api/user/history paging
+    HISTORY_PAGE_MAX_LIMIT = int(os.getenv('HISTORY_PAGE_MAX_LIMIT', 100))
+    HISTORY_COUNT_CACHE_TTL_SECONDS = float(os.getenv('HISTORY_COUNT_CACHE_TTL_SECONDS', 60))
+    HISTORY_COUNT_CACHE_MAX_USERS = int(os.getenv('HISTORY_COUNT_CACHE_MAX_USERS', 10000))
+    HISTORY_BULK_MAX_ENTRIES = int(os.getenv('HISTORY_BULK_MAX_ENTRIES', 100))
+    HISTORY_EXPORT_BATCH_SIZE = int(os.getenv('HISTORY_EXPORT_BATCH_SIZE', 500))
+    # Store results that match a tone_cache entry as references to it
+    HISTORY_COMPACT_RESULTS = os.getenv('HISTORY_COMPACT_RESULTS', 'false').lower() == 'true'
+    
+    # Password hashing: bcrypt cost factor and a bounded hashing pool.
+    # Changing BCRYPT_ROUNDS re-hashes each user's password on next login.
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+    
+    # Async LLM request path (per-worker event loop, AsyncGroq + Motor)
+    ASYNC_REQUEST_TIMEOUT_SECONDS = float(os.getenv('ASYNC_REQUEST_TIMEOUT_SECONDS', 55))
+    
+    # Production WSGI serving (gunicorn.conf.py)
+    WSGI_BIND = os.getenv('WSGI_BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}")
+    WSGI_WORKERS = int(os.getenv('WSGI_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+    WSGI_WORKER_CLASS = os.getenv('WSGI_WORKER_CLASS', 'gthread')  # gthread or gevent
+    WSGI_THREADS = int(os.getenv('WSGI_THREADS', 8))
+    WSGI_WORKER_CONNECTIONS = int(os.getenv('WSGI_WORKER_CONNECTIONS', 1000))
+    WSGI_KEEPALIVE = int(os.getenv('WSGI_KEEPALIVE', 5))
+    WSGI_TIMEOUT = int(os.getenv('WSGI_TIMEOUT', 60))
+    WSGI_GRACEFUL_TIMEOUT = int(os.getenv('WSGI_GRACEFUL_TIMEOUT', 30))
+    WSGI_MAX_REQUESTS = int(os.getenv('WSGI_MAX_REQUESTS', 0))
+    WSGI_MAX_REQUESTS_JITTER = int(os.getenv('WSGI_MAX_REQUESTS_JITTER', 0))
+    WSGI_ACCESS_LOG = os.getenv('WSGI_ACCESS_LOG', '')  # '-' for stdout, empty to disable
+    
+    # Bulkheads: request threads allowed inside LLM-bound / DB-bound routes at once.
+    # llm + db leave one thread free so /health and /metrics always get one.
+    BULKHEAD_LLM_MAX_CONCURRENT = int(os.getenv('BULKHEAD_LLM_MAX_CONCURRENT', max(1, WSGI_THREADS // 2)))
+    BULKHEAD_LLM_MAX_WAIT_SECONDS = float(os.getenv('BULKHEAD_LLM_MAX_WAIT_SECONDS', 0))
+    BULKHEAD_DB_MAX_CONCURRENT = int(os.getenv(
+        'BULKHEAD_DB_MAX_CONCURRENT', max(1, WSGI_THREADS - BULKHEAD_LLM_MAX_CONCURRENT - 1)
+    ))
+    BULKHEAD_DB_MAX_WAIT_SECONDS = float(os.getenv('BULKHEAD_DB_MAX_WAIT_SECONDS', 0.05))
+    # Login/register wait on bcrypt, which runs PASSWORD_HASH_WORKERS at a time
+    BULKHEAD_AUTH_MAX_CONCURRENT = int(os.getenv('BULKHEAD_AUTH_MAX_CONCURRENT', PASSWORD_HASH_WORKERS))
+    BULKHEAD_AUTH_MAX_WAIT_SECONDS = float(os.getenv('BULKHEAD_AUTH_MAX_WAIT_SECONDS', 1.0))
+    # History exports hold a thread for the whole download; substring history
+    # searches can scan for up to SUBSTRING_SEARCH_MAX_TIME_MS
+    BULKHEAD_EXPORT_MAX_CONCURRENT = int(os.getenv('BULKHEAD_EXPORT_MAX_CONCURRENT', max(1, WSGI_THREADS // 8)))
+    BULKHEAD_SEARCH_MAX_CONCURRENT = int(os.getenv('BULKHEAD_SEARCH_MAX_CONCURRENT', max(1, WSGI_THREADS // 8)))
+    BULKHEAD_RETRY_AFTER_SECONDS = int(os.getenv('BULKHEAD_RETRY_AFTER_SECONDS', 1))
+    
+    # Expired tone_cache cleanup: bounded batches by _id with a pause between
+    # them, run by an in-app scheduler (one pass at a time across workers)
+    CACHE_CLEANUP_ENABLED = os.getenv('CACHE_CLEANUP_ENABLED', 'true').lower() == 'true'
+    CACHE_CLEANUP_INTERVAL_SECONDS = float(os.getenv('CACHE_CLEANUP_INTERVAL_SECONDS', 3600))
+    CACHE_CLEANUP_BATCH_SIZE = int(os.getenv('CACHE_CLEANUP_BATCH_SIZE', 1000))
+    CACHE_CLEANUP_BATCH_PAUSE_SECONDS = float(os.getenv('CACHE_CLEANUP_BATCH_PAUSE_SECONDS', 0.2))
+    CACHE_CLEANUP_LEASE_SECONDS = int(os.getenv('CACHE_CLEANUP_LEASE_SECONDS', 300))
+    
+    # Per-worker Bloom filter of tone_cache _ids: keys it has never seen skip
+    # the Mongo lookup. Refreshed with newly created entries (other workers'
+    # writes) and rebuilt from live entries to drop expired keys
+    CACHE_FILTER_ENABLED = os.getenv('CACHE_FILTER_ENABLED', 'true').lower() == 'true'
+    CACHE_FILTER_CAPACITY = int(os.getenv('CACHE_FILTER_CAPACITY', 1000000))
+    CACHE_FILTER_ERROR_RATE = float(os.getenv('CACHE_FILTER_ERROR_RATE', 0.01))
+    CACHE_FILTER_REBUILD_SECONDS = float(os.getenv('CACHE_FILTER_REBUILD_SECONDS', 600))
+    CACHE_FILTER_REFRESH_SECONDS = float(os.getenv('CACHE_FILTER_REFRESH_SECONDS', 2))
+    
+    # Bound on each tone_cache read/write; a slower one counts as a miss
+    TONE_CACHE_TIMEOUT_SECONDS = float(os.getenv('TONE_CACHE_TIMEOUT_SECONDS', 0.5))
+    
+    # Host-local SQLite tier in front of tone_cache, shared by the host's
+    # workers (DISK_CACHE_PATH defaults to instance/tone_cache.sqlite3)
+    DISK_CACHE_ENABLED = os.getenv('DISK_CACHE_ENABLED', 'false').lower() == 'true'
+    DISK_CACHE_PATH = os.getenv('DISK_CACHE_PATH', '')
+    DISK_CACHE_MAX_BYTES = int(os.getenv('DISK_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    DISK_CACHE_TTL_SECONDS = int(os.getenv('DISK_CACHE_TTL_SECONDS', 86400))
+    DISK_CACHE_TIMEOUT_SECONDS = float(os.getenv('DISK_CACHE_TIMEOUT_SECONDS', 0.05))
+    
+    # Admission control: shed uncached LLM work when latency exceeds the target
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_TARGET_LATENCY_SECONDS = float(os.getenv('ADMISSION_TARGET_LATENCY_SECONDS', 5))
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 64))
+    ADMISSION_MIN_IN_FLIGHT = int(os.getenv('ADMISSION_MIN_IN_FLIGHT', 2))
+    ADMISSION_EWMA_ALPHA = float(os.getenv('ADMISSION_EWMA_ALPHA', 0.2))
+    ADMISSION_MAX_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_MAX_RETRY_AFTER_SECONDS', 30))
+    
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     TESTING = False
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+    LOG_REDACT_TEXT = os.getenv('LOG_REDACT_TEXT', 'false').lower() == 'true'
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     TESTING = False
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.01))
 
 class TestingConfig(Config):
     """Testing configuration"""
     DEBUG = True
     TESTING = True
     MONGO_URI = 'mongodb://localhost:27017/styletalk_test'
+    CACHE_CLEANUP_ENABLED = False
+    CACHE_FILTER_ENABLED = False
+
+class StagingConfig(ProductionConfig):
+    """Staging configuration (local LLM stand-in, no Groq key needed)"""
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'local')
+    LOCAL_LLM_LATENCY_MS = float(os.getenv('LOCAL_LLM_LATENCY_MS', 800))
+    LOCAL_LLM_LATENCY_JITTER_MS = float(os.getenv('LOCAL_LLM_LATENCY_JITTER_MS', 400))
+    LOCAL_LLM_LATENCY_DISTRIBUTION = os.getenv('LOCAL_LLM_LATENCY_DISTRIBUTION', 'lognormal')
+
+class BenchmarkConfig(Config):
+    """Benchmark configuration (local mongod + local LLM stand-in)"""
+    DEBUG = False
+    TESTING = False
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+    MONGO_URI = os.getenv('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017/styletalk_bench')
+    LLM_PROVIDER = 'local'
+    LOCAL_LLM_SEED = 42
+    CACHE_CLEANUP_ENABLED = False
+    CACHE_FILTER_ENABLED = False
+    # Bulkheads sized for load_test.py's clients, so runs measure the serving
+    # path instead of 503s from pools sized for WSGI_THREADS
+    BENCHMARK_MAX_CONCURRENCY = int(os.getenv('BENCHMARK_MAX_CONCURRENCY', 64))
+    BULKHEAD_LLM_MAX_CONCURRENT = BENCHMARK_MAX_CONCURRENCY
+    BULKHEAD_DB_MAX_CONCURRENT = BENCHMARK_MAX_CONCURRENCY
+    BULKHEAD_AUTH_MAX_CONCURRENT = BENCHMARK_MAX_CONCURRENCY
+    BULKHEAD_EXPORT_MAX_CONCURRENT = BENCHMARK_MAX_CONCURRENCY
+    BULKHEAD_SEARCH_MAX_CONCURRENT = BENCHMARK_MAX_CONCURRENCY
 
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
+    'staging': StagingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration
+Worker, thread and keep-alive settings come from config.py (WSGI_* values,
+overridable through the environment) for the active FLASK_ENV.
+
+    FLASK_ENV=production gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+
+from config import config
+
+_settings = config[os.getenv('FLASK_ENV', 'production')]
+
+bind = _settings.WSGI_BIND
+workers = _settings.WSGI_WORKERS
+worker_class = _settings.WSGI_WORKER_CLASS  # gthread or gevent
+threads = _settings.WSGI_THREADS            # used by gthread only
+worker_connections = _settings.WSGI_WORKER_CONNECTIONS  # used by gevent only
+keepalive = _settings.WSGI_KEEPALIVE
+timeout = _settings.WSGI_TIMEOUT
+graceful_timeout = _settings.WSGI_GRACEFUL_TIMEOUT
+max_requests = _settings.WSGI_MAX_REQUESTS
+max_requests_jitter = _settings.WSGI_MAX_REQUESTS_JITTER
+
+# Import the app once in the master; workers fork from it
+preload_app = True
+
+accesslog = None if _settings.WSGI_ACCESS_LOG == '' else _settings.WSGI_ACCESS_LOG
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Give each worker its own Mongo client, LLM client, pools and log thread"""
+    from app import init_worker
+    from wsgi import app
+
+    init_worker(app)
@@ -0,0 +1,109 @@
+"""
+tone_cache migration to scoped _id keys
+Moves entries with ObjectId _ids to 'g:<cache_key>' / 'u:<user_id>:<cache_key>'
+
+Older databases key tone_cache by ObjectId with a unique index on cache_key
+(or cache_key + user_id). The app now reads and upserts by scoped _id, so
+until an entry is migrated it is simply a cache miss, and a legacy unique
+cache_key index makes a user's overlay collide with the global entry.
+
+The script drops those legacy indexes, then copies old entries in batches
+by _id: each copy is upserted under its new _id (merged into an entry the
+new code may already have written: hit counts add up, expiry takes the
+later one) and the old document is deleted. It can be stopped and re-run.
+
+Usage (from Backend/):
+    python migrate_tone_cache.py --dry-run
+    python migrate_tone_cache.py
+    python migrate_tone_cache.py --batch-size 500 --pause 0.5
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from app.models.indexes import ensure_indexes
+from app.models.tone_cache import ToneCache
+
+load_dotenv()
+
+MONGO_URI = os.getenv('MONGO_URI') or os.getenv('MONGODB_URI') or 'mongodb://localhost:27017/styletalk'
+
+LEGACY = {'_id': {'$type': 'objectId'}}
+
+
+def drop_legacy_indexes(db, dry_run=False):
+    """Drop indexes on tone_cache that start with cache_key (they would block overlays)"""
+    for name, info in db.tone_cache.index_information().items():
+        if info['key'][0][0] == 'cache_key':
+            print(f"   ✗ {'Would drop' if dry_run else 'Dropped'} tone_cache.{name}")
+            if not dry_run:
+                db.tone_cache.drop_index(name)
+
+
+def migrate_batch(db, entries):
+    """Upsert entries under their new _id and delete the originals"""
+    operations = []
+    for entry in entries:
+        new_id = ToneCache.entry_id(entry['cache_key'], entry.get('user_id'))
+        fields = {k: v for k, v in entry.items()
+                  if k not in ('_id', 'hit_count', 'created_at', 'expires_at', 'last_accessed', 'pinned_until')}
+        operations.append(UpdateOne(
+            {'_id': new_id},
+            {
+                '$setOnInsert': {**fields, 'created_at': entry.get('created_at')},
+                '$inc': {'hit_count': entry.get('hit_count', 0)},
+                '$max': {
+                    'expires_at': entry.get('expires_at'),
+                    'last_accessed': entry.get('last_accessed'),
+                    **({'pinned_until': entry['pinned_until']} if entry.get('pinned_until') else {})
+                }
+            },
+            upsert=True
+        ))
+
+    db.tone_cache.bulk_write(operations, ordered=False)
+    return db.tone_cache.delete_many({'_id': {'$in': [entry['_id'] for entry in entries]}}).deleted_count
+
+
+def migrate(batch_size=1000, pause=0.2, dry_run=False):
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database()
+
+    remaining = db.tone_cache.count_documents(LEGACY)
+    print(f"Migrating tone_cache in '{db.name}': {remaining} entries with ObjectId _ids")
+
+    drop_legacy_indexes(db, dry_run)
+    if dry_run or not remaining:
+        client.close()
+        return
+
+    migrated = 0
+    started = time.perf_counter()
+    while True:
+        entries = list(db.tone_cache.find(LEGACY).sort('_id', 1).limit(batch_size))
+        if not entries:
+            break
+        migrated += migrate_batch(db, entries)
+        elapsed = time.perf_counter() - started
+        print(f"   {migrated}/{remaining} migrated ({migrated / elapsed:.0f}/s)")
+        time.sleep(pause)
+
+    result = ensure_indexes(db)
+    for name in result['created']:
+        print(f"   ✓ Created {name}")
+
+    print(f"\nDone: {migrated} entries in {time.perf_counter() - started:.1f}s")
+    client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move tone_cache entries to scoped _id keys')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.2, help='Seconds to sleep between batches')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    args = parser.parse_args()
+
+    migrate(batch_size=args.batch_size, pause=args.pause, dry_run=args.dry_run)
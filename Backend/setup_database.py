@@ -1,75 +1,95 @@
 """
-Database setup script for creating indexes
-Run this once to optimize database performance
+Database setup script for indexes
+Creates the indexes declared in app/models/indexes.py and reports drift
+
+The app only logs missing indexes at startup; run this script after
+deploying to create them, to inspect the database, or to repair indexes
+that need a drop first.
+
+Usage (from Backend/):
+    python setup_database.py                     # create missing, print report
+    python setup_database.py --fix               # also rebuild conflicting indexes
+    python setup_database.py --drop-unexpected   # also drop indexes not in the registry
 """
-from pymongo import MongoClient, ASCENDING, DESCENDING
+import argparse
 import os
+
 from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from app.models.indexes import INDEXES, ensure_indexes, index_report
 
 # Load environment variables
 load_dotenv()
 
-MONGODB_URI = os.getenv('MONGODB_URI')
-
-def setup_database():
-    """Create necessary indexes for optimal performance"""
-    client = MongoClient(MONGODB_URI)
-    db = client['styletalk']
-    
-    print("Setting up database indexes...")
-    
-    # User collection indexes
-    print("\n1. Setting up user collection indexes...")
-    db.users.create_index([('email', ASCENDING)], unique=True)
-    print("   ✓ Created unique index on email")
-    
-    # Tone cache collection indexes
-    print("\n2. Setting up tone_cache collection indexes...")
-    
-    # Primary cache key index (unique)
-    db.tone_cache.create_index([('cache_key', ASCENDING)], unique=True)
-    print("   ✓ Created unique index on cache_key")
-    
-    # User cache queries
-    db.tone_cache.create_index([('user_id', ASCENDING), ('created_at', DESCENDING)])
-    print("   ✓ Created compound index on user_id + created_at")
-    
-    # TTL index for automatic expiry (MongoDB will auto-delete expired documents)
-    try:
-        db.tone_cache.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
-        print("   ✓ Created TTL index for automatic expiry")
-    except Exception as e:
-        if 'IndexOptionsConflict' in str(e):
-            # Drop and recreate with TTL
-            db.tone_cache.drop_index('expires_at_1')
-            db.tone_cache.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
-            print("   ✓ Updated TTL index for automatic expiry")
+# Same variable as the app; MONGODB_URI is still honoured for older .env files
+MONGO_URI = os.getenv('MONGO_URI') or os.getenv('MONGODB_URI') or 'mongodb://localhost:27017/styletalk'
+
+
+def setup_database(fix=False, drop_unexpected=False):
+    """Create registry indexes and print what differs from the registry"""
+    client = MongoClient(MONGO_URI)
+    db = client.get_default_database()
+
+    print(f"Setting up indexes for database '{db.name}'...")
+
+    result = ensure_indexes(db)
+    for name in result['created']:
+        print(f"   ✓ Created {name}")
+
+    if result['conflicts']:
+        if fix:
+            _rebuild_conflicts(db, result['conflicts'])
+        else:
+            print(f"\n⚠ Conflicting indexes (run with --fix): {', '.join(result['conflicts'])}")
+
+    report = index_report(db)
+
+    if report['unexpected']:
+        if drop_unexpected:
+            for name in report['unexpected']:
+                collection, index = name.split('.', 1)
+                db[collection].drop_index(index)
+                print(f"   ✗ Dropped {name}")
+            report = index_report(db)
         else:
-            raise
-    
-    # Cache hit tracking
-    db.tone_cache.create_index([('hit_count', DESCENDING)])
-    print("   ✓ Created index on hit_count")
-    
-    # Text search (optional - for analytics)
-    db.tone_cache.create_index([('target_tone', ASCENDING), ('created_at', DESCENDING)])
-    print("   ✓ Created compound index on target_tone + created_at")
-    
-    print("\n✅ Database setup complete!")
-    print("\nCreated indexes:")
-    print("  - users: email (unique)")
-    print("  - tone_cache: cache_key (unique)")
-    print("  - tone_cache: user_id + created_at")
-    print("  - tone_cache: expires_at (TTL for auto-cleanup)")
-    print("  - tone_cache: hit_count")
-    print("  - tone_cache: target_tone + created_at")
-    
+            print(f"\n⚠ Indexes not in the registry (run with --drop-unexpected): {', '.join(report['unexpected'])}")
+
+    print("\nRegistry:")
+    for spec in INDEXES:
+        print(f"  - {spec!r}: {spec.purpose}")
+
+    print("\nReport:")
+    print(f"  Missing: {', '.join(report['missing']) or 'none'}")
+    print(f"  Not in registry: {', '.join(report['unexpected']) or 'none'}")
+    print(f"  Unused since mongod start: {', '.join(report['unused']) or 'none'}")
+
     # Show statistics
     print("\n📊 Collection statistics:")
     print(f"  Users: {db.users.count_documents({})}")
     print(f"  Cache entries: {db.tone_cache.count_documents({})}")
-    
+    print(f"  History entries: {db.conversation_history.count_documents({})}")
+
     client.close()
 
+
+def _rebuild_conflicts(db, names):
+    """Drop whatever blocks each conflicting spec (same name or same keys) and create it"""
+    specs = [spec for spec in INDEXES if repr(spec) in names]
+    for spec in specs:
+        for name, info in db[spec.collection].index_information().items():
+            if name == spec.name or list(info['key']) == spec.server_keys():
+                db[spec.collection].drop_index(name)
+                print(f"   ✗ Dropped {spec.collection}.{name}")
+    result = ensure_indexes(db, specs)
+    for name in result['created']:
+        print(f"   ✓ Rebuilt {name}")
+
+
 if __name__ == '__main__':
-    setup_database()
+    parser = argparse.ArgumentParser(description='Create and check StyleTalk MongoDB indexes')
+    parser.add_argument('--fix', action='store_true', help='Drop and rebuild conflicting indexes')
+    parser.add_argument('--drop-unexpected', action='store_true', help='Drop indexes not declared in the registry')
+    args = parser.parse_args()
+
+    setup_database(fix=args.fix, drop_unexpected=args.drop_unexpected)
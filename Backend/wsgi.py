@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+run.py remains the development server (debug + reloader).
+"""
+from app import create_app
+
+app = create_app()
@@ -188,6 +188,16 @@ class StyleTalkAPI {
     });
   }
 
+  // entries: [{ input_text, results, metadata, idempotency_key }]
+  // Safe to resend after a timeout: entries with a known idempotency_key
+  // come back as 'duplicate' instead of being saved twice.
+  async saveHistoryBatch(entries) {
+    return this.makeRequest('/api/user/history/bulk', {
+      method: 'POST',
+      body: JSON.stringify({ entries })
+    });
+  }
+
   async getHistory(params = {}) {
     const queryParams = new URLSearchParams(params);
     return this.makeRequest(`/api/user/history?${queryParams}`, {
@@ -43,7 +43,11 @@ export function CacheStats() {
   const handleClearBackendCache = async () => {
     try {
       const response = await toneAPI.clearBackendCache();
-      toast.success(`Cleared ${response.deleted_count} cached entries from server`);
+      if (response.deleted_count !== undefined) {
+        toast.success(`Cleared ${response.deleted_count} cached entries from server`);
+      } else {
+        toast.success('Clearing cached entries on the server');
+      }
       loadStats();
     } catch (error) {
       toast.error('Failed to clear backend cache');
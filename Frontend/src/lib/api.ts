@@ -504,8 +504,18 @@ export const userAPI = {
   /**
    * Get favorites
    */
-  async getFavorites(): Promise<any> {
-    return apiCall(`/api/user/favorites`, {
+  async getFavorites(params?: {
+    limit?: number;
+    cursor?: string;
+    fields?: string;
+  }): Promise<any> {
+    const queryParams = new URLSearchParams();
+    if (params?.limit) queryParams.append('limit', params.limit.toString());
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    if (params?.fields) queryParams.append('fields', params.fields);
+
+    const query = queryParams.toString();
+    return apiCall(`/api/user/favorites${query ? `?${query}` : ''}`, {
       method: 'GET',
     });
   },